@@ -1,7 +1,7 @@
 ﻿"""
 Application Flask principale pour le back-end
 """
-from flask import Flask, request, render_template, jsonify
+from flask import Flask, request, render_template, jsonify, Response
 import threading
 import schedule
 import time
@@ -12,11 +12,9 @@ import ssl
 import urllib3
 
 # Importation des modules du back-end
-from .crypto_data import update_data, TOTAL, token_balance_dict, token_price_dict, token_mc_dict, goldPrice, is_mock_data_used
-from .utils import save_crypto_balance
-from .zakat import calcul_zakat
-from .visualization import makePlot, calculate_evolution
+from .snapshot import get_snapshot, start_producer
 from .config import FLASK_CONFIG
+from .utils import format_age
 
 # Configuration pour ignorer les erreurs SSL
 # ATTENTION: Ã€ utiliser uniquement en dÃ©veloppement
@@ -40,95 +38,34 @@ def home():
     """
     Route pour la page d'accueil (template HTML)
     """
-    # Mettre Ã  jour les donnÃ©es
-    total, token_balance, token_price, token_mc, gold_price = update_data()
-    
-    # Enregistrer les donnÃ©es dans le fichier CSV    # N'ecrit pas les donnees mock dans le CSV
-    if is_mock_data_used():
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    else:
-        current_time = save_crypto_balance(token_balance)
-    
-    # Calculer la zakat
-    gold_price, zakat_amount, msg, counter = calcul_zakat(total, gold_price)
-    
-    # CrÃ©er une nouvelle variable avec Ã©volution
-    token_balance_dict_evol = token_balance.copy()
-    evolution_dict = calculate_evolution()
-    
-    # Fusionner les deux dictionnaires pour le template
-    for token, balance in token_balance_dict_evol.items():
-        evolution = evolution_dict.get(token)
-        if evolution is not None:
-            evolution = round(evolution, 2)  # Arrondi Ã  deux chiffres aprÃ¨s la virgule
-        token_balance_dict_evol[token] = {
-            'balance': balance,
-            'evolution': evolution
-        }
-    
-    # CrÃ©er le graphique
-    makePlot()
-    
+    # Le pipeline tourne en arriere-plan: la route lit le dernier snapshot
+    data = get_snapshot().data
+    # Age des valeurs reprises des dernieres valeurs connues
+    stale_age = {token: format_age(since) for token, since in data['stale'].items()}
+
     # Rendre le template HTML
     return render_template('index.html', 
-                          total=total, 
-                          token_balance=token_balance_dict_evol, 
-                          token_price=token_price,
-                          token_mc=token_mc, 
-                          zakat=zakat_amount,
-                          counter=counter,
-                          msg=msg,
-                          goldPrice=gold_price,
-                          current_time=current_time)
+                          total=data['total'], 
+                          token_balance=data['token_balance'], 
+                          token_price=data['token_price'],
+                          token_mc=data['token_mc'], 
+                          zakat=data['zakat'],
+                          counter=data['counter'],
+                          msg=data['msg'],
+                          goldPrice=data['goldPrice'],
+                          current_time=data['current_time'],
+                          stale=data['stale'],
+                          stale_age=stale_age,
+                          missing=data['missing'],
+                          hyperliquid=data['hyperliquid'])
 
 @app.route('/api/portfolio', methods=['GET'])
 def api_portfolio():
     """
     Route API pour rÃ©cupÃ©rer les donnÃ©es du portefeuille (format JSON)
     """
-    # Mettre Ã  jour les donnÃ©es
-    total, token_balance, token_price, token_mc, gold_price = update_data()
-    
-    # Enregistrer les donnÃ©es dans le fichier CSV    # N'ecrit pas les donnees mock dans le CSV
-    if is_mock_data_used():
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    else:
-        current_time = save_crypto_balance(token_balance)
-    
-    # Calculer la zakat
-    gold_price, zakat_amount, msg, counter = calcul_zakat(total, gold_price)
-    
-    # Nouvelle variable avec Ã©volution
-    token_balance_dict_evol = token_balance.copy()
-    evolution_dict = calculate_evolution()
-    
-    # Fusionner les deux dictionnaires pour l'API
-    for token, balance in token_balance_dict_evol.items():
-        evolution = evolution_dict.get(token)
-        if evolution is not None:
-            evolution = round(evolution, 2)  # Arrondi Ã  deux chiffres aprÃ¨s la virgule
-        token_balance_dict_evol[token] = {
-            'balance': balance,
-            'evolution': evolution
-        }
-    
-    # CrÃ©er le graphique
-    makePlot()
-    
-    # CrÃ©er la rÃ©ponse JSON
-    response = {
-        'total': total,
-        'token_balance': token_balance_dict_evol,
-        'token_price': token_price,
-        'token_mc': token_mc,
-        'zakat': zakat_amount,
-        'counter': counter,
-        'msg': msg,
-        'goldPrice': gold_price,
-        'current_time': current_time
-    }
-    
-    return jsonify(response)
+    # Le snapshot contient deja la reponse JSON serialisee
+    return Response(get_snapshot().json_body, mimetype='application/json')
 
 def run_schedule():
     """
@@ -146,6 +83,9 @@ def create_app():
     t = threading.Thread(target=run_schedule)
     t.daemon = True  # Le thread s'arrÃªtera quand le programme principal s'arrÃªte
     t.start()
+
+    # DÃ©marrer le producteur de snapshots (les routes ne bloquent plus sur les API)
+    start_producer()
     
     return app
 
@@ -0,0 +1,105 @@
+"""
+Cache TTL des prix et soldes avec stale-while-revalidate
+"""
+import threading
+import time
+from collections import OrderedDict
+from .fetch_engine import submit_background
+
+# Durees de vie par fournisseur: (frais en secondes, perime servable en secondes)
+# Une valeur fraiche est servie telle quelle; une valeur perimee mais encore
+# servable est servie immediatement pendant qu'un seul rafraichissement tourne
+# en arriere-plan; au-dela, l'appel attend un chargement synchrone.
+CACHE_TTLS = {
+    "coinmarketcap": (60, 900),
+    "etherscan": (300, 3600),
+    "evm_rpc": (60, 3600),
+    "xrpscan": (300, 3600),
+    "hyperliquid": (60, 900),
+}
+DEFAULT_TTL = (60, 600)
+
+# Nombre maximum d'entrees conservees (les moins recemment utilisees sont evincees)
+MAX_ENTRIES = 256
+
+
+class TTLCache:
+    """
+    Cache LRU borne, thread-safe, avec TTL par fournisseur
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttls=None):
+        self.max_entries = max_entries
+        self.ttls = ttls if ttls is not None else CACHE_TTLS
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, provider, key, loader, cacheable=None):
+        """
+        Retourne la valeur en cache ou la charge
+
+        Args:
+            provider (str): fournisseur (determine les TTL)
+            key (hashable): cle de la valeur pour ce fournisseur
+            loader (callable): fonction sans argument qui charge la valeur
+            cacheable (callable): predicat; une valeur refusee n'est pas stockee
+
+        Returns:
+            la valeur fraiche, perimee-servable ou nouvellement chargee
+        """
+        fresh_ttl, stale_ttl = self.ttls.get(provider, DEFAULT_TTL)
+        full_key = (provider, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None:
+                self._entries.move_to_end(full_key)
+                stored_at, value = entry
+                age = time.monotonic() - stored_at
+                if age < fresh_ttl:
+                    return value
+                if age < stale_ttl:
+                    if full_key not in self._refreshing:
+                        self._refreshing.add(full_key)
+                        submit_background(self._refresh, full_key, loader, cacheable)
+                    return value
+
+        value = loader()
+        self._store(full_key, value, cacheable)
+        return value
+
+    def invalidate(self, provider=None):
+        """Vide le cache (ou seulement les entrees d'un fournisseur)."""
+        with self._lock:
+            if provider is None:
+                self._entries.clear()
+            else:
+                for full_key in [k for k in self._entries if k[0] == provider]:
+                    del self._entries[full_key]
+
+    def _refresh(self, full_key, loader, cacheable):
+        try:
+            self._store(full_key, loader(), cacheable)
+        except Exception as e:
+            print(f"Rafraichissement en arriere-plan echoue pour {full_key[0]}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(full_key)
+
+    def _store(self, full_key, value, cacheable):
+        if cacheable is not None and not cacheable(value):
+            return
+        with self._lock:
+            self._entries[full_key] = (time.monotonic(), value)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Cache partage par le processus (Flask, Streamlit et scripts)
+quote_cache = TTLCache()
+
+
+def cached(provider, key, loader, cacheable=None):
+    """Raccourci vers quote_cache.get_or_load."""
+    return quote_cache.get_or_load(provider, key, loader, cacheable)
@@ -0,0 +1,96 @@
+"""
+Cadence adaptative du producteur de snapshots
+
+L'intervalle entre deux rafraichissements est choisi pour que le total du
+portefeuille bouge en moyenne d'environ TARGET_MOVE entre deux snapshots,
+d'apres la volatilite recente des totaux de l'historique: marche agite ->
+rafraichissements rapproches, marche calme -> espaces. Un client qui regarde
+(route Flask, rerun Streamlit) resserre l'intervalle; sans client, il est
+allonge d'un facteur IDLE_FACTOR (borne a REFRESH_MAX_INTERVAL). Moins d'appels API et
+moins de lignes CSV quand rien ne bouge ou que personne ne regarde.
+"""
+import math
+import threading
+import time
+from .config import REFRESH_MIN_INTERVAL, REFRESH_MAX_INTERVAL
+from .history import recent_totals
+
+# Variation du total visee entre deux snapshots (0.5%)
+TARGET_MOVE = 0.005
+
+# Intervalle maximum tant qu'un client regarde (secondes)
+WATCHED_INTERVAL = 300
+
+# Un client est "actif" s'il a lu un snapshot depuis moins de ACTIVE_WINDOW secondes
+ACTIVE_WINDOW = 600
+
+# Sans client actif, l'intervalle dicte par la volatilite est multiplie par ce facteur
+IDLE_FACTOR = 4
+
+# Nombre de snapshots recents utilises pour estimer la volatilite
+VOLATILITY_SAMPLES = 48
+
+
+def hourly_volatility(totals):
+    """
+    Ecart-type des rendements logarithmiques du total, ramene a une heure
+
+    Returns:
+        float: volatilite horaire, ou None si l'historique est insuffisant
+    """
+    scaled = []
+    for (previous_date, previous), (date, total) in zip(totals, totals[1:]):
+        hours = (date - previous_date).total_seconds() / 3600
+        if hours <= 0 or previous <= 0 or total <= 0:
+            continue
+        scaled.append(math.log(total / previous) / math.sqrt(hours))
+    if len(scaled) < 2:
+        return None
+    mean = sum(scaled) / len(scaled)
+    return math.sqrt(sum((value - mean) ** 2 for value in scaled) / (len(scaled) - 1))
+
+
+class RefreshCadence:
+    """
+    Calcule l'intervalle du prochain rafraichissement (thread-safe)
+
+    Attributes:
+        base_interval (float): intervalle sans historique exploitable
+        min_interval, max_interval (float): bornes de l'intervalle
+    """
+
+    def __init__(self, base_interval, min_interval=REFRESH_MIN_INTERVAL, max_interval=REFRESH_MAX_INTERVAL):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self._last_seen = None
+        self._lock = threading.Lock()
+
+    def note_client(self):
+        """Signale qu'un client vient de lire un snapshot."""
+        with self._lock:
+            self._last_seen = time.monotonic()
+
+    def is_watched(self):
+        """Vrai si un client a lu un snapshot dans la fenetre ACTIVE_WINDOW."""
+        with self._lock:
+            last_seen = self._last_seen
+        return last_seen is not None and time.monotonic() - last_seen < ACTIVE_WINDOW
+
+    def volatility_interval(self):
+        """Intervalle pour une variation attendue de TARGET_MOVE (base si inconnu)."""
+        volatility = hourly_volatility(recent_totals(VOLATILITY_SAMPLES))
+        if not volatility:
+            return self.base_interval
+        # Variation attendue sur t heures: volatility * sqrt(t)
+        return (TARGET_MOVE / volatility) ** 2 * 3600
+
+    def next_interval(self):
+        """Intervalle (secondes) avant le prochain rafraichissement."""
+        interval = self.volatility_interval()
+        if self.is_watched():
+            interval = min(interval, WATCHED_INTERVAL)
+        else:
+            # Personne ne regarde: seul l'historique CSV en profite
+            interval *= IDLE_FACTOR
+        return min(self.max_interval, max(self.min_interval, interval))
@@ -0,0 +1,167 @@
+"""
+Enregistrement et rejeu des appels aux fournisseurs (cassette)
+
+En mode "record", chaque requete envoyee par http_client et sa reponse sont
+enregistrees (sans les cles API) dans un fichier JSON. En mode "replay", les
+reponses sont servies depuis ce fichier sans acces reseau, avec les latences
+d'origine ("realtime") ou sans attente ni limite de debit ("fast").
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl, urlsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+from .config import CASSETTE_MODE, CASSETTE_FILE, CASSETTE_SPEED, USE_MOCK_DATA
+
+CASSETTE_VERSION = 1
+
+# Parametres et en-tetes jamais ecrits dans la cassette
+SECRET_PARAMS = {"apikey"}
+RECORDED_HEADERS = ("Content-Type", "Retry-After")
+
+
+def request_key(method, url, params=None, json_body=None):
+    """Identifie une requete independamment de l'hote et des cles API."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query)
+    if params:
+        query.extend(params.items() if isinstance(params, dict) else params)
+    query = sorted((str(key), str(value)) for key, value in query if key not in SECRET_PARAMS)
+    body = json.dumps(json_body, sort_keys=True) if json_body is not None else None
+    return json.dumps([method.upper(), parts.path, query, body])
+
+
+def _build_response(interaction):
+    response = requests.Response()
+    response.status_code = interaction["status"]
+    response.headers = CaseInsensitiveDict(interaction.get("headers", {}))
+    response._content = interaction["body"].encode("utf-8")
+    response.encoding = "utf-8"
+    response.url = interaction["url"]
+    response.reason = "Replayed"
+    return response
+
+
+class Cassette:
+    """
+    Interactions HTTP enregistrees, indexees par requete
+
+    Au rejeu, les interactions d'une meme requete sont servies dans l'ordre
+    d'enregistrement, puis la derniere est servie a nouveau (rafraichissements repetes).
+    """
+
+    def __init__(self, path, mode, speed="realtime"):
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._interactions = []
+        self._by_key = {}
+        self._cursor = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self._load()
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        self._interactions = payload.get("interactions", [])
+        for interaction in self._interactions:
+            self._by_key.setdefault(interaction["key"], []).append(interaction)
+
+    def replay(self, method, url, params=None, json_body=None):
+        """Retourne la reponse enregistree, apres la latence d'origine si realtime."""
+        key = request_key(method, url, params, json_body)
+        with self._lock:
+            candidates = self._by_key.get(key)
+            if not candidates:
+                raise requests.ConnectionError(f"Aucune interaction enregistree pour {method} {urlsplit(url).path}")
+            position = self._cursor.get(key, 0)
+            self._cursor[key] = position + 1
+            interaction = candidates[min(position, len(candidates) - 1)]
+        if self.speed == "realtime":
+            time.sleep(interaction.get("elapsed", 0))
+        return _build_response(interaction)
+
+    def record(self, method, url, params, json_body, response, elapsed):
+        """Ajoute une interaction (requete sans cle API + reponse)."""
+        started = time.monotonic() - elapsed
+        interaction = {
+            "key": request_key(method, url, params, json_body),
+            "method": method.upper(),
+            "url": response.url.split("?", 1)[0] if response.url else url,
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+            "body": response.text,
+            "elapsed": round(elapsed, 4),
+            "started": started,
+        }
+        with self._lock:
+            self._interactions.append(interaction)
+            self._dirty = True
+
+    def save(self):
+        """Ecrit la cassette sur disque (ecriture atomique) si elle a change."""
+        with self._lock:
+            if not self._dirty:
+                return
+            # Horodatage relatif au premier envoi de l'enregistrement
+            origin = min(item["started"] for item in self._interactions)
+            interactions = []
+            for item in sorted(self._interactions, key=lambda item: item["started"]):
+                interaction = {key: value for key, value in item.items() if key != "started"}
+                interaction["offset"] = round(item["started"] - origin, 4)
+                interactions.append(interaction)
+            payload = json.dumps({
+                "version": CASSETTE_VERSION,
+                "recorded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "interactions": interactions,
+            }, indent=1)
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Impossible d'ecrire la cassette: {e}")
+
+
+def _load_active_cassette():
+    mode = CASSETTE_MODE
+    # Mode hors ligne: une cassette enregistree remplace les donnees mock statiques
+    if not mode and USE_MOCK_DATA and os.path.exists(CASSETTE_FILE):
+        mode = "replay"
+    if mode not in ("record", "replay"):
+        return None
+    try:
+        return Cassette(CASSETTE_FILE, mode, CASSETTE_SPEED)
+    except (OSError, ValueError) as e:
+        print(f"Cassette {CASSETTE_FILE} illisible, rejeu desactive: {e}")
+        return None
+
+
+# Cassette du processus (None: appels reseau reels)
+active_cassette = _load_active_cassette()
+
+
+def is_replaying():
+    """Vrai si les reponses sont servies depuis la cassette."""
+    return active_cassette is not None and active_cassette.replaying
+
+
+def is_fast_replay():
+    """Vrai si la cassette est rejouee sans attente ni limite de debit."""
+    return is_replaying() and active_cassette.speed == "fast"
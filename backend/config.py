@@ -37,20 +37,113 @@ def get_secret(key, default=""):
 API_KEYS = {
     "etherscan": get_secret("ETHERSCAN_API_KEY", ""),
     "coinmarketcap": get_secret("CMC_API_KEY", ""),
+    "goldapi": get_secret("GOLDAPI_API_KEY", ""),
 }
 
 # Cles API individuelles pour un acces plus facile
 ETHERSCAN_API_KEY = API_KEYS["etherscan"]
 CMC_API_KEY = API_KEYS["coinmarketcap"]
+GOLDAPI_API_KEY = API_KEYS["goldapi"]
+
+# Plan Etherscan PRO: active l'action addresstokenbalance (tous les tokens d'une adresse en un appel)
+ETHERSCAN_PRO_PLAN = get_secret("ETHERSCAN_PRO_PLAN", "false").strip().lower() in {"1", "true", "yes", "on"}
 
 # Adresse du portefeuille
 MY_WALLET = get_secret("MY_WALLET", "")
 XRP_WALLET = get_secret("XRP_WALLET", "rPzz8Wn4suPTB7eNxiX4JEVetUNetahVCV")
 
+
+def get_list_secret(key, default, lowercase=False):
+    """
+    Lit une liste d'adresses separees par des virgules (defaut si absente)
+
+    Les adresses sont nettoyees et dedupliquees (ordre conserve): une adresse
+    listee deux fois serait comptee deux fois dans le portefeuille.
+
+    Args:
+        lowercase (bool): adresses insensibles a la casse (EVM: casse de checksum)
+    """
+    raw = get_secret(key, "")
+    values = [value.strip() for value in raw.split(",")]
+    if not any(values):
+        values = [value.strip() for value in default if value]
+    if lowercase:
+        values = [value.lower() for value in values]
+    return list(dict.fromkeys(value for value in values if value))
+
+# Portefeuilles suivis par chaine (par defaut: MY_WALLET et XRP_WALLET).
+# Les adresses XRP (base58) sont sensibles a la casse, pas les adresses EVM
+EVM_WALLETS = get_list_secret("EVM_WALLETS", [MY_WALLET], lowercase=True)
+XRP_WALLETS = get_list_secret("XRP_WALLETS", [XRP_WALLET])
+HYPERLIQUID_WALLETS = get_list_secret("HYPERLIQUID_WALLETS", [MY_WALLET], lowercase=True)
+
+# URLs de base des fournisseurs. PROVIDER_BASE_URL redirige tous les
+# fournisseurs vers un meme hote (ex: le serveur local scripts/provider_standin.py),
+# chaque <FOURNISSEUR>_BASE_URL surcharge un fournisseur en particulier.
+PROVIDER_BASE_URL = get_secret("PROVIDER_BASE_URL", "").rstrip("/")
+
+
+def get_base_url(key, default):
+    """URL de base d'un fournisseur, sans slash final."""
+    return (get_secret(key, "") or PROVIDER_BASE_URL or default).rstrip("/")
+
+BASE_URLS = {
+    "etherscan": get_base_url("ETHERSCAN_BASE_URL", "https://api.etherscan.io"),
+    "coinmarketcap": get_base_url("CMC_BASE_URL", "https://pro-api.coinmarketcap.com"),
+    "coingecko": get_base_url("COINGECKO_BASE_URL", "https://api.coingecko.com"),
+    "xrpscan": get_base_url("XRPSCAN_BASE_URL", "https://api.xrpscan.com"),
+    "hyperliquid": get_base_url("HYPERLIQUID_BASE_URL", "https://api.hyperliquid.xyz"),
+    "goldapi": get_base_url("GOLDAPI_BASE_URL", "https://www.goldapi.io"),
+    # Point d'acces JSON-RPC d'un noeud Ethereum (pas de valeur par defaut)
+    "evm_rpc": get_base_url("EVM_RPC_URL", ""),
+}
+
+# Lecture des soldes EVM: "etherscan" (un appel par solde) ou "rpc" (un lot
+# JSON-RPC vers EVM_RPC_URL pour tous les soldes)
+EVM_BALANCE_BACKEND = get_secret("EVM_BALANCE_BACKEND", "etherscan").strip().lower()
+
+# Budget global d'un rafraichissement en secondes (vide ou 0: sans limite),
+# reparti entre les fournisseurs; les valeurs en retard sont signalees manquantes
+REFRESH_DEADLINE = float(get_secret("REFRESH_DEADLINE", "0") or 0) or None
+
+# Bornes de l'intervalle adaptatif du producteur de snapshots (secondes)
+REFRESH_MIN_INTERVAL = float(get_secret("REFRESH_MIN_INTERVAL", "60") or 60)
+REFRESH_MAX_INTERVAL = float(get_secret("REFRESH_MAX_INTERVAL", "3600") or 3600)
+
 # Chemins des fichiers
 STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
 DATA_FILE = os.path.join(STATIC_DIR, "data_crypto.csv")
 PLOT_FILE = os.path.join(STATIC_DIR, "plot_evol.png")
+LKG_FILE = os.path.join(STATIC_DIR, "last_known_good.json")
+GOLD_PRICE_FILE = os.path.join(STATIC_DIR, "gold_price.json")
+HISTORY_DB_FILE = get_secret("HISTORY_DB_FILE", os.path.join(STATIC_DIR, "history.sqlite3"))
+HISTORY_COLUMNAR_DIR = get_secret("HISTORY_COLUMNAR_DIR", os.path.join(STATIC_DIR, "history_columnar"))
+
+# Stockage de l'historique des soldes: "csv" (data_crypto.csv), "sqlite"
+# (HISTORY_DB_FILE) ou "columnar" (HISTORY_COLUMNAR_DIR, colonnes binaires
+# projetees en memoire); importe depuis le CSV a la premiere ouverture
+HISTORY_BACKEND = get_secret("HISTORY_BACKEND", "csv").strip().lower()
+
+# Compactage de l'historique SQLite: snapshots bruts gardes HISTORY_RAW_DAYS
+# jours (0: pas de compactage, minimum 2), puis agregats horaires gardes
+# HISTORY_HOURLY_DAYS jours (0: sans limite), puis agregats journaliers
+HISTORY_RAW_DAYS = float(get_secret("HISTORY_RAW_DAYS", "30") or 0)
+HISTORY_HOURLY_DAYS = float(get_secret("HISTORY_HOURLY_DAYS", "365") or 0)
+
+# Snapshots de l'historique separes de moins de HISTORY_COALESCE_SECONDS
+# secondes fusionnes (threads, workers et alerte qui rafraichissent ensemble)
+HISTORY_COALESCE_SECONDS = float(get_secret("HISTORY_COALESCE_SECONDS", "5") or 0)
+
+# Prix de l'or (USD par gramme, 24 carats): au plus un appel GoldAPI par
+# GOLD_PRICE_TTL secondes, tous processus confondus (cache disque partage)
+GOLD_PRICE_TTL = float(get_secret("GOLD_PRICE_TTL", "86400") or 86400)
+
+# Cassette des appels fournisseurs: "record" enregistre chaque requete/reponse,
+# "replay" les rejoue sans reseau ("realtime": latences d'origine, "fast": sans attente).
+# Avec USE_MOCK_DATA, une cassette existante est rejouee a la place des donnees mock.
+CASSETTE_MODE = get_secret("CASSETTE_MODE", "").strip().lower()
+CASSETTE_FILE = get_secret("CASSETTE_FILE", os.path.join(STATIC_DIR, "cassette.json"))
+CASSETTE_SPEED = get_secret("CASSETTE_SPEED", "realtime").strip().lower()
 
 # Configuration de l'application Flask
 FLASK_CONFIG = {
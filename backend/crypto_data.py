@@ -1,17 +1,38 @@
 ﻿"""
 Module pour la rÃ©cupÃ©ration des donnÃ©es de cryptomonnaies
 """
+import asyncio
+import threading
 import requests
-import time
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from .config import CMC_API_KEY, ETHERSCAN_API_KEY, API_KEYS, MY_WALLET, XRP_WALLET, USE_MOCK_DATA
-from .utils import format_number
-from coinmarketcapapi import CoinMarketCapAPI
-
-# Delai entre les appels API Etherscan (plan FREE: 5 appels/seconde)
-ETHERSCAN_API_DELAY = 0.25
-HTTP_TIMEOUT = 8
+from .config import (
+    MY_WALLET,
+    XRP_WALLET,
+    USE_MOCK_DATA,
+    BASE_URLS,
+    REFRESH_DEADLINE,
+)
+from .fetch_engine import (
+    run_parallel,
+    run_in_pool,
+    run_limited,
+    run_coroutine_sync,
+    provider_semaphores,
+    throttle,
+)
+from .prices import get_cmc_quotes, get_coingecko_quotes
+from .tokens import TOKENS, CHAIN_PROVIDERS, build_fetch_plan
+from .cache import cached
+from .resilience import guarded_call, hedged_call
+from .singleflight import SingleFlight
+from .last_known_good import last_known_good
+from .cassette import active_cassette, is_replaying
+from .deadline import Deadline, DeadlineExceeded, using_deadline, within
+from .etherscan import BalancePlanner
+from .evm_rpc import RpcBalancePlanner
+from . import hyperliquid
+from .gold import get_gold_price, last_gold_price
+from . import http_client
 
 # Fonction utilitaire pour crÃ©er une session sans vÃ©rification SSL
 def create_ssl_unverified_session():
@@ -19,335 +40,388 @@ def create_ssl_unverified_session():
     session.verify = False
     return session
 
-# Configuration Etherscan V2
-ETHERSCAN_V2_URL = "https://api.etherscan.io/v2/api"
-ETHERSCAN_CHAIN_ID = "1"
+# Planificateur des soldes EVM selon le fournisseur de la chaine ethereum
+EVM_PLANNERS = {
+    "etherscan": BalancePlanner,
+    "evm_rpc": RpcBalancePlanner,
+}
 
-# Initialisation des clients API
-cmc = CoinMarketCapAPI(CMC_API_KEY)
+# Points d'acces des fournisseurs (URLs de base configurables)
+XRPSCAN_ACCOUNT_URL = f"{BASE_URLS['xrpscan']}/api/v1/account"
 
 # Variables globales
 TOTAL = 0
 token_balance_dict = {}
 token_price_dict = {}
 token_mc_dict = {}
+wallet_balance_dict = {}
+stale_token_dict = {}
+missing_token_list = []
+hyperliquid_accounts_dict = {}
 goldPrice = 0
 zakat = 0
 current_time = None
 IS_MOCK_DATA = False
-list_balance_token_usd = []
-list_all_token = []
-list_all_token_mc = []
-
-def fetch_data(api_function, *args):
-    """ExÃ©cute une fonction API de maniÃ¨re asynchrone"""
-    with ThreadPoolExecutor() as executor:
-        result = executor.submit(api_function, *args)
-        return result.result()
-
-def etherscan_v2_call(session, action, **params):
-    """Appelle Etherscan V2 et renvoie la valeur de result."""
-    query = {
-        "chainid": ETHERSCAN_CHAIN_ID,
-        "module": "account",
-        "action": action,
-        "apikey": ETHERSCAN_API_KEY,
-    }
-    query.update(params)
-    response = session.get(ETHERSCAN_V2_URL, params=query, timeout=HTTP_TIMEOUT)
-    response.raise_for_status()
-    payload = response.json()
-    if payload.get("status") != "1":
-        message = payload.get("message", "UNKNOWN")
-        result = payload.get("result", "UNKNOWN")
-        raise RuntimeError(f"Etherscan V2 error: {message} -- {result}")
-    return payload["result"]
-
-def get_token_balance_v2(session, address, contract_address, decimals):
-    raw = etherscan_v2_call(
-        session,
-        "tokenbalance",
-        address=address,
-        contractaddress=contract_address,
-        tag="latest",
-    )
-    return int(raw) / (10 ** decimals)
 
-def get_eth_balance(wallet, verify_ssl=True):
-    """RÃ©cupÃ¨re le solde ETH et sa valeur en USD"""
-    try:
-        session = requests.Session()
-        session.verify = verify_ssl
-
-        custom_cmc = CoinMarketCapAPI(CMC_API_KEY, session=session)
-        eth = custom_cmc.cryptocurrency_quotes_latest(symbol="ETH", skip_invalid=False)
-        eth_balance = int(
-            etherscan_v2_call(session, "balance", address=wallet, tag="latest")
-        ) / (10 ** 18)
-        eth_price = float(eth.data['ETH'][0]['quote']['USD']['price'])
-        eth_mc = format_number(eth.data['ETH'][0]['quote']['USD']['market_cap'])
-        return eth_balance * eth_price, eth_price, eth_mc
-    except Exception as e:
-        print(f"Erreur lors de la rÃ©cupÃ©ration des donnÃ©es ETH: {e}")
-        return 0, 0, "N/A"
+# Une seule mise a jour en vol; les variables globales sont publiees sous verrou
+_refresh_flight = SingleFlight()
+_state_lock = threading.Lock()
 
-def get_fet_balance(address, contract_address, verify_ssl=True):
-    """RÃ©cupÃ¨re le solde FET et sa valeur en USD"""
+def fetch_data(api_function, *args):
+    """ExÃ©cute une fonction API dans le pool partagÃ© du moteur de rÃ©cupÃ©ration"""
+    return run_parallel({"result": (api_function, args, {})}, pool="calls")["result"]
+
+def get_active_balance(verify_ssl=True, *, wallet=None):
+    """RÃ©cupÃ¨re le solde actif sur Hyperliquid (valeur du compte perps, voir hyperliquid.get_accounts)"""
+    wallet = wallet or MY_WALLET
+    account = hyperliquid.get_accounts([wallet], verify_ssl=verify_ssl)[wallet]
+    if isinstance(account, Exception):
+        raise account
+    return account["total"]
+
+def get_xrp_balance(wallet=None, verify_ssl=True):
+    """Recupere le solde XRP d'une adresse via xrpscan"""
+    url = f"{XRPSCAN_ACCOUNT_URL}/{wallet or XRP_WALLET}"
+    throttle("xrpscan")
+    response = http_client.get(url, verify=verify_ssl)
+    if response.status_code != 200:
+        raise RuntimeError(f"xrpscan HTTP {response.status_code}")
+
+    data = response.json()
+
+    # xrpscan expose souvent xrpBalance (XRP), et parfois Balance (drops).
+    xrp_balance_raw = data.get('xrpBalance')
+    if xrp_balance_raw is not None:
+        return float(xrp_balance_raw)
+    return float(data.get('Balance', 0)) / 1_000_000
+
+def _capture(func, *args, **kwargs):
+    """Execute func et retourne l'exception au lieu de la lever."""
     try:
-        # Configuration de la session requests pour dÃ©sactiver la vÃ©rification SSL si nÃ©cessaire
-        session = requests.Session()
-        session.verify = verify_ssl
-
-        # CrÃ©ation d'une nouvelle instance avec notre session personnalisÃ©e
-        custom_cmc = CoinMarketCapAPI(CMC_API_KEY, session=session)
-
-        # RÃ©cupÃ©ration du prix FET via CoinMarketCap
-        fet = custom_cmc.cryptocurrency_quotes_latest(symbol="FET", skip_invalid=False)
-        fet_price = fet.data['FET'][0]['quote']['USD']['price']
-        fet_mc = format_number(fet.data['FET'][0]['quote']['USD']['market_cap'])
-
-        fet_balance = get_token_balance_v2(session, address, contract_address, 18)
-
-        return fet_price * fet_balance, fet_price, fet_mc
+        return func(*args, **kwargs)
     except Exception as e:
-        print(f"Erreur lors de la rÃ©cupÃ©ration des donnÃ©es FET: {e}")
-        return 0, 0, "N/A"
+        return e
 
-def get_gala_balance(address, contract_address, verify_ssl=True):
-    """RÃ©cupÃ¨re le solde GALA et sa valeur en USD"""
-    try:
-        # Configuration de la session requests pour dÃ©sactiver la vÃ©rification SSL si nÃ©cessaire
-        session = requests.Session()
-        session.verify = verify_ssl
-
-        # CrÃ©ation d'une nouvelle instance avec notre session personnalisÃ©e
-        custom_cmc = CoinMarketCapAPI(CMC_API_KEY, session=session)
+def _succeeded(value):
+    return not isinstance(value, Exception)
 
-        # RÃ©cupÃ©ration du prix GALA via CoinMarketCap
-        gala = custom_cmc.cryptocurrency_quotes_latest(symbol="GALA", skip_invalid=False)
-        gala_price = gala.data['GALA'][0]['quote']['USD']['price']
-        gala_mc = format_number(gala.data['GALA'][0]['quote']['USD']['market_cap'])
+def _step_deadline(deadline, step):
+    return deadline.for_step(step) if deadline is not None else None
 
-        gala_balance = get_token_balance_v2(session, address, contract_address, 8)
-
-        return gala_price * gala_balance, gala_price, gala_mc
-    except Exception as e:
-        print(f"Erreur lors de la rÃ©cupÃ©ration des donnÃ©es GALA: {e}")
-        return 0, 0, "N/A"
+async def _bounded(deadline, step, awaitable):
+    """
+    Attend une etape au plus jusqu'a l'echeance globale
 
-def get_esx_balance(address, contract_address, verify_ssl=True):
-    """RÃ©cupÃ¨re le solde ESX et sa valeur en USD"""
+    L'etape elle-meme travaille sous sa propre echeance (plus courte) et rend
+    ses resultats partiels a temps; l'echeance globale ne coupe que ce qui
+    reste bloque. Une etape coupee rend DeadlineExceeded.
+    """
     try:
-        # Configuration de la session requests pour dÃ©sactiver la vÃ©rification SSL si nÃ©cessaire
-        session = requests.Session()
-        session.verify = verify_ssl
-
-        esx_balance = get_token_balance_v2(session, address, contract_address, 18)
-        esx = cmc.cryptocurrency_quotes_latest(symbol="ESX", skip_invalid=False)
-        esx_price = esx.data['ESX'][0]['quote']['USD']['price']
-        esx_mc = format_number(esx.data['ESX'][0]['quote']['USD']['market_cap'])
-        return esx_price * esx_balance, esx_price, esx_mc
-    except Exception as e:
-        print(f"Erreur lors de la rÃ©cupÃ©ration des donnÃ©es ESX: {e}")
-        return 0, 0, "N/A"
-
-def get_usd_balance(address, usdc_contract, usdt_contract, verify_ssl=True):
-    """RÃ©cupÃ¨re le solde USD (USDC + USDT)"""
-    try:
-        # Configuration de la session requests pour dÃ©sactiver la vÃ©rification SSL si nÃ©cessaire
-        session = requests.Session()
-        session.verify = verify_ssl
+        return await within(deadline, awaitable, step)
+    except DeadlineExceeded as e:
+        return e
+
+async def fetch_token_amounts(plan, verify_ssl=True, deadline=None, details=None):
+    """
+    Recupere les soldes bruts de tous les tokens du plan, pour chaque portefeuille
+
+    L'eventail sur les portefeuilles est parallele et borne par la
+    concurrence maximale de chaque fournisseur (PROVIDER_CONCURRENCY).
+    Avec une echeance (Deadline), chaque fournisseur dispose de sa part du
+    budget; un solde qui n'arrive pas a temps est rendu comme DeadlineExceeded.
+
+    Args:
+        details (dict): si fourni, recoit le detail des comptes Hyperliquid
+            (details["hyperliquid"]: portefeuille -> positions et soldes spot)
+
+    Returns:
+        dict: (index du token, portefeuille) -> solde (float) ou exception
+    """
+    balances = plan["balances"]
+
+    # Toutes les lectures EVM du rafraichissement passent par un seul plan
+    # (appels Etherscan ou lot JSON-RPC, voir EVM_BALANCE_BACKEND)
+    evm_provider = CHAIN_PROVIDERS["ethereum"]
+    planner = EVM_PLANNERS[evm_provider](verify_ssl=verify_ssl)
+    planner_keys = {}
+    for index, wallet, token in balances.get(evm_provider, []):
+        if token["contract"] is None:
+            planner_keys[(index, wallet)] = planner.add_native(wallet)
+        else:
+            planner_keys[(index, wallet)] = planner.add_token(wallet, token["contract"], token["decimals"])
+
+    # Chaque fournisseur passe par le cache TTL partage: une valeur fraiche
+    # ou perimee-servable evite l'appel amont (voir backend/cache.py)
+    def load_evm():
+        if not planner_keys:
+            return {}
+        return cached(
+            evm_provider,
+            planner.plan_key(),
+            planner.execute,
+            cacheable=lambda results: all(_succeeded(v) for v in results.values()),
+        )
+
+    def load_xrp(wallet):
+        return cached(
+            "xrpscan",
+            wallet,
+            lambda: guarded_call("xrpscan", get_xrp_balance, wallet, verify_ssl=verify_ssl),
+        )
+
+    # Tous les comptes Hyperliquid (perps, spot, positions) en une seule vague
+    hyperliquid_wallets = tuple(dict.fromkeys(wallet for _, wallet, _ in balances.get("hyperliquid", [])))
+
+    def load_hyperliquid():
+        if not hyperliquid_wallets:
+            return {}
+        return cached(
+            "hyperliquid",
+            ("accounts", hyperliquid_wallets),
+            lambda: hyperliquid.get_accounts(hyperliquid_wallets, verify_ssl=verify_ssl),
+            # Un compte dont le detail spot manque est relu au prochain passage
+            cacheable=lambda accounts: all(
+                _succeeded(v) and v["spot_value"] is not None for v in accounts.values()
+            ),
+        )
+
+    # L'echeance de chaque fournisseur est fixee a la creation de ses taches,
+    # qui la transmettent aux pools (delais HTTP et limites de debit bornes):
+    # les soldes deja lus sont rendus meme si d'autres n'arrivent pas a temps
+    limits = provider_semaphores()
+    async with asyncio.TaskGroup() as group:
+        step = _step_deadline(deadline, evm_provider)
+        with using_deadline(step):
+            evm_task = group.create_task(
+                _bounded(deadline, evm_provider, run_in_pool(_capture, load_evm))
+            )
+        step = _step_deadline(deadline, "hyperliquid")
+        with using_deadline(step):
+            hyperliquid_task = group.create_task(
+                _bounded(deadline, "hyperliquid", run_in_pool(_capture, load_hyperliquid))
+            )
+        wallet_tasks = {}
+        step = _step_deadline(deadline, "xrpscan")
+        with using_deadline(step):
+            for index, wallet, token in balances.get("xrpscan", []):
+                wallet_tasks[(index, wallet)] = group.create_task(
+                    _bounded(deadline, "xrpscan", run_limited(limits["xrpscan"], _capture, load_xrp, wallet))
+                )
 
-        usdc_balance = get_token_balance_v2(session, address, usdc_contract, 6)
-        usdt_balance = get_token_balance_v2(session, address, usdt_contract, 6)
-        return usdc_balance + usdt_balance
-    except Exception as e:
-        print(f"Erreur lors de la rÃ©cupÃ©ration des donnÃ©es USD: {e}")
-        return 0
-
-def get_active_balance(verify_ssl=True):
-    """RÃ©cupÃ¨re le solde actif sur Hyperliquid"""
-    url = "https://api.hyperliquid.xyz/info"
-    headers = {
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "type": "clearinghouseState",
-        "user": MY_WALLET
+    amounts = {key: task.result() for key, task in wallet_tasks.items()}
+    accounts = hyperliquid_task.result()
+    for index, wallet, token in balances.get("hyperliquid", []):
+        account = accounts if isinstance(accounts, Exception) else accounts.get(wallet)
+        amounts[(index, wallet)] = account["total"] if isinstance(account, dict) else account
+    if details is not None and not isinstance(accounts, Exception):
+        details["hyperliquid"] = {
+            wallet: account for wallet, account in accounts.items() if isinstance(account, dict)
+        }
+    evm_results = evm_task.result()
+    for key, planner_key in planner_keys.items():
+        if isinstance(evm_results, Exception):
+            amounts[key] = evm_results
+        else:
+            amounts[key] = evm_results.get(planner_key, RuntimeError(f"solde absent du plan {evm_provider}"))
+    return amounts
+
+def fetch_token_quotes(tokens, plan, verify_ssl=True):
+    """
+    Recupere les cotations de tous les tokens cotes
+
+    CMC cote tous les symboles en un seul appel, couvert par un appel
+    CoinGecko si CMC est coupe, echoue ou depasse son percentile de latence.
+    Les symboles encore absents sont completes par un seul appel CoinGecko.
+
+    Returns:
+        dict: symbole -> {"price": float, "market_cap": str}
+    """
+    symbols = tuple(plan["cmc_symbols"])
+    if not symbols:
+        return {}
+    coingecko_symbols = {
+        token["coingecko_id"]: token["symbol"]
+        for token in tokens
+        if token["price_source"] == "cmc" and token.get("coingecko_id")
     }
 
-    try:
-        session = requests.Session()
-        session.verify = verify_ssl
-        response = session.post(url, headers=headers, json=payload)
-    except Exception as e:
-        print(f"Erreur lors de la rÃ©cupÃ©ration des donnÃ©es actives: {e}")
-        return 0
-
-    if response.status_code == 200:
-        response_data = response.json()
-        account_value = response_data['marginSummary']['accountValue']
-        account_value = float(account_value)
-    else:
-        print(f"Failed with status code {response.status_code}:")
-        print(response.text)
-        account_value = 0
+    def load_coingecko(ids):
+        quotes = get_coingecko_quotes(list(ids), verify_ssl=verify_ssl)
+        return {coingecko_symbols[coingecko_id]: quote for coingecko_id, quote in quotes.items()}
+
+    # La couverture CoinGecko a sa propre entree de cache: sous la cle CMC,
+    # sa reponse partielle (sans ESX) serait servie pendant tout le TTL
+    coingecko_ids = tuple(sorted(coingecko_symbols))
+
+    def load_hedged():
+        provider, quotes = hedged_call(
+            ("coinmarketcap", lambda: get_cmc_quotes(list(symbols), verify_ssl=verify_ssl)),
+            ("coingecko", lambda: cached("coingecko", coingecko_ids, lambda: load_coingecko(coingecko_ids),
+                                         cacheable=bool)),
+        )
+        if provider != "coinmarketcap":
+            print(f"Cotations servies par {provider} (CMC lent ou indisponible)")
+        return provider, quotes
+
+    def cacheable_quotes(result):
+        # Seule une reponse CMC ou complete est gardee sous la cle CMC:
+        # sinon le rafraichissement suivant interroge CMC a nouveau
+        provider, quotes = result
+        return bool(quotes) and (provider == "coinmarketcap" or all(symbol in quotes for symbol in symbols))
 
-    return account_value
-
-def get_xrp_amount(verify_ssl=True):
-    """Recupere le montant de XRP et sa valeur en USD"""
     try:
-        session = requests.Session()
-        session.verify = verify_ssl
-
-        url = f"https://api.xrpscan.com/api/v1/account/{XRP_WALLET}"
-        response = session.get(url, timeout=HTTP_TIMEOUT)
-
-        if response.status_code != 200:
-            print(f"Erreur lors de la recuperation des donnees XRP: {response.status_code}")
-            return 0, 0, "N/A"
-
-        data = response.json()
-
-        # xrpscan expose souvent xrpBalance (XRP), et parfois Balance (drops).
-        xrp_balance_raw = data.get('xrpBalance')
-        if xrp_balance_raw is not None:
-            xrp_balance = float(xrp_balance_raw)
-        else:
-            xrp_drops = float(data.get('Balance', 0))
-            xrp_balance = xrp_drops / 1_000_000
-
-        xrp_price = 0
-        xrp_mc = "N/A"
-        try:
-            custom_cmc = CoinMarketCapAPI(CMC_API_KEY, session=session)
-            xrp = custom_cmc.cryptocurrency_quotes_latest(symbol="XRP", skip_invalid=False)
-            xrp_price = float(xrp.data['XRP'][0]['quote']['USD']['price'])
-            xrp_mc = format_number(xrp.data['XRP'][0]['quote']['USD']['market_cap'])
-        except Exception as cmc_error:
-            print(f"Erreur CMC pour XRP, tentative fallback CoinGecko: {cmc_error}")
-            try:
-                cg = session.get(
-                    "https://api.coingecko.com/api/v3/simple/price?ids=ripple&vs_currencies=usd&include_market_cap=true",
-                    timeout=HTTP_TIMEOUT,
-                )
-                if cg.status_code == 200:
-                    cg_data = cg.json().get("ripple", {})
-                    xrp_price = float(cg_data.get("usd", 0))
-                    market_cap = cg_data.get("usd_market_cap")
-                    if market_cap is not None:
-                        xrp_mc = format_number(market_cap)
-            except Exception as cg_error:
-                print(f"Fallback CoinGecko XRP en erreur: {cg_error}")
-
-        return xrp_balance * xrp_price, xrp_price, xrp_mc
+        _, quotes = cached("coinmarketcap", symbols, load_hedged, cacheable=cacheable_quotes)
+        quotes = dict(quotes)
     except Exception as e:
-        print(f"Erreur lors de la recuperation des donnees XRP: {e}")
-        return 0, 0, "N/A"
-
-def fetch_data_with_GOLD(api_key, verify_ssl=True):
-    """RÃ©cupÃ¨re le prix de l'or"""
-    url = f"https://www.goldapi.io/api/XAU/USD"
-    headers = {
-        "x-access-token": api_key,
-        "Content-Type": "application/json"
-    }
-
-    try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            return data
+        print(f"Erreur lors de la recuperation des cotations: {e}")
+        quotes = {}
+
+    missing_ids = tuple(sorted(
+        coingecko_id for coingecko_id, symbol in coingecko_symbols.items() if symbol not in quotes
+    ))
+    if missing_ids:
+        print(f"Cotations absentes pour {[coingecko_symbols[i] for i in missing_ids]}, fallback CoinGecko")
+        try:
+            quotes.update(cached(
+                "coingecko",
+                missing_ids,
+                lambda: guarded_call("coingecko", load_coingecko, missing_ids),
+                cacheable=bool,
+            ))
+        except Exception as e:
+            print(f"Fallback CoinGecko en erreur: {e}")
+    return quotes
+
+def token_quote(token, quotes):
+    """Cotation d'un token du registre selon sa source de prix."""
+    if token["price_source"] == "fixed":
+        return {"price": token["price"], "market_cap": "N/A"}
+    return quotes.get(token["symbol"])
+
+async def calculate_portfolio_async(tokens=None, deadline=None):
+    """
+    Recupere et valorise tout le portefeuille
+
+    Args:
+        tokens (list): entrees du registre (TOKENS par defaut)
+        deadline (float): budget global en secondes (None: sans limite), reparti
+            entre les fournisseurs; ce qui n'arrive pas a temps est complete par
+            les dernieres valeurs connues ou signale manquant
+
+    Returns:
+        dict: voir value_portfolio
+    """
+    tokens = TOKENS if tokens is None else tokens
+    plan = build_fetch_plan(tokens)
+    budget = Deadline(deadline) if deadline else None
+
+    # Les fournisseurs sont interroges en parallele, la limite de debit
+    # de chacun etant respectee par son seau a jetons (voir fetch_engine).
+    async with asyncio.TaskGroup() as group:
+        step = _step_deadline(budget, "quotes")
+        with using_deadline(step):
+            quotes_task = group.create_task(
+                _bounded(budget, "quotes", run_in_pool(fetch_token_quotes, tokens, plan))
+            )
+        step = _step_deadline(budget, "goldapi")
+        with using_deadline(step):
+            gold_task = group.create_task(_bounded(budget, "goldapi", run_in_pool(_capture, get_gold_price)))
+        details = {}
+        amounts_task = group.create_task(fetch_token_amounts(plan, deadline=budget, details=details))
+    quotes = quotes_task.result()
+    if isinstance(quotes, Exception):
+        print(f"Cotations non recues a temps: {quotes}")
+        quotes = {}
+    portfolio = value_portfolio(tokens, plan, quotes, amounts_task.result())
+    portfolio["hyperliquid"] = details.get("hyperliquid", {})
+    gold_price = gold_task.result()
+    if not isinstance(gold_price, Exception):
+        portfolio["gold_price"] = gold_price
+    if active_cassette is not None and active_cassette.recording:
+        active_cassette.save()
+    # Des valeurs rejouees ne remplacent pas les dernieres valeurs reelles sur disque
+    if not is_replaying():
+        last_known_good.save()
+    return portfolio
+
+def value_portfolio(tokens, plan, quotes, amounts):
+    """
+    Valorise et agrege le portefeuille
+
+    Les soldes et cotations obtenus sont enregistres comme dernieres valeurs
+    valides; ceux qui manquent sont completes depuis ce cache et les lignes
+    concernees sont marquees perimees (horodatage de la plus vieille valeur).
+    Aucune variable du module n'est modifiee: tout est rendu dans le resultat,
+    publie ensuite en un seul echange sous _state_lock (_refresh_portfolio).
+
+    Returns:
+        dict: total, token_balance, token_price, token_mc, gold_price,
+        wallet_balance (ligne -> portefeuille -> valeur USD),
+        stale (ligne -> horodatage "%Y-%m-%d %H:%M:%S" de la valeur la plus ancienne),
+        missing (lignes dont une valeur manque, comptee pour 0) et hyperliquid
+        (portefeuille -> positions et soldes spot, ajoute par calculate_portfolio_async)
+    """
+    stale_since = {}
+    missing = []
+
+    def mark_missing(group):
+        if group not in missing:
+            missing.append(group)
+
+    def mark_stale(group, ts):
+        stale_since[group] = min(ts, stale_since.get(group, ts))
+
+    # Valorisation puis agregation par ligne d'affichage (USDC + USDT -> USD)
+    # et par portefeuille
+    group_usd = {group: 0 for group in plan["groups"]}
+    group_quotes = {group: [] for group in plan["groups"]}
+    wallet_usd = {group: {} for group in plan["groups"]}
+    for index, token in enumerate(tokens):
+        symbol, group = token["symbol"], token["group"]
+        quote = token_quote(token, quotes)
+        if quote is not None:
+            if token["price_source"] != "fixed":
+                last_known_good.record_quote(symbol, quote)
         else:
-            print(f"Erreur lors de la rÃ©cupÃ©ration des donnÃ©es de l'or: {response.status_code}")
-            print(response.text)
-            return None
-    except Exception as e:
-        print(f"Exception lors de la rÃ©cupÃ©ration des donnÃ©es de l'or: {e}")
-        return None
-
-def calculate_total():
-    """Calcule le total du portefeuille et rÃ©cupÃ¨re toutes les donnÃ©es des cryptomonnaies"""
-    global list_balance_token_usd, list_all_token, list_all_token_mc
-
-    # RÃ©initialiser les listes
-    list_balance_token_usd = []
-    list_all_token = []
-    list_all_token_mc = []
+            fallback = last_known_good.get_quote(symbol)
+            if fallback is not None:
+                quote, ts = fallback
+                mark_stale(group, ts)
+            else:
+                print(f"Cotation absente pour {symbol}")
+                quote = {"price": 0, "market_cap": "N/A"}
+                mark_missing(group)
+        if quote not in group_quotes[group]:
+            group_quotes[group].append(quote)
+        for wallet in token["wallets"]:
+            amount = amounts.get((index, wallet))
+            if amount is not None and not isinstance(amount, Exception):
+                last_known_good.record_balance(symbol, wallet, amount)
+            else:
+                fallback = last_known_good.get_balance(symbol, wallet)
+                if fallback is not None:
+                    amount, ts = fallback
+                    mark_stale(group, ts)
+                else:
+                    if amount is not None:
+                        print(f"Erreur lors de la rÃ©cupÃ©ration des donnÃ©es {symbol} ({wallet}): {amount}")
+                    amount = 0
+                    mark_missing(group)
+            value = amount * quote["price"]
+            group_usd[group] += value
+            wallets = wallet_usd[group]
+            wallets[wallet] = wallets.get(wallet, 0) + value
+
+    list_all_token = list(plan["groups"])
+    list_balance_token_usd = [group_usd[group] for group in list_all_token]
+    # Prix et market cap d'une ligne: ceux de ses tokens s'ils partagent la meme
+    # cotation (USDC/USDT a 1), sinon la ligne n'a pas de prix unique
     list_token_price = []
-
-    # RÃ©cupÃ©ration des donnÃ©es ETH
-    eth_balance_usd, eth_price, eth_mc = get_eth_balance(MY_WALLET, verify_ssl=True)
-    list_balance_token_usd.append(eth_balance_usd)
-    list_all_token.append("ETH")
-    list_token_price.append(eth_price)
-    list_all_token_mc.append(eth_mc)
-
-    # DÃ©lai pour respecter la limite d'API Etherscan
-    time.sleep(ETHERSCAN_API_DELAY)
-
-    # RÃ©cupÃ©ration des donnÃ©es FET
-    fet_contract = "0xaea46A60368A7bD060eec7DF8CBa43b7EF41Ad85"
-    fet_balance_usd, fet_price, fet_mc = get_fet_balance(MY_WALLET, fet_contract, verify_ssl=True)
-    list_balance_token_usd.append(fet_balance_usd)
-    list_all_token.append("FET")
-    list_token_price.append(fet_price)
-    list_all_token_mc.append(fet_mc)
-
-    # DÃ©lai pour respecter la limite d'API Etherscan
-    time.sleep(ETHERSCAN_API_DELAY)
-
-    # RÃ©cupÃ©ration des donnÃ©es GALA
-    gala_contract = "0xd1d2Eb1B1e90B638588728b4130137D262C87cae"
-    gala_balance_usd, gala_price, gala_mc = get_gala_balance(MY_WALLET, gala_contract, verify_ssl=True)
-    list_balance_token_usd.append(gala_balance_usd)
-    list_all_token.append("GALA")
-    list_token_price.append(gala_price)
-    list_all_token_mc.append(gala_mc)
-
-    # DÃ©lai pour respecter la limite d'API Etherscan
-    time.sleep(ETHERSCAN_API_DELAY)
-
-    # RÃ©cupÃ©ration des donnÃ©es ESX
-    esx_contract = "0xFC05987bd2be489ACCF0f509E44B0145d68240f7"
-    esx_balance_usd, esx_price, esx_mc = get_esx_balance(MY_WALLET, esx_contract, verify_ssl=True)
-    list_balance_token_usd.append(esx_balance_usd)
-    list_all_token.append("ESX")
-    list_token_price.append(esx_price)
-    list_all_token_mc.append(esx_mc)
-
-    # DÃ©lai pour respecter la limite d'API Etherscan
-    time.sleep(ETHERSCAN_API_DELAY)
-
-    # RÃ©cupÃ©ration des donnÃ©es USD
-    usdc_contract = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
-    usdt_contract = "0xdAC17F958D2ee523a2206206994597C13D831ec7"
-    usd_balance = get_usd_balance(MY_WALLET, usdc_contract, usdt_contract, verify_ssl=True)
-    list_balance_token_usd.append(usd_balance)
-    list_all_token.append("USD")
-    list_token_price.append(1)
-    list_all_token_mc.append("N/A")
-
-    # DÃ©lai pour respecter la limite d'API Etherscan
-    time.sleep(ETHERSCAN_API_DELAY)
-
-    # RÃ©cupÃ©ration des donnÃ©es XRP
-    xrp_balance_usd, xrp_price, xrp_mc = get_xrp_amount(verify_ssl=True)
-    list_balance_token_usd.append(xrp_balance_usd)
-    list_all_token.append("XRP")
-    list_token_price.append(xrp_price)
-    list_all_token_mc.append(xrp_mc)
-
-    # DÃ©lai pour respecter la limite d'API
-    time.sleep(ETHERSCAN_API_DELAY)
-
-    # RÃ©cupÃ©ration des donnÃ©es de solde actif
-    active_balance = get_active_balance(verify_ssl=True)
-    list_balance_token_usd.append(active_balance)
-    list_all_token.append("ACTIVE")
-    list_token_price.append(1)
-    list_all_token_mc.append("N/A")
+    list_all_token_mc = []
+    for group in list_all_token:
+        group_quote = group_quotes[group][0] if len(group_quotes[group]) == 1 else {"price": 0, "market_cap": "N/A"}
+        list_token_price.append(group_quote["price"])
+        list_all_token_mc.append(group_quote["market_cap"])
 
     # Calcul du total
     total = sum(list_balance_token_usd)
@@ -357,13 +431,57 @@ def calculate_total():
     token_price_dict = dict(zip(list_all_token, list_token_price))
     token_mc_dict = dict(zip(list_all_token, list_all_token_mc))
 
-    # RÃ©cupÃ©ration du prix de l'or (pas d'utilisation d'API pour test)
-    goldPrice = 69.28
+    # Dernier prix de l'or connu (le prix du jour est lu par calculate_portfolio_async)
+    goldPrice = last_gold_price()
+
+    return {
+        "total": total,
+        "token_balance": token_balance_dict,
+        "token_price": token_price_dict,
+        "token_mc": token_mc_dict,
+        "gold_price": goldPrice,
+        "wallet_balance": wallet_usd,
+        "stale": {
+            group: datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+            for group, ts in stale_since.items()
+        },
+        "missing": missing,
+    }
+
+def portfolio_from_last_known_good(tokens=None):
+    """
+    Reconstruit le portefeuille uniquement depuis les dernieres valeurs sur disque
 
-    return total, token_balance_dict, token_price_dict, token_mc_dict, goldPrice
+    Returns:
+        dict: meme format que calculate_portfolio_async, ou None si le cache est vide
+    """
+    if last_known_good.is_empty():
+        return None
+    tokens = TOKENS if tokens is None else tokens
+    return value_portfolio(tokens, build_fetch_plan(tokens), {}, {})
+
+async def calculate_total_async(tokens=None, deadline=None):
+    """Calcule le total du portefeuille et rÃ©cupÃ¨re toutes les donnÃ©es des cryptomonnaies"""
+    portfolio = await calculate_portfolio_async(tokens, deadline)
+    return (
+        portfolio["total"],
+        portfolio["token_balance"],
+        portfolio["token_price"],
+        portfolio["token_mc"],
+        portfolio["gold_price"],
+    )
+
+def calculate_total(deadline=None):
+    """Enveloppe synchrone de calculate_total_async."""
+    return run_coroutine_sync(calculate_total_async(deadline=deadline))
 
 def get_mock_data():
-    """Retourne des donnees mock pour les tests locaux."""
+    """
+    Retourne des donnees mock statiques pour les tests locaux
+
+    Utilisees seulement sans cassette enregistree (voir cassette.py): avec
+    USE_MOCK_DATA, une cassette existante est rejouee a la place.
+    """
     token_balance = {
         "ETH": 1240.50,
         "FET": 430.25,
@@ -392,29 +510,89 @@ def get_mock_data():
         "ACTIVE": "N/A",
     }
     total = sum(token_balance.values())
-    gold_price = 69.28
+    gold_price = last_gold_price()
     return total, token_balance, token_price, token_mc, gold_price
 
-def update_data():
-    """Met a jour toutes les donnees du portefeuille."""
+async def _refresh_portfolio(deadline=None):
+    """Recupere les donnees puis publie les variables globales sous verrou."""
     global TOTAL, token_balance_dict, token_price_dict, token_mc_dict, goldPrice, IS_MOCK_DATA
+    global wallet_balance_dict, stale_token_dict, missing_token_list, hyperliquid_accounts_dict
 
-    if USE_MOCK_DATA:
-        TOTAL, token_balance_dict, token_price_dict, token_mc_dict, goldPrice = get_mock_data()
-        IS_MOCK_DATA = True
+    portfolio = None
+    if USE_MOCK_DATA and not is_replaying():
         print('Donnees mock chargees.')
-        return TOTAL, token_balance_dict, token_price_dict, token_mc_dict, goldPrice
-
-    try:
-        TOTAL, token_balance_dict, token_price_dict, token_mc_dict, goldPrice = calculate_total()
-        IS_MOCK_DATA = False
-    except Exception as exc:
-        print(f'Erreur API detectee, fallback sur donnees mock: {exc}')
-        TOTAL, token_balance_dict, token_price_dict, token_mc_dict, goldPrice = get_mock_data()
-        IS_MOCK_DATA = True
-
-    print('Donnees mises a jour!')
-    return TOTAL, token_balance_dict, token_price_dict, token_mc_dict, goldPrice
+    else:
+        try:
+            portfolio = await calculate_portfolio_async(deadline=deadline)
+        except Exception as exc:
+            portfolio = portfolio_from_last_known_good()
+            if portfolio is not None:
+                print(f'Erreur API detectee, fallback sur les dernieres valeurs connues: {exc}')
+            else:
+                print(f'Erreur API detectee, fallback sur donnees mock: {exc}')
+        print('Donnees mises a jour!')
+
+    if portfolio is not None:
+        result = (
+            portfolio["total"],
+            portfolio["token_balance"],
+            portfolio["token_price"],
+            portfolio["token_mc"],
+            portfolio["gold_price"],
+        )
+        # Une cassette rejouee est traitee comme des donnees mock (ni CSV, ni alerte)
+        wallet_balance, stale, is_mock = portfolio["wallet_balance"], portfolio["stale"], is_replaying()
+        missing = portfolio.get("missing", [])
+        accounts = portfolio.get("hyperliquid", {})
+    else:
+        result = get_mock_data()
+        wallet_balance, stale, is_mock = {}, {}, True
+        missing, accounts = [], {}
+
+    with _state_lock:
+        TOTAL, token_balance_dict, token_price_dict, token_mc_dict, goldPrice = result
+        IS_MOCK_DATA = is_mock
+        wallet_balance_dict = wallet_balance
+        stale_token_dict = stale
+        missing_token_list = missing
+        hyperliquid_accounts_dict = accounts
+    return result
+
+async def update_data_async(deadline=REFRESH_DEADLINE):
+    """
+    Met a jour toutes les donnees du portefeuille
+
+    Args:
+        deadline (float): budget global en secondes (None: sans limite); les
+            lignes non recues a temps sont signalees par get_missing_tokens()
+            ou get_stale_tokens()
+
+    Les appels concurrents (threads ou coroutines) partagent la meme mise a
+    jour en vol et recoivent son resultat: les dictionnaires retournes sont
+    partages et ne doivent pas etre modifies. Un appelant qui rejoint une
+    mise a jour en vol en partage aussi l'echeance.
+    """
+    return await _refresh_flight.do_async("update_data", _refresh_portfolio, deadline)
+
+def update_data(deadline=REFRESH_DEADLINE):
+    """Enveloppe synchrone de update_data_async (meme regroupement des appels)."""
+    return _refresh_flight.do("update_data", lambda: run_coroutine_sync(_refresh_portfolio(deadline)))
+
+def get_wallet_breakdown():
+    """Retourne la valeur USD par ligne et par portefeuille du dernier update_data()."""
+    return wallet_balance_dict
+
+def get_stale_tokens():
+    """Lignes servies depuis les dernieres valeurs connues lors du dernier update_data()."""
+    return stale_token_dict
+
+def get_missing_tokens():
+    """Lignes dont une valeur manquait (ni recue a temps, ni connue) lors du dernier update_data()."""
+    return missing_token_list
+
+def get_hyperliquid_positions():
+    """Positions perps et soldes spot Hyperliquid par portefeuille lors du dernier update_data()."""
+    return hyperliquid_accounts_dict
 
 def is_mock_data_used():
     """Indique si le dernier update_data() a utilise des donnees mock."""
@@ -0,0 +1,90 @@
+"""
+Budget de latence d'un rafraichissement, reparti entre les fournisseurs
+
+Le budget global est decoupe en echeances par fournisseur. L'echeance
+courante suit l'appel dans les pools (contextvars): les delais HTTP et les
+attentes de limite de debit sont bornes par le temps restant, et ce qui n'a
+pas abouti a temps est rendu comme manquant au lieu de bloquer le reste.
+"""
+import asyncio
+import contextlib
+import contextvars
+import time
+
+# Part du budget global accordee a chaque etape (les etapes tournent en
+# parallele). Etherscan, limite a 4 appels/s, dispose de la plus grande part;
+# le reste du budget est reserve a la valorisation et aux dernieres valeurs connues.
+DEADLINE_SHARES = {
+    "etherscan": 0.9,
+    "evm_rpc": 0.6,
+    "quotes": 0.8,
+    "xrpscan": 0.6,
+    "hyperliquid": 0.6,
+}
+DEFAULT_SHARE = 0.8
+
+_current = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Levee quand une etape n'a plus de budget pour aboutir
+
+    Attributes:
+        sent (bool): la requete etait deja partie quand l'echeance a expire
+    """
+
+    def __init__(self, message="", sent=False):
+        super().__init__(message)
+        self.sent = sent
+
+
+class Deadline:
+    """
+    Echeance absolue (horloge monotone) d'un budget de latence
+
+    Attributes:
+        budget (float): duree totale accordee, en secondes
+        expires_at (float): instant time.monotonic() d'expiration
+    """
+
+    def __init__(self, budget, started=None):
+        self.budget = float(budget)
+        self.started = time.monotonic() if started is None else started
+        self.expires_at = self.started + self.budget
+
+    def remaining(self):
+        """Temps restant en secondes (0 si expire)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def for_step(self, step):
+        """Echeance d'une etape: sa part du budget, depuis le meme depart."""
+        return Deadline(self.budget * DEADLINE_SHARES.get(step, DEFAULT_SHARE), self.started)
+
+
+def current_deadline():
+    """Echeance de l'appel en cours, None sans budget."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def using_deadline(deadline):
+    """Fixe l'echeance courante (heritee par les taches et pools lances dedans)."""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+async def within(deadline, awaitable, label=""):
+    """Attend awaitable au plus jusqu'a l'echeance (sans limite si None)."""
+    if deadline is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, deadline.remaining())
+    except TimeoutError:
+        raise DeadlineExceeded(f"{label or 'etape'} hors budget ({deadline.budget:.2f}s)") from None
@@ -0,0 +1,291 @@
+"""
+Module pour les appels Etherscan V2 et la planification des lectures de soldes
+"""
+import threading
+import time
+from .config import ETHERSCAN_API_KEY, ETHERSCAN_PRO_PLAN, BASE_URLS
+from .fetch_engine import run_parallel, throttle
+from .resilience import guarded_call
+from . import http_client
+
+# Configuration Etherscan V2
+ETHERSCAN_V2_URL = f"{BASE_URLS['etherscan']}/v2/api"
+ETHERSCAN_CHAIN_ID = "1"
+
+# Nombre maximum d'adresses acceptees par l'action balancemulti
+BALANCEMULTI_MAX_ADDRESSES = 20
+
+# Taille de page de l'action addresstokenbalance (plan PRO)
+TOKENBALANCE_PAGE_SIZE = 100
+
+# Detection de changement: les soldes ERC-20 d'une adresse ne sont relus que
+# si son dernier transfert de token a change, et au plus tard apres HEAD_MAX_AGE
+# secondes (tokens dont le solde bouge sans transfert, transferts manques)
+HEAD_MAX_AGE = 3600
+
+# Reponse Etherscan (status "0") d'une liste vide, qui n'est pas une erreur
+NO_TRANSACTIONS = "No transactions found"
+
+
+def etherscan_v2_call(action, verify_ssl=True, **params):
+    """Appelle Etherscan V2 et renvoie la valeur de result."""
+    return guarded_call("etherscan", _etherscan_v2_request, action, verify_ssl, params)
+
+
+def _etherscan_v2_request(action, verify_ssl, params):
+    query = {
+        "chainid": ETHERSCAN_CHAIN_ID,
+        "module": "account",
+        "action": action,
+        "apikey": ETHERSCAN_API_KEY,
+    }
+    query.update(params)
+    throttle("etherscan")
+    response = http_client.get(ETHERSCAN_V2_URL, params=query, verify=verify_ssl)
+    response.raise_for_status()
+    payload = response.json()
+    if payload.get("status") != "1" and payload.get("message") == NO_TRANSACTIONS:
+        return []
+    if payload.get("status") != "1":
+        message = payload.get("message", "UNKNOWN")
+        result = payload.get("result", "UNKNOWN")
+        raise RuntimeError(f"Etherscan V2 error: {message} -- {result}")
+    return payload["result"]
+
+
+def get_token_balance_v2(address, contract_address, decimals, verify_ssl=True):
+    raw = etherscan_v2_call(
+        "tokenbalance",
+        verify_ssl=verify_ssl,
+        address=address,
+        contractaddress=contract_address,
+        tag="latest",
+    )
+    return int(raw) / (10 ** decimals)
+
+
+def get_token_head(address, verify_ssl=True):
+    """
+    Tete de l'activite ERC-20 d'une adresse: "bloc:hash" de son dernier
+    transfert de token, chaine vide si elle n'en a aucun (un seul appel)
+    """
+    rows = etherscan_v2_call(
+        "tokentx",
+        verify_ssl=verify_ssl,
+        address=address,
+        page=1,
+        offset=1,
+        sort="desc",
+    )
+    if not rows:
+        return ""
+    return f"{rows[0]['blockNumber']}:{rows[0]['hash']}"
+
+
+class WalletHeads:
+    """
+    Dernieres tetes ERC-20 vues par adresse et soldes lus a cette tete
+    (thread-safe, partage par les rafraichissements du processus)
+    """
+
+    def __init__(self, max_age=HEAD_MAX_AGE):
+        self.max_age = max_age
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def balances_if_unchanged(self, address, head, keys):
+        """Soldes memorises si la tete n'a pas bouge et couvre keys, sinon None."""
+        with self._lock:
+            entry = self._entries.get(address.lower())
+        if entry is None:
+            return None
+        stored_head, balances, stored_at = entry
+        if stored_head != head or time.monotonic() - stored_at >= self.max_age:
+            return None
+        if any(key not in balances for key in keys):
+            return None
+        return {key: balances[key] for key in keys}
+
+    def store(self, address, head, balances):
+        with self._lock:
+            self._entries[address.lower()] = (head, dict(balances), time.monotonic())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Tetes partagees par tous les planificateurs
+wallet_heads = WalletHeads()
+
+
+def native_key(address):
+    """Cle d'un solde ETH dans les resultats du planificateur."""
+    return ("native", address.lower())
+
+
+def token_key(address, contract_address):
+    """Cle d'un solde ERC-20 dans les resultats du planificateur."""
+    return ("token", address.lower(), contract_address.lower())
+
+
+class BalancePlanner:
+    """
+    Collecte les soldes necessaires a un rafraichissement puis les recupere
+    avec le minimum d'appels Etherscan
+
+    - les demandes identiques sont dedupliquees
+    - les soldes ETH de toutes les adresses partent dans un seul balancemulti
+    - les soldes ERC-20 d'une adresse dont le dernier transfert de token n'a
+      pas change sont repris du rafraichissement precedent (un appel tokentx)
+    - avec le plan PRO, un addresstokenbalance par adresse couvre tous ses tokens
+    - le reste (tokenbalance unitaires) est lance en parallele sous la limite de debit
+    """
+
+    provider = "etherscan"
+
+    def __init__(self, verify_ssl=True, heads=None):
+        self.verify_ssl = verify_ssl
+        self.heads = wallet_heads if heads is None else heads
+        self._native = {}
+        self._tokens = {}
+
+    def add_native(self, address):
+        """Demande le solde ETH d'une adresse. Retourne la cle du resultat."""
+        key = native_key(address)
+        self._native.setdefault(key, address)
+        return key
+
+    def add_token(self, address, contract_address, decimals):
+        """Demande le solde d'un token ERC-20. Retourne la cle du resultat."""
+        key = token_key(address, contract_address)
+        self._tokens.setdefault(key, (address, contract_address, decimals))
+        return key
+
+    def plan_key(self):
+        """Identifiant stable de l'ensemble des soldes demandes (cle de cache)."""
+        return tuple(sorted(self._native)) + tuple(sorted(self._tokens))
+
+    def call_count(self):
+        """Nombre maximum d'appels Etherscan que execute() va emettre (toutes tetes changees)."""
+        native_calls = -(-len(self._native) // BALANCEMULTI_MAX_ADDRESSES)
+        addresses = len({address.lower() for address, _, _ in self._tokens.values()})
+        if ETHERSCAN_PRO_PLAN:
+            token_calls = addresses
+        else:
+            token_calls = len(self._tokens)
+        return native_calls + addresses + token_calls
+
+    def execute(self):
+        """
+        Execute le plan
+
+        Les soldes ETH et les tetes ERC-20 des adresses sont lus en premier;
+        seuls les tokens des adresses dont la tete a change sont ensuite relus.
+
+        Returns:
+            dict: cle -> solde (float) ou exception si la lecture a echoue
+        """
+        results = {}
+        jobs = {}
+
+        addresses = list(self._native.values())
+        for start in range(0, len(addresses), BALANCEMULTI_MAX_ADDRESSES):
+            chunk = addresses[start:start + BALANCEMULTI_MAX_ADDRESSES]
+            jobs[("balancemulti", start)] = (self._fetch_native, (chunk,), {})
+
+        by_address = {}
+        for key, (address, contract_address, decimals) in self._tokens.items():
+            by_address.setdefault(address.lower(), []).append((key, contract_address, decimals))
+        for address in by_address:
+            jobs[("head", address)] = (self._fetch_head, (address,), {})
+
+        heads = {}
+        for name, partial in run_parallel(jobs, pool=self.provider).items():
+            if name[0] == "head":
+                heads[name[1]] = partial
+            else:
+                results.update(partial)
+
+        jobs = {}
+        for address, wanted in by_address.items():
+            head = heads[address]
+            if head is not None:
+                unchanged = self.heads.balances_if_unchanged(address, head, [key for key, _, _ in wanted])
+                if unchanged is not None:
+                    results.update(unchanged)
+                    continue
+            if ETHERSCAN_PRO_PLAN:
+                jobs[("addresstokenbalance", address)] = (self._fetch_address_tokens, (address, wanted), {})
+            else:
+                for key, contract_address, decimals in wanted:
+                    jobs[key] = (self._fetch_token, (key, address, contract_address, decimals), {})
+
+        fetched = {}
+        for partial in run_parallel(jobs, pool=self.provider).values():
+            fetched.update(partial)
+        results.update(fetched)
+
+        # Une tete n'est memorisee qu'avec tous les soldes de l'adresse
+        for address, wanted in by_address.items():
+            head = heads[address]
+            balances = {key: fetched[key] for key, _, _ in wanted if key in fetched}
+            if head is not None and len(balances) == len(wanted) and all(
+                not isinstance(value, Exception) for value in balances.values()
+            ):
+                self.heads.store(address, head, balances)
+        return results
+
+    def _fetch_head(self, address):
+        # Sans tete (erreur), les tokens de l'adresse sont relus
+        try:
+            return get_token_head(address, verify_ssl=self.verify_ssl)
+        except Exception as e:
+            print(f"Tete ERC-20 indisponible pour {address}: {e}")
+            return None
+
+    def _fetch_native(self, addresses):
+        try:
+            rows = etherscan_v2_call(
+                "balancemulti",
+                verify_ssl=self.verify_ssl,
+                address=",".join(addresses),
+                tag="latest",
+            )
+        except Exception as e:
+            return {native_key(address): e for address in addresses}
+        balances = {native_key(row["account"]): int(row["balance"]) / (10 ** 18) for row in rows}
+        for address in addresses:
+            balances.setdefault(native_key(address), RuntimeError(f"Solde ETH absent pour {address}"))
+        return balances
+
+    def _fetch_token(self, key, address, contract_address, decimals):
+        try:
+            return {key: get_token_balance_v2(address, contract_address, decimals, verify_ssl=self.verify_ssl)}
+        except Exception as e:
+            return {key: e}
+
+    def _fetch_address_tokens(self, address, wanted):
+        holdings = {}
+        page = 1
+        try:
+            while True:
+                rows = etherscan_v2_call(
+                    "addresstokenbalance",
+                    verify_ssl=self.verify_ssl,
+                    address=address,
+                    page=page,
+                    offset=TOKENBALANCE_PAGE_SIZE,
+                )
+                for row in rows:
+                    holdings[row["TokenAddress"].lower()] = int(row["TokenQuantity"])
+                if len(rows) < TOKENBALANCE_PAGE_SIZE:
+                    break
+                page += 1
+        except Exception as e:
+            return {key: e for key, _, _ in wanted}
+        # Un token absent de la liste a un solde nul
+        return {
+            key: holdings.get(contract_address.lower(), 0) / (10 ** decimals)
+            for key, contract_address, decimals in wanted
+        }
@@ -0,0 +1,156 @@
+"""
+Lecture des soldes EVM par lots JSON-RPC (alternative a Etherscan)
+
+Tous les eth_getBalance et balanceOf ERC-20 d'un rafraichissement partent
+dans un seul lot JSON-RPC vers le noeud configure (EVM_RPC_URL): un aller-retour
+HTTP au lieu d'un appel Etherscan par solde, sans la limite de 5 appels/s.
+"""
+from .config import BASE_URLS
+from .fetch_engine import run_parallel, throttle
+from .resilience import guarded_call
+from .etherscan import native_key, token_key
+from . import http_client
+
+# Point d'acces JSON-RPC du noeud (Infura, Alchemy, noeud local...)
+EVM_RPC_URL = BASE_URLS["evm_rpc"]
+
+# Nombre maximum de requetes par lot (limite courante des fournisseurs RPC)
+RPC_BATCH_MAX = 100
+
+# Selecteur de balanceOf(address)
+BALANCE_OF_SELECTOR = "0x70a08231"
+
+
+class RpcError(RuntimeError):
+    """Erreur renvoyee par le noeud pour une requete du lot."""
+
+
+def rpc_batch_call(calls, verify_ssl=True):
+    """
+    Envoie un lot JSON-RPC et retourne les resultats dans l'ordre des appels
+
+    Args:
+        calls (list): [(methode, params)]
+
+    Returns:
+        list: resultat de chaque appel, ou RpcError si le noeud l'a refuse
+    """
+    return guarded_call("evm_rpc", _rpc_batch_request, calls, verify_ssl)
+
+
+def _rpc_batch_request(calls, verify_ssl):
+    if not EVM_RPC_URL:
+        raise RuntimeError("EVM_RPC_URL non configure")
+    payload = [
+        {"jsonrpc": "2.0", "id": index, "method": method, "params": params}
+        for index, (method, params) in enumerate(calls)
+    ]
+    throttle("evm_rpc")
+    response = http_client.post(EVM_RPC_URL, json=payload, verify=verify_ssl)
+    response.raise_for_status()
+    replies = response.json()
+    if not isinstance(replies, list):
+        # Lot refuse en bloc (noeud sans support des lots, quota...)
+        error = replies.get("error", replies) if isinstance(replies, dict) else replies
+        raise RuntimeError(f"Lot JSON-RPC refuse: {error}")
+
+    # Les reponses d'un lot peuvent arriver dans n'importe quel ordre
+    by_id = {reply.get("id"): reply for reply in replies}
+    results = []
+    for index in range(len(calls)):
+        reply = by_id.get(index)
+        if reply is None:
+            results.append(RpcError("reponse absente du lot"))
+        elif "error" in reply:
+            results.append(RpcError(f"{reply['error'].get('code')}: {reply['error'].get('message')}"))
+        else:
+            results.append(reply.get("result"))
+    return results
+
+
+def balance_of_call(address, contract_address):
+    """Appel eth_call de balanceOf(address) sur un contrat ERC-20."""
+    data = BALANCE_OF_SELECTOR + address.lower().removeprefix("0x").rjust(64, "0")
+    return "eth_call", [{"to": contract_address, "data": data}, "latest"]
+
+
+def decode_quantity(value):
+    """Convertit une quantite hexadecimale JSON-RPC en entier."""
+    if not isinstance(value, str) or not value.startswith("0x") or value == "0x":
+        raise RpcError(f"quantite invalide: {value!r}")
+    return int(value, 16)
+
+
+def get_token_balance_rpc(address, contract_address, decimals, verify_ssl=True):
+    """Equivalent JSON-RPC de get_token_balance_v2 (un seul appel)."""
+    [raw] = rpc_batch_call([balance_of_call(address, contract_address)], verify_ssl=verify_ssl)
+    if isinstance(raw, Exception):
+        raise raw
+    return decode_quantity(raw) / (10 ** decimals)
+
+
+class RpcBalancePlanner:
+    """
+    Meme interface que etherscan.BalancePlanner, lue par lots JSON-RPC
+
+    Les demandes identiques sont dedupliquees; tous les soldes tiennent dans
+    un lot (par tranches de RPC_BATCH_MAX, lancees en parallele).
+    """
+
+    provider = "evm_rpc"
+
+    def __init__(self, verify_ssl=True):
+        self.verify_ssl = verify_ssl
+        self._calls = {}
+
+    def add_native(self, address):
+        """Demande le solde ETH d'une adresse. Retourne la cle du resultat."""
+        key = native_key(address)
+        self._calls.setdefault(key, (("eth_getBalance", [address, "latest"]), 18))
+        return key
+
+    def add_token(self, address, contract_address, decimals):
+        """Demande le solde d'un token ERC-20. Retourne la cle du resultat."""
+        key = token_key(address, contract_address)
+        self._calls.setdefault(key, (balance_of_call(address, contract_address), decimals))
+        return key
+
+    def plan_key(self):
+        """Identifiant stable de l'ensemble des soldes demandes (cle de cache)."""
+        return tuple(sorted(self._calls))
+
+    def call_count(self):
+        """Nombre de requetes HTTP que execute() va emettre."""
+        return -(-len(self._calls) // RPC_BATCH_MAX)
+
+    def execute(self):
+        """
+        Execute le plan
+
+        Returns:
+            dict: cle -> solde (float) ou exception si la lecture a echoue
+        """
+        keys = list(self._calls)
+        jobs = {}
+        for start in range(0, len(keys), RPC_BATCH_MAX):
+            jobs[start] = (self._fetch_batch, (keys[start:start + RPC_BATCH_MAX],), {})
+        results = {}
+        for partial in run_parallel(jobs, pool=self.provider).values():
+            results.update(partial)
+        return results
+
+    def _fetch_batch(self, keys):
+        try:
+            replies = rpc_batch_call([self._calls[key][0] for key in keys], verify_ssl=self.verify_ssl)
+        except Exception as e:
+            return {key: e for key in keys}
+        balances = {}
+        for key, reply in zip(keys, replies):
+            decimals = self._calls[key][1]
+            try:
+                if isinstance(reply, Exception):
+                    raise reply
+                balances[key] = decode_quantity(reply) / (10 ** decimals)
+            except RpcError as e:
+                balances[key] = e
+        return balances
@@ -0,0 +1,197 @@
+"""
+Moteur de recuperation concurrente des donnees des fournisseurs
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .cassette import is_fast_replay
+from .deadline import DeadlineExceeded, current_deadline
+
+# Limites de debit par fournisseur: (appels par seconde, rafale max)
+# Etherscan plan FREE: 5 appels/seconde. Avec une rafale de 1 et 4 jetons/s,
+# aucune fenetre glissante d'une seconde ne depasse 5 appels.
+RATE_LIMITS = {
+    "etherscan": (4, 1),
+    "evm_rpc": (10, 10),
+    "coinmarketcap": (0.5, 5),
+    "coingecko": (0.5, 2),
+    "xrpscan": (2, 2),
+    "hyperliquid": (5, 5),
+}
+
+# Nombre maximum de requetes simultanees par fournisseur lors d'un
+# eventail (fan-out) sur plusieurs portefeuilles
+PROVIDER_CONCURRENCY = {
+    "etherscan": 4,
+    "evm_rpc": 2,
+    "coinmarketcap": 1,
+    "coingecko": 1,
+    "xrpscan": 2,
+    "hyperliquid": 4,
+}
+
+# Nombre maximum de recuperations executees en parallele, par pool.
+# "providers" execute les recuperations de haut niveau, "calls" les appels
+# unitaires qu'elles lancent a leur tour (evite qu'un job attende un pool sature),
+# "background" les rafraichissements lances sans attendre leur resultat.
+# Un eventail d'appels limites en debit (Etherscan, JSON-RPC, Hyperliquid) part
+# dans le pool de son fournisseur (PROVIDER_CONCURRENCY threads): l'attente d'un
+# jeton n'occupe que ses threads, pas ceux de "calls" (couverture CMC...).
+MAX_WORKERS = {
+    "providers": 8,
+    "calls": 8,
+    "background": 2,
+}
+
+
+class TokenBucket:
+    """
+    Seau a jetons bloquant et thread-safe
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1, deadline=None):
+        """
+        Attend qu'un jeton soit disponible puis le consomme
+
+        Raises:
+            DeadlineExceeded: si le jeton n'arrive pas avant l'echeance
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None and wait > deadline.remaining():
+                raise DeadlineExceeded("limite de debit au-dela de l'echeance")
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_executors = {
+    name: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"fetch-{name}")
+    for name, workers in MAX_WORKERS.items()
+}
+_executors_lock = threading.Lock()
+
+
+def get_executor(pool):
+    """Pool d'execution partage: un nom de MAX_WORKERS ou un fournisseur de PROVIDER_CONCURRENCY."""
+    executor = _executors.get(pool)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(pool)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=PROVIDER_CONCURRENCY[pool], thread_name_prefix=f"fetch-{pool}"
+                )
+                _executors[pool] = executor
+    return executor
+
+
+def get_bucket(provider):
+    """Retourne le seau a jetons partage d'un fournisseur."""
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            rate, capacity = RATE_LIMITS.get(provider, (5, 5))
+            bucket = TokenBucket(rate, capacity)
+            _buckets[provider] = bucket
+        return bucket
+
+
+def throttle(provider):
+    """Bloque jusqu'a ce qu'un appel vers le fournisseur soit autorise."""
+    # Un rejeu rapide de cassette ne touche pas les fournisseurs: pas de limite
+    if is_fast_replay():
+        return
+    get_bucket(provider).acquire(deadline=current_deadline())
+
+
+def _submit(pool, func, *args, **kwargs):
+    # Le contexte (echeance courante) suit l'appel dans le thread du pool
+    context = contextvars.copy_context()
+    return get_executor(pool).submit(context.run, func, *args, **kwargs)
+
+
+def run_parallel(jobs, pool="providers"):
+    """
+    Execute des recuperations independantes en parallele
+
+    Args:
+        jobs (dict): nom -> (fonction, args, kwargs)
+        pool (str): pool d'execution ("providers", "calls" ou un fournisseur)
+
+    Returns:
+        dict: nom -> resultat, dans l'ordre des jobs
+    """
+    futures = {
+        name: _submit(pool, func, *args, **kwargs)
+        for name, (func, args, kwargs) in jobs.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def submit_call(func, *args, **kwargs):
+    """Lance un appel unitaire dans le pool "calls" et retourne son Future."""
+    return _submit("calls", func, *args, **kwargs)
+
+
+def submit_background(func, *args, **kwargs):
+    """Lance une tache en arriere-plan sans attendre son resultat (ni echeance)."""
+    return _executors["background"].submit(func, *args, **kwargs)
+
+
+async def run_in_pool(func, *args, pool="providers", **kwargs):
+    """
+    Adaptateur asynchrone: execute un appel bloquant dans un pool borne
+
+    Les appels fournisseurs restent synchrones (pool HTTP partage), mais
+    l'attente se fait sans bloquer la boucle asyncio ni creer de thread
+    par appelant: la concurrence est bornee par la taille du pool.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(pool), functools.partial(context.run, func, *args, **kwargs))
+
+
+def provider_semaphores():
+    """
+    Semaphores asyncio bornant la concurrence de chaque fournisseur
+
+    A creer dans la boucle qui les utilise (une fois par rafraichissement):
+    l'attente se fait dans la boucle, sans occuper de thread du pool.
+    """
+    return {provider: asyncio.Semaphore(limit) for provider, limit in PROVIDER_CONCURRENCY.items()}
+
+
+async def run_limited(semaphore, func, *args, pool="providers", **kwargs):
+    """run_in_pool borne par un semaphore de fournisseur."""
+    async with semaphore:
+        return await run_in_pool(func, *args, pool=pool, **kwargs)
+
+
+def run_coroutine_sync(coro):
+    """Execute une coroutine depuis du code synchrone et retourne son resultat."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Une boucle tourne deja dans ce thread: on ne peut pas la bloquer,
+    # la coroutine est executee dans une boucle dediee sur un autre thread.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
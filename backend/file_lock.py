@@ -0,0 +1,64 @@
+"""
+Verrou de fichier inter-processus (plusieurs workers, Streamlit + Flask, cron)
+"""
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Verrou exclusif sur un fichier .lock, utilisable comme gestionnaire de contexte
+
+    Le verrou est libere par le systeme si le processus meurt: pas de verrou orphelin.
+    """
+
+    def __init__(self, path, timeout=None, poll=0.05):
+        self.path = path
+        self.timeout = timeout
+        self.poll = poll
+        self._fd = None
+
+    def acquire(self):
+        """Attend le verrou (au plus timeout secondes). Retourne False si non obtenu."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        started = time.monotonic()
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                self._fd = fd
+                return True
+            except OSError:
+                if self.timeout is not None and time.monotonic() - started >= self.timeout:
+                    os.close(fd)
+                    return False
+                time.sleep(self.poll)
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        if not self.acquire():
+            raise TimeoutError(f"Verrou {self.path} non obtenu")
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
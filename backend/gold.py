@@ -0,0 +1,167 @@
+"""
+Prix de l'or pour le seuil du nisab (GoldAPI), en cache disque journalier
+
+Le prix (USD par gramme, 24 carats) est persiste dans GOLD_PRICE_FILE avec
+l'heure du dernier appel: tous les processus (Flask, Streamlit, alerte
+quotidienne) partagent ce fichier et au plus un appel part par GOLD_PRICE_TTL,
+sous verrou de fichier. Si l'appel echoue, la derniere valeur connue est servie.
+"""
+import json
+import os
+import threading
+import time
+from .config import BASE_URLS, GOLDAPI_API_KEY, GOLD_PRICE_FILE, GOLD_PRICE_TTL
+from .cassette import is_replaying
+from .deadline import DeadlineExceeded, current_deadline
+from .file_lock import FileLock
+from . import http_client
+
+GOLDAPI_URL = f"{BASE_URLS['goldapi']}/api/XAU/USD"
+
+# Prix utilise tant qu'aucun prix n'a jamais ete lu (USD par gramme)
+DEFAULT_GOLD_PRICE = 69.28
+
+# Attente maximale du verrou quand un autre processus interroge deja GoldAPI
+LOCK_TIMEOUT = 10
+
+GRAMS_PER_OUNCE = 31.1035
+
+
+def fetch_gold_quote(api_key, verify_ssl=True):
+    """Cotation XAU/USD brute de GoldAPI (leve une exception en cas d'echec)."""
+    response = http_client.get(
+        GOLDAPI_URL,
+        headers={"x-access-token": api_key, "Content-Type": "application/json"},
+        verify=verify_ssl,
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"GoldAPI HTTP {response.status_code}: {response.text}")
+    return response.json()
+
+
+def fetch_data_with_GOLD(api_key, verify_ssl=True):
+    """Récupère le prix de l'or (None en cas d'erreur)"""
+    try:
+        return fetch_gold_quote(api_key, verify_ssl)
+    except Exception as e:
+        print(f"Exception lors de la récupération des données de l'or: {e}")
+        return None
+
+
+def gram_price(quote):
+    """Prix USD d'un gramme d'or 24 carats d'apres une cotation GoldAPI."""
+    if quote.get("price_gram_24k"):
+        return float(quote["price_gram_24k"])
+    return float(quote["price"]) / GRAMS_PER_OUNCE
+
+
+class GoldPriceCache:
+    """
+    Prix de l'or partage entre processus via un fichier JSON
+
+    Le fichier contient le dernier prix lu ("price", "ts") et l'heure du
+    dernier appel ("attempted_at"), reussi ou non: un echec compte aussi
+    dans la limite d'un appel par TTL.
+    """
+
+    def __init__(self, path=GOLD_PRICE_FILE, ttl=GOLD_PRICE_TTL, api_key=GOLDAPI_API_KEY):
+        self.path = path
+        self.ttl = ttl
+        self.api_key = api_key
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Cache du prix de l'or illisible, ignore: {e}")
+            return {}
+
+    def _write(self, entry):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Impossible d'ecrire le cache du prix de l'or: {e}")
+
+    def _is_due(self, entry):
+        return time.time() - entry.get("attempted_at", 0) >= self.ttl
+
+    def last_price(self):
+        """Retourne (prix, horodatage) du dernier prix lu, sans appel reseau, ou None."""
+        entry = self._entry if self._entry is not None else self._read()
+        if entry.get("price") is None:
+            return None
+        return entry["price"], entry["ts"]
+
+    def get_price(self, verify_ssl=True):
+        """Prix USD du gramme d'or: cache du jour, sinon un appel GoldAPI, sinon dernier prix connu."""
+        entry = self._entry
+        if entry is None or self._is_due(entry):
+            with self._lock:
+                entry = self._entry
+                if entry is None or self._is_due(entry):
+                    entry = self._refresh(verify_ssl)
+                    self._entry = entry
+        return entry.get("price", DEFAULT_GOLD_PRICE)
+
+    def _refresh(self, verify_ssl):
+        # Un autre processus a peut-etre deja lu le prix du jour
+        entry = self._read()
+        if not self._is_due(entry) or not self.api_key:
+            return entry
+        if is_replaying():
+            # Prix rejoue: ni ecrit sur disque, ni compte comme appel du jour
+            try:
+                return dict(entry, **self._fetch(verify_ssl))
+            except Exception:
+                return entry
+        deadline = current_deadline()
+        timeout = LOCK_TIMEOUT if deadline is None else min(LOCK_TIMEOUT, deadline.remaining())
+        lock = FileLock(f"{self.path}.lock", timeout=timeout)
+        if not lock.acquire():
+            return entry
+        try:
+            entry = self._read()
+            if not self._is_due(entry):
+                return entry
+            try:
+                entry.update(self._fetch(verify_ssl))
+            except DeadlineExceeded as e:
+                if not e.sent:
+                    # Budget epuise avant l'envoi: aucun appel, il sera retente
+                    return entry
+                # Appel parti puis abandonne: il compte dans la limite d'un appel par TTL
+                print(f"Prix de l'or hors budget, dernier prix connu conserve: {e}")
+            except Exception as e:
+                print(f"Prix de l'or indisponible, dernier prix connu conserve: {e}")
+            entry["attempted_at"] = time.time()
+            self._write(entry)
+            return entry
+        finally:
+            lock.release()
+
+    def _fetch(self, verify_ssl):
+        return {"price": gram_price(fetch_gold_quote(self.api_key, verify_ssl)), "ts": time.time()}
+
+
+# Cache partage par le processus
+gold_price_cache = GoldPriceCache()
+
+
+def get_gold_price(verify_ssl=True):
+    """Prix USD du gramme d'or pour le nisab (voir GoldPriceCache.get_price)."""
+    return gold_price_cache.get_price(verify_ssl)
+
+
+def last_gold_price():
+    """Dernier prix connu sans appel reseau (DEFAULT_GOLD_PRICE si aucun)."""
+    last = gold_price_cache.last_price()
+    return DEFAULT_GOLD_PRICE if last is None else last[0]
@@ -0,0 +1,250 @@
+"""
+Historique des soldes: facade commune aux backends de stockage
+
+Les lecteurs (graphiques, evolution 24h, seuil du nisab, cadence) passent par
+ces fonctions au lieu de relire data_crypto.csv. Le backend est choisi par
+HISTORY_BACKEND: "csv" (data_crypto.csv, par defaut), "sqlite" (table
+indexee par (crypto, horodatage), voir history_sqlite.py) ou "columnar"
+(colonnes binaires projetees en memoire, voir history_columnar.py).
+
+Le backend SQLite est compacte au plus une fois par heure (agregats horaires
+puis journaliers, retention HISTORY_RAW_DAYS / HISTORY_HOURLY_DAYS). Les
+backends CSV et colonnaire gardent tous les snapshots: le colonnaire les
+reduit a la resolution demandee sur ses colonnes projetees, load_history
+reduit ceux du CSV en memoire.
+
+Les horodatages sont des secondes entieres depuis 1970 de l'heure locale
+naive ecrite dans le CSV (sans fuseau: pas de saut aux changements d'heure).
+"""
+import calendar
+import csv
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+from .config import (
+    DATA_FILE,
+    HISTORY_BACKEND,
+    HISTORY_DB_FILE,
+    HISTORY_COLUMNAR_DIR,
+    HISTORY_RAW_DAYS,
+    HISTORY_HOURLY_DAYS,
+    HISTORY_COALESCE_SECONDS,
+)
+from .file_lock import FileLock
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Nombre de lignes CSV importees par transaction
+IMPORT_BATCH = 5000
+
+# Points par crypto au plus dans les graphiques (load_history(max_points=...))
+CHART_MAX_POINTS = 1000
+
+# Intervalle minimal entre deux compactages declenches par save_snapshot (s)
+COMPACT_INTERVAL = 3600
+
+_EPOCH = datetime(1970, 1, 1)
+
+_store = None
+_writer = None
+_store_lock = threading.Lock()
+_last_compaction = None
+
+
+def to_epoch(value):
+    """Horodatage entier d'une date (datetime ou chaine DATE_FORMAT)."""
+    if isinstance(value, str):
+        value = datetime.strptime(value, DATE_FORMAT)
+    return calendar.timegm(value.timetuple())
+
+
+def from_epoch(ts):
+    """Date naive d'un horodatage entier."""
+    return _EPOCH + timedelta(seconds=int(ts))
+
+
+def open_store(backend):
+    """Ouvre le backend d'historique backend ("csv", "sqlite" ou "columnar")."""
+    if backend == "sqlite":
+        from .history_sqlite import SqliteHistoryStore
+
+        return SqliteHistoryStore(HISTORY_DB_FILE, raw_days=HISTORY_RAW_DAYS, hourly_days=HISTORY_HOURLY_DAYS)
+    if backend == "columnar":
+        from .history_columnar import ColumnarHistoryStore
+
+        return ColumnarHistoryStore(HISTORY_COLUMNAR_DIR)
+    from .history_csv import CsvHistoryStore
+
+    return CsvHistoryStore(DATA_FILE)
+
+
+def _create_store(backend):
+    store = open_store(backend)
+    # Premiere ouverture d'un backend binaire: reprise de l'historique CSV existant.
+    # Sous le verrou des ecrivains et verifie a nouveau: un seul worker importe
+    if backend != "csv" and store.is_empty() and os.path.exists(DATA_FILE):
+        with FileLock(store.lock_path):
+            if store.is_empty():
+                count = import_csv(DATA_FILE, store)
+                print(f"Historique CSV importe ({backend}): {count} lignes")
+    return store
+
+
+def get_store():
+    """Backend d'historique du processus (cree a la premiere utilisation)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _create_store(HISTORY_BACKEND)
+    return _store
+
+
+def get_writer():
+    """Ecrivain de l'historique du processus (verrou inter-processus, fusion des snapshots)."""
+    global _writer
+    if _writer is None:
+        store = get_store()
+        with _store_lock:
+            if _writer is None:
+                from .history_writer import HistoryWriter
+
+                _writer = HistoryWriter(store, coalesce=HISTORY_COALESCE_SECONDS)
+    return _writer
+
+
+def save_snapshot(token_balance, when=None):
+    """
+    Ajoute un snapshot (une ligne par crypto) a l'historique
+
+    Le snapshot passe par le tampon de l'ecrivain puis est ecrit en entier sous
+    verrou (voir history_writer.py); un snapshot trop proche d'un autre est
+    fusionne ou ignore. flush_history() l'ecrit sans attendre.
+
+    Returns:
+        str: horodatage du snapshot au format DATE_FORMAT
+    """
+    when = when or datetime.now()
+    ts = to_epoch(when)
+    get_writer().submit(ts, [(ts, crypto, float(value)) for crypto, value in token_balance.items()])
+    _schedule_compaction()
+    return from_epoch(ts).strftime(DATE_FORMAT)
+
+
+def flush_history():
+    """Ecrit les snapshots encore dans le tampon. Retourne le nombre de snapshots ecrits."""
+    return get_writer().flush() if _writer is not None else 0
+
+
+def _schedule_compaction():
+    """Lance compact_history en arriere-plan, au plus une fois par COMPACT_INTERVAL."""
+    global _last_compaction
+    if not hasattr(get_store(), "compact"):
+        return
+    now = time.monotonic()
+    with _store_lock:
+        if _last_compaction is not None and now - _last_compaction < COMPACT_INTERVAL:
+            return
+        _last_compaction = now
+    from .fetch_engine import submit_background
+
+    submit_background(compact_history)
+
+
+def compact_history(now=None):
+    """Agrege et purge l'historique selon la retention (backend SQLite uniquement)."""
+    store = get_store()
+    if not hasattr(store, "compact"):
+        return
+    try:
+        store.compact(to_epoch(now or datetime.now()))
+    except Exception as e:
+        print(f"Erreur lors du compactage de l'historique: {e}")
+
+
+def _downsample(frame, resolution):
+    """Garde la derniere ligne de chaque crypto par tranche de resolution secondes."""
+    if not resolution or resolution <= 1 or frame.empty:
+        return frame
+    keys = pd.DataFrame({"bucket": frame["ts"].to_numpy() // resolution, "crypto": frame["crypto"].to_numpy()})
+    return frame[~keys.duplicated(keep="last").to_numpy()]
+
+
+def load_history(start=None, end=None, resolution=None, max_points=None):
+    """
+    Lignes de l'historique entre deux dates (incluses, None: sans borne)
+
+    Args:
+        resolution (int): au plus une ligne par crypto et par tranche de resolution secondes
+        max_points (int): resolution choisie pour garder environ max_points lignes par crypto
+
+    Returns:
+        pandas.DataFrame: colonnes Date (datetime), Crypto, Valeur, par date croissante
+    """
+    store = get_store()
+    start = to_epoch(start) if start is not None else None
+    end = to_epoch(end) if end is not None else None
+    if max_points and not resolution:
+        bounds = store.bounds()
+        if bounds is not None:
+            low = bounds[0] if start is None else max(start, bounds[0])
+            high = bounds[1] if end is None else min(end, bounds[1])
+            resolution = -(-(high - low) // max_points) if high > low else None
+    frame = _downsample(store.query(start, end, resolution=resolution), resolution)
+    return pd.DataFrame({
+        "Date": pd.to_datetime(frame["ts"].to_numpy(dtype="int64"), unit="s"),
+        "Crypto": frame["crypto"].to_numpy(),
+        "Valeur": frame["value"].to_numpy(dtype="float64"),
+    })
+
+
+def latest_values(at=None):
+    """Derniere valeur de chaque crypto a la date at (maintenant par defaut)."""
+    return get_store().latest_per_token(to_epoch(at or datetime.now()))
+
+
+def first_values(since, until=None):
+    """Premiere valeur de chaque crypto dans ]since, until]."""
+    return get_store().first_per_token(to_epoch(since), to_epoch(until or datetime.now()))
+
+
+def iter_totals_desc():
+    """Total de chaque snapshot, du plus recent au plus ancien: (datetime, total)."""
+    for ts, total in get_store().iter_totals_desc():
+        yield from_epoch(ts), total
+
+
+def recent_totals(count):
+    """Totaux des count derniers snapshots, par date croissante: [(datetime, total)]."""
+    return [(from_epoch(ts), total) for ts, total in get_store().recent_totals(count)]
+
+
+def import_csv(path, store=None):
+    """Importe un CSV Date,Crypto,Valeur par lots. Retourne le nombre de lignes."""
+    store = store or get_store()
+    count = 0
+    for chunk in pd.read_csv(path, chunksize=IMPORT_BATCH):
+        ts = pd.to_datetime(chunk["Date"], format=DATE_FORMAT).to_numpy(dtype="datetime64[s]").astype("int64")
+        rows = list(zip(ts.tolist(), chunk["Crypto"].astype(str), chunk["Valeur"].astype(float)))
+        store.append(rows)
+        count += len(rows)
+    # Le CSV n'est pas toujours chronologique: tri unique apres import
+    if hasattr(store, "rewrite_sorted"):
+        store.rewrite_sorted()
+    return count
+
+
+def export_csv(path, store=None):
+    """Exporte tout l'historique au format Date,Crypto,Valeur. Retourne le nombre de lignes."""
+    frame = (store or get_store()).query(None, None)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Crypto", "Valeur"])
+        for ts, crypto, value in zip(frame["ts"], frame["crypto"], frame["value"]):
+            writer.writerow([from_epoch(ts).strftime(DATE_FORMAT), crypto, value])
+    os.replace(tmp_path, path)
+    return len(frame)
@@ -0,0 +1,324 @@
+"""
+Historique des soldes au format colonnaire binaire, lu par projection memoire
+
+Un repertoire contient une colonne par fichier, ajoutee en fin de fichier:
+    ts.<g>.i64     horodatages (int64 little-endian)
+    token.<g>.u16  codes des cryptos (uint16, index dans meta.json["tokens"])
+    value.<g>.f64  valeurs USD (float64)
+    meta.json      nombre de lignes validees, table des cryptos, ordre des ts,
+                   generation <g> des fichiers de colonnes, premiere et derniere
+                   ligne de chaque crypto (dernieres valeurs sans parcours)
+
+meta.json est remplace atomiquement apres l'ajout des colonnes: c'est le point
+de validation d'un snapshot (un lecteur ne voit jamais un snapshot a moitie
+ecrit, des octets au-dela de "rows" sont ignores puis ecrases). Un ajout hors
+ordre (horloge revenue en arriere) est suivi d'une reecriture triee, qui produit
+une nouvelle generation de fichiers: les colonnes restent triees par ts. Les lectures
+travaillent sur des vues numpy des fichiers projetes (np.memmap): aucune
+analyse, et seules les pages de la fenetre demandee sont chargees.
+"""
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from .file_lock import FileLock
+
+FORMAT_VERSION = 1
+
+COLUMNS = {
+    "ts": ("ts.{}.i64", np.dtype("<i8")),
+    "token": ("token.{}.u16", np.dtype("<u2")),
+    "value": ("value.{}.f64", np.dtype("<f8")),
+}
+
+# Lignes parcourues a la fois en lecture a rebours (totaux, dernieres valeurs)
+SCAN_BLOCK = 65536
+
+
+def _first_last_rows(token, count):
+    """Premiere et derniere position de chaque code dans une colonne de codes (-1: absent)."""
+    first_row, last_row = [-1] * count, [-1] * count
+    codes, index = np.unique(token, return_index=True)
+    for code, position in zip(codes.tolist(), index.tolist()):
+        first_row[code] = position
+    codes, index = np.unique(token[::-1], return_index=True)
+    for code, position in zip(codes.tolist(), index.tolist()):
+        last_row[code] = len(token) - 1 - position
+    return first_row, last_row
+
+
+class ColumnarHistoryStore:
+    """
+    Backend d'historique colonnaire (un ecrivain a la fois, lecteurs sans verrou)
+
+    Attributes:
+        path (str): repertoire des colonnes
+        lock_path (str): verrou des ecrivains (history_writer)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Distinct du verrou "lock" pris par append: history_writer le tient autour d'append
+        self.lock_path = os.path.join(path, "writer.lock")
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._view = None
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _column_file(self, column, meta):
+        return self._file(COLUMNS[column][0].format(meta["generation"]))
+
+    def _read_meta(self):
+        try:
+            with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": FORMAT_VERSION, "rows": 0, "tokens": [], "sorted": True, "generation": 0}
+
+    def _write_meta(self, meta):
+        tmp_path = self._file(f"meta.json.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def is_empty(self):
+        return self._read_meta()["rows"] == 0
+
+    def append(self, rows):
+        """Ajoute des lignes (ts, crypto, value) et les valide en une fois."""
+        if not rows:
+            return
+        ts = np.fromiter((row[0] for row in rows), dtype="<i8", count=len(rows))
+        value = np.fromiter((row[2] for row in rows), dtype="<f8", count=len(rows))
+        with FileLock(self._file("lock")):
+            meta = self._read_meta()
+            tokens = meta["tokens"]
+            codes = {name: code for code, name in enumerate(tokens)}
+            for _, crypto, _ in rows:
+                if crypto not in codes:
+                    codes[crypto] = len(tokens)
+                    tokens.append(crypto)
+            token = np.fromiter((codes[row[1]] for row in rows), dtype="<u2", count=len(rows))
+            last_ts = self._last_ts(meta)
+            for column, data in (("ts", ts), ("token", token), ("value", value)):
+                dtype = COLUMNS[column][1]
+                with open(self._column_file(column, meta), "ab") as f:
+                    # Octets d'un ajout interrompu (non valide): ecrases
+                    f.truncate(meta["rows"] * dtype.itemsize)
+                    f.write(data.tobytes())
+            in_order = (last_ts is None or ts[0] >= last_ts) and bool(np.all(ts[1:] >= ts[:-1]))
+            first_row, last_row = self._token_rows(meta)
+            first_row += [-1] * (len(tokens) - len(first_row))
+            last_row += [-1] * (len(tokens) - len(last_row))
+            for position, code in enumerate(token.tolist(), start=meta["rows"]):
+                if first_row[code] < 0:
+                    first_row[code] = position
+                last_row[code] = position
+            meta.update(rows=meta["rows"] + len(rows), tokens=tokens, sorted=meta["sorted"] and in_order,
+                        first_row=first_row, last_row=last_row)
+            if meta["sorted"]:
+                self._write_meta(meta)
+            else:
+                # Hors ordre: nouvelle generation triee (les lignes ajoutees sont validees avec elle)
+                self._rewrite_sorted(meta)
+
+    def _last_ts(self, meta):
+        if meta["rows"] == 0:
+            return None
+        with open(self._column_file("ts", meta), "rb") as f:
+            f.seek((meta["rows"] - 1) * 8)
+            return int(np.frombuffer(f.read(8), dtype="<i8")[0])
+
+    def _token_rows(self, meta):
+        """
+        (premiere ligne, derniere ligne) de chaque crypto, par code (-1: aucune)
+
+        Relues dans les colonnes pour un meta.json anterieur a ces index.
+        """
+        if "first_row" in meta and "last_row" in meta:
+            return list(meta["first_row"]), list(meta["last_row"])
+        token = np.empty(0, dtype=COLUMNS["token"][1])
+        if meta["rows"]:
+            token = np.fromfile(self._column_file("token", meta), dtype=token.dtype, count=meta["rows"])
+        return _first_last_rows(token, len(meta["tokens"]))
+
+    def rewrite_sorted(self):
+        """Reecrit les colonnes triees par ts (nouvelle generation) si necessaire."""
+        with FileLock(self._file("lock")):
+            meta = self._read_meta()
+            if not meta["sorted"]:
+                self._rewrite_sorted(meta)
+
+    def _rewrite_sorted(self, meta):
+        """Reecrit les colonnes de meta triees par ts et valide la nouvelle generation (sous le verrou "lock")."""
+        old = dict(meta)
+        columns = [
+            np.fromfile(self._column_file(column, meta), dtype=COLUMNS[column][1], count=meta["rows"])
+            for column in ("ts", "token", "value")
+        ]
+        order = np.argsort(columns[0], kind="stable")
+        columns = [data[order] for data in columns]
+        first_row, last_row = _first_last_rows(columns[1], len(meta["tokens"]))
+        meta.update(generation=meta["generation"] + 1, sorted=True, first_row=first_row, last_row=last_row)
+        for column, data in zip(("ts", "token", "value"), columns):
+            data.tofile(self._column_file(column, meta))
+        self._write_meta(meta)
+        # Les lecteurs qui projettent encore l'ancienne generation gardent leurs vues
+        for column in ("ts", "token", "value"):
+            try:
+                os.remove(self._column_file(column, old))
+            except OSError:
+                pass
+
+    def _columns(self):
+        """
+        Vues (ts, token, value) triees par ts, et table des cryptos
+
+        Les projections sont reutilisees tant que meta.json n'a pas change.
+        """
+        return self._mapped()[0]
+
+    def _mapped(self):
+        """(_columns(), (premiere ligne, derniere ligne) de chaque crypto dans ces vues)."""
+        try:
+            return self._map(self._read_meta())
+        except FileNotFoundError:
+            # Generation remplacee entre la lecture de meta.json et la projection
+            return self._map(self._read_meta())
+
+    def _map(self, meta):
+        with self._lock:
+            key = (meta["generation"], meta["rows"], len(meta["tokens"]))
+            view = self._view
+            if view is not None and view[0] == key:
+                return view[1]
+            rows = meta["rows"]
+            columns = []
+            for column in ("ts", "token", "value"):
+                dtype = COLUMNS[column][1]
+                if rows:
+                    columns.append(np.memmap(self._column_file(column, meta), dtype=dtype, mode="r", shape=(rows,)))
+                else:
+                    columns.append(np.empty(0, dtype=dtype))
+            if not meta["sorted"]:
+                # Historique d'une version qui ne triait qu'a l'import: copie triee
+                order = np.argsort(columns[0], kind="stable")
+                columns = [column[order] for column in columns]
+                token_rows = _first_last_rows(np.asarray(columns[1]), len(meta["tokens"]))
+            else:
+                token_rows = self._token_rows(meta)
+            result = (
+                (columns[0], columns[1], columns[2], np.array(meta["tokens"], dtype=object)),
+                tuple(np.array(positions, dtype="int64") for positions in token_rows),
+            )
+            self._view = (key, result)
+            return result
+
+    def bounds(self):
+        """(premier ts, dernier ts) de l'historique, ou None s'il est vide."""
+        ts = self._columns()[0]
+        return (int(ts[0]), int(ts[-1])) if len(ts) else None
+
+    def query(self, start=None, end=None, resolution=None):
+        """
+        Lignes de [start, end] (None: sans borne) par ts croissant: DataFrame ts, crypto, value
+
+        Avec resolution (secondes), seule la derniere ligne de chaque crypto par
+        tranche est gardee: la reduction est faite par blocs sur les vues
+        projetees, et seules les lignes gardees sont copiees et nommees.
+        """
+        ts, token, value, tokens = self._columns()
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side="right"))
+        if resolution and resolution > 1 and hi > lo:
+            rows = self._last_per_bucket(ts, token, len(tokens), lo, hi, int(resolution))
+        else:
+            rows = slice(lo, hi)
+        codes = np.asarray(token[rows])
+        return pd.DataFrame({
+            "ts": np.asarray(ts[rows], dtype="int64"),
+            "crypto": tokens[codes] if len(codes) else np.empty(0, dtype=object),
+            "value": np.asarray(value[rows], dtype="float64"),
+        })
+
+    @staticmethod
+    def _last_per_bucket(ts, token, count, lo, hi, resolution):
+        """Positions (croissantes) de la derniere ligne de chaque crypto par tranche de resolution dans [lo, hi)."""
+        kept = []
+        while lo < hi:
+            end = min(hi, lo + SCAN_BLOCK)
+            if end < hi:
+                # Un bloc s'arrete en fin de tranche: une tranche n'est jamais coupee
+                boundary = (int(ts[end - 1]) // resolution + 1) * resolution
+                end = min(hi, int(np.searchsorted(ts, boundary, side="left")))
+            keys = np.asarray(ts[lo:end]) // resolution * count + np.asarray(token[lo:end], dtype="int64")
+            _, index = np.unique(keys[::-1], return_index=True)
+            kept.append(np.sort(end - 1 - index))
+            lo = end
+        return np.concatenate(kept)
+
+    def latest_per_token(self, at):
+        """
+        Derniere valeur de chaque crypto avec ts <= at
+
+        La derniere ligne de chaque crypto est connue (meta.json): seules les
+        cryptos qui ont aussi des lignes apres at sont cherchees a rebours, par
+        blocs. Une crypto retiree ne fait pas remonter la lecture.
+        """
+        (ts, token, value, tokens), (first_row, last_row) = self._mapped()
+        hi = int(np.searchsorted(ts, at, side="right"))
+        values = {}
+        wanted = set()
+        for code, name in enumerate(tokens):
+            if first_row[code] < 0 or first_row[code] >= hi:
+                continue
+            if last_row[code] < hi:
+                values[name] = float(value[last_row[code]])
+            else:
+                wanted.add(code)
+        while hi > 0 and wanted:
+            lo = max(0, hi - SCAN_BLOCK)
+            codes = np.asarray(token[lo:hi])[::-1]
+            found, index = np.unique(codes, return_index=True)
+            for code, position in zip(found.tolist(), index):
+                if code in wanted:
+                    values[tokens[code]] = float(value[hi - 1 - position])
+                    wanted.discard(code)
+            hi = lo
+        return values
+
+    def first_per_token(self, since, until):
+        """Premiere valeur de chaque crypto avec since < ts <= until."""
+        ts, token, value, tokens = self._columns()
+        lo = np.searchsorted(ts, since, side="right")
+        hi = np.searchsorted(ts, until, side="right")
+        found, index = np.unique(np.asarray(token[lo:hi]), return_index=True)
+        return {tokens[code]: float(value[lo + position]) for code, position in zip(found, index)}
+
+    def iter_totals_desc(self):
+        """(ts, total) de chaque snapshot, du plus recent au plus ancien, par blocs."""
+        ts, _, value, _ = self._columns()
+        hi = len(ts)
+        while hi > 0:
+            lo = max(0, hi - SCAN_BLOCK)
+            if lo > 0:
+                # Ne pas couper un snapshot entre deux blocs
+                lo = int(np.searchsorted(ts[:hi], ts[lo], side="left"))
+            block = np.asarray(ts[lo:hi])
+            starts = np.flatnonzero(np.r_[True, block[1:] != block[:-1]])
+            sums = np.add.reduceat(np.asarray(value[lo:hi]), starts)
+            for index in range(len(starts) - 1, -1, -1):
+                yield int(block[starts[index]]), float(sums[index])
+            hi = lo
+
+    def recent_totals(self, count):
+        """(ts, total) des count derniers snapshots, par ts croissant."""
+        totals = []
+        for item in self.iter_totals_desc():
+            if len(totals) >= count:
+                break
+            totals.append(item)
+        return totals[::-1]
@@ -0,0 +1,235 @@
+"""
+Historique des soldes dans data_crypto.csv (Date,Crypto,Valeur, une ligne par crypto)
+
+Le fichier est lu une seule fois par processus, puis seuls les octets ajoutes
+depuis la derniere lecture sont analyses (suivi de fin de fichier). Une
+troncature ou un remplacement du fichier (rotation, export) provoque une
+relecture complete. Tous les lecteurs partagent les memes tableaux.
+"""
+import csv
+import io
+import os
+import threading
+import numpy as np
+import pandas as pd
+from .history import DATE_FORMAT, from_epoch
+
+COLUMNS = ["Date", "Crypto", "Valeur"]
+
+# Octets du debut du fichier compares a chaque lecture (detection de reecriture)
+HEAD_BYTES = 256
+
+
+def _empty_frame():
+    return pd.DataFrame({"ts": pd.Series(dtype="int64"), "crypto": pd.Series(dtype=object),
+                         "value": pd.Series(dtype="float64")})
+
+
+def _parse(data, header):
+    """Analyse des lignes CSV completes en DataFrame ts, crypto, value."""
+    df = pd.read_csv(io.BytesIO(data), header=0 if header else None, names=None if header else COLUMNS)
+    if df.empty:
+        return _empty_frame()
+    ts = pd.to_datetime(df["Date"], format=DATE_FORMAT).to_numpy(dtype="datetime64[s]").astype("int64")
+    return pd.DataFrame({"ts": ts, "crypto": df["Crypto"].astype(str).to_numpy(dtype=object),
+                         "value": df["Valeur"].astype(float).to_numpy()})
+
+
+def _read_at(fd, offset, size):
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def _totals(frame):
+    """Total par snapshot: (ts uniques croissants, sommes)."""
+    totals = frame.groupby("ts", sort=True)["value"].sum()
+    return totals.index.to_numpy(dtype="int64"), totals.to_numpy(dtype="float64")
+
+
+class CsvHistoryStore:
+    """
+    Backend d'historique CSV (format historique du projet) avec cache de fin de fichier
+
+    Les colonnes sont gardees dans des tableaux numpy a capacite croissante:
+    un ajout ne recopie pas l'historique deja charge.
+
+    Attributes:
+        path (str): fichier CSV
+        lock_path (str): verrou des ecrivains (history_writer)
+        offset (int): octets deja analyses (lignes completes uniquement)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._lock = threading.Lock()
+        self._reset()
+
+    def append(self, rows):
+        """
+        Ajoute des lignes (ts, crypto, value) a la fin du fichier en une seule ecriture
+
+        Les appelants concurrents passent par history_writer (verrou lock_path).
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        buffer = io.StringIO(newline="")
+        writer = csv.writer(buffer)
+        for ts, crypto, value in rows:
+            writer.writerow([from_epoch(ts).strftime(DATE_FORMAT), crypto, value])
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and _read_at(fd, size - 1, 1) != b"\n":
+                # Ligne incomplete laissee par un processus interrompu: retiree
+                size = self._last_line_end(fd, size)
+                os.ftruncate(fd, size)
+            header = b""
+            if size == 0:
+                # Si le fichier est vide (ou n'avait qu'un en-tete incomplet), on ajoute les en-tetes
+                header = (",".join(COLUMNS) + "\r\n").encode()
+            os.write(fd, header + buffer.getvalue().encode())
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _last_line_end(fd, size):
+        """Position suivant le dernier saut de ligne du fichier (0 s'il n'y en a pas)."""
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            position = _read_at(fd, start, end - start).rfind(b"\n")
+            if position >= 0:
+                return start + position + 1
+            end = start
+        return 0
+
+    def _reset(self):
+        self.offset = 0
+        self._identity = None
+        self._head = b""
+        self._size = 0
+        self._ts = np.empty(0, dtype="int64")
+        self._crypto = np.empty(0, dtype=object)
+        self._value = np.empty(0, dtype="float64")
+        self._frame = _empty_frame()
+        self._totals = (np.empty(0, dtype="int64"), np.empty(0, dtype="float64"))
+        self._latest = {}
+
+    def _refresh(self):
+        """Analyse les octets ajoutes depuis la derniere lecture. Retourne le DataFrame partage."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._reset()
+                return self._frame
+            identity = (stat.st_dev, stat.st_ino)
+            with open(self.path, "rb") as f:
+                # Tronque puis reecrit au-dela de l'offset: le debut du fichier a change
+                head = f.read(HEAD_BYTES) if self.offset else b""
+                if identity != self._identity or stat.st_size < self.offset or head != self._head:
+                    # Nouveau fichier, remplace ou tronque: relecture complete
+                    self._reset()
+                    self._identity = identity
+                if stat.st_size == self.offset:
+                    return self._frame
+                f.seek(self.offset)
+                data = f.read(stat.st_size - self.offset)
+            # Une ligne en cours d'ecriture sera lue au prochain passage
+            end = data.rfind(b"\n") + 1
+            if end == 0:
+                return self._frame
+            if self.offset == 0:
+                self._head = data[:min(end, HEAD_BYTES)]
+            self._extend(_parse(data[:end], header=self.offset == 0))
+            self.offset += end
+            return self._frame
+
+    def _grow(self, needed):
+        capacity = len(self._ts)
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity, 1024)
+        for name in ("_ts", "_crypto", "_value"):
+            old = getattr(self, name)
+            grown = np.empty(capacity, dtype=old.dtype)
+            grown[:self._size] = old[:self._size]
+            setattr(self, name, grown)
+
+    def _extend(self, chunk):
+        if chunk.empty:
+            return
+        ts, crypto, value = chunk["ts"].to_numpy(), chunk["crypto"].to_numpy(), chunk["value"].to_numpy()
+        size = self._size
+        in_order = (size == 0 or ts[0] >= self._ts[size - 1]) and bool(np.all(ts[1:] >= ts[:-1]))
+        self._grow(size + len(ts))
+        self._ts[size:size + len(ts)] = ts
+        self._crypto[size:size + len(ts)] = crypto
+        self._value[size:size + len(ts)] = value
+        self._size = size = size + len(ts)
+        if in_order:
+            # Cas courant: snapshots ajoutes a la suite, cumuls mis a jour en O(lignes ajoutees)
+            totals_ts, sums = self._totals
+            new_ts, new_sums = _totals(chunk)
+            if len(totals_ts) and new_ts[0] == totals_ts[-1]:
+                sums = sums.copy()
+                sums[-1] += new_sums[0]
+                new_ts, new_sums = new_ts[1:], new_sums[1:]
+            self._totals = (np.concatenate([totals_ts, new_ts]), np.concatenate([sums, new_sums]))
+            self._latest.update(zip(crypto, value))
+        else:
+            # Horloge revenue en arriere: tri stable et cumuls recalcules
+            # (nouveaux tableaux: les vues deja remises aux lecteurs restent valides)
+            order = np.argsort(self._ts[:size], kind="stable")
+            self._ts = self._ts[:size][order]
+            self._crypto = self._crypto[:size][order]
+            self._value = self._value[:size][order]
+        # Vues sur les tableaux (sans copie), partagees par tous les lecteurs
+        self._frame = pd.DataFrame(
+            {"ts": self._ts[:size], "crypto": self._crypto[:size], "value": self._value[:size]},
+            copy=False,
+        )
+        if not in_order:
+            self._totals = _totals(self._frame)
+            self._latest = self._frame.groupby("crypto")["value"].last().to_dict()
+
+    def bounds(self):
+        """(premier ts, dernier ts) de l'historique, ou None s'il est vide."""
+        ts = self._refresh()["ts"]
+        return (int(ts.iloc[0]), int(ts.iloc[-1])) if len(ts) else None
+
+    def query(self, start=None, end=None, resolution=None):
+        """
+        Lignes de [start, end] (None: sans borne) par ts croissant: DataFrame ts, crypto, value
+
+        Snapshots bruts uniquement (resolution ignoree, reduction par history.load_history).
+        """
+        frame = self._refresh()
+        ts = frame["ts"].to_numpy()
+        lo = 0 if start is None else np.searchsorted(ts, start, side="left")
+        hi = len(ts) if end is None else np.searchsorted(ts, end, side="right")
+        return frame.iloc[lo:hi]
+
+    def latest_per_token(self, at):
+        frame = self._refresh()
+        if frame.empty or at >= frame["ts"].iloc[-1]:
+            return dict(self._latest)
+        return self.query(None, at).groupby("crypto")["value"].last().to_dict()
+
+    def first_per_token(self, since, until):
+        frame = self._refresh()
+        ts = frame["ts"].to_numpy()
+        lo = np.searchsorted(ts, since, side="right")
+        hi = np.searchsorted(ts, until, side="right")
+        return frame.iloc[lo:hi].groupby("crypto")["value"].first().to_dict()
+
+    def iter_totals_desc(self):
+        self._refresh()
+        ts, sums = self._totals
+        for index in range(len(ts) - 1, -1, -1):
+            yield int(ts[index]), float(sums[index])
+
+    def recent_totals(self, count):
+        self._refresh()
+        ts, sums = self._totals
+        return [(int(t), float(s)) for t, s in zip(ts[-count:], sums[-count:])]
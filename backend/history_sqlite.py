@@ -0,0 +1,448 @@
+"""
+Historique des soldes dans SQLite (mode WAL), avec agregats horaires et journaliers
+
+Table history(ts, crypto, value) indexee par (crypto, ts) et par ts: les
+lectures (plage, derniere valeur par crypto, totaux recents) ne parcourent
+que la fenetre demandee, quelle que soit la taille de l'historique.
+
+Le compactage (compact) agrege les snapshots bruts par heure puis par jour
+(derniere valeur, min, max, moyenne) et ne garde les snapshots bruts que
+sur raw_days jours et les heures sur hourly_days jours: la taille de la base
+et le cout des graphiques restent bornes. Une lecture par plage choisit le
+niveau le plus grossier compatible avec la resolution demandee.
+
+Un snapshot ecrit en retard (ts deja agrege) est fusionne a l'insertion dans
+les compartiments horaires et journaliers qu'il touche; s'il precede la
+retention des snapshots bruts, il n'est garde que dans les agregats.
+"""
+import os
+import sqlite3
+import threading
+import pandas as pd
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS history (ts INTEGER NOT NULL, crypto TEXT NOT NULL, value REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS history_crypto_ts ON history (crypto, ts)",
+    "CREATE INDEX IF NOT EXISTS history_ts ON history (ts)",
+    # ts: horodatage du dernier snapshot du compartiment (celui de "last")
+    "CREATE TABLE IF NOT EXISTS rollup (tier TEXT NOT NULL, bucket INTEGER NOT NULL, crypto TEXT NOT NULL,"
+    " ts INTEGER NOT NULL, last REAL, min REAL, max REAL, mean REAL, count INTEGER,"
+    " PRIMARY KEY (tier, bucket, crypto))",
+    "CREATE INDEX IF NOT EXISTS rollup_tier_ts ON rollup (tier, ts)",
+    "CREATE TABLE IF NOT EXISTS rollup_totals (tier TEXT NOT NULL, bucket INTEGER NOT NULL,"
+    " ts INTEGER NOT NULL, last REAL, min REAL, max REAL, mean REAL, count INTEGER,"
+    " PRIMARY KEY (tier, bucket))",
+    # Fin (exclue) de la periode deja agregee par niveau ("hourly", "daily") et
+    # debut de la periode encore conservee apres purge ("raw_start", "hourly_start")
+    "CREATE TABLE IF NOT EXISTS rollup_state (tier TEXT PRIMARY KEY, watermark INTEGER NOT NULL)",
+)
+
+# Niveaux du plus fin au plus grossier: (nom, largeur d'un compartiment en secondes)
+TIERS = (("raw", 0), ("hourly", 3600), ("daily", 86400))
+TIER_SIZES = dict(TIERS)
+
+# Les snapshots bruts couvrent au moins l'evolution 24h (calculate_evolution)
+MIN_RAW_DAYS = 2
+
+# Attente maximale d'un verrou d'ecriture tenu par un autre processus (ms)
+BUSY_TIMEOUT_MS = 5000
+
+# Bornes des plages ouvertes
+MIN_TS = -2**62
+MAX_TS = 2**62
+
+# Liste des cryptos sans parcourir la table: un saut d'index par crypto
+DISTINCT_CRYPTOS = """
+WITH RECURSIVE tokens(crypto) AS (
+    SELECT MIN(crypto) FROM history
+    UNION ALL
+    SELECT (SELECT MIN(crypto) FROM history WHERE crypto > tokens.crypto) FROM tokens
+    WHERE tokens.crypto IS NOT NULL
+)
+SELECT crypto FROM tokens WHERE crypto IS NOT NULL
+"""
+
+
+def _rollup(frame, size, keys):
+    """
+    Agrege des lignes (ts, last, min, max, mean, count) par compartiment de size secondes
+
+    Returns:
+        pandas.DataFrame: bucket, *keys, ts, last, min, max, mean, count
+    """
+    frame = frame.sort_values("ts", kind="stable")
+    frame = frame.assign(bucket=frame["ts"] // size * size, weighted=frame["mean"] * frame["count"])
+    result = frame.groupby(["bucket", *keys], sort=True).agg(
+        ts=("ts", "last"),
+        last=("last", "last"),
+        min=("min", "min"),
+        max=("max", "max"),
+        weighted=("weighted", "sum"),
+        count=("count", "sum"),
+    ).reset_index()
+    result["mean"] = result.pop("weighted") / result["count"]
+    return result
+
+
+def _tier_order(resolution):
+    """Niveaux par preference: le plus grossier admis par la resolution, puis plus fins, puis plus grossiers."""
+    names = [name for name, _ in TIERS]
+    target = max(index for index, (_, size) in enumerate(TIERS) if size <= (resolution or 0))
+    return [names[target]] + names[:target][::-1] + names[target + 1:]
+
+
+class SqliteHistoryStore:
+    """
+    Backend d'historique SQLite (une connexion par thread)
+
+    Attributes:
+        lock_path (str): verrou des ecrivains (history_writer)
+        raw_days (float): jours de snapshots bruts conserves (0: pas de compactage)
+        hourly_days (float): jours d'agregats horaires conserves (0: sans limite)
+    """
+
+    def __init__(self, path, raw_days=0, hourly_days=0):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.raw_days = max(raw_days, MIN_RAW_DAYS) if raw_days else 0
+        self.hourly_days = hourly_days
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        connection = self._connection()
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000)
+            # WAL: les lecteurs ne bloquent pas l'ecrivain (Flask, Streamlit, alerte)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def is_empty(self):
+        connection = self._connection()
+        return (
+            connection.execute("SELECT 1 FROM history LIMIT 1").fetchone() is None
+            and connection.execute("SELECT 1 FROM rollup_totals LIMIT 1").fetchone() is None
+        )
+
+    def append(self, rows):
+        """
+        Insere des lignes (ts, crypto, value) en une transaction
+
+        Les lignes anterieures au repere d'un niveau deja agrege sont fusionnees
+        dans ses compartiments (le compactage ne les reprendrait pas).
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            raw_start = self._watermark("raw_start")
+            hourly_end = self._watermark("hourly")
+            if raw_start is not None:
+                connection.executemany(
+                    "INSERT INTO history (ts, crypto, value) VALUES (?, ?, ?)",
+                    [row for row in rows if row[0] >= raw_start],
+                )
+            else:
+                connection.executemany("INSERT INTO history (ts, crypto, value) VALUES (?, ?, ?)", rows)
+            if hourly_end is not None and any(row[0] < hourly_end for row in rows):
+                self._merge_late(pd.DataFrame(
+                    [row for row in rows if row[0] < hourly_end], columns=["ts", "crypto", "value"]
+                ))
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+
+    def _merge_late(self, late):
+        """Fusionne des snapshots en retard dans les agregats horaires et journaliers deja calcules."""
+        hourly_start = self._watermark("hourly_start")
+        hourly = late if hourly_start is None else late[late["ts"] >= hourly_start]
+        self._store_rollup("hourly", hourly, 3600, merge=True)
+        # Les jours deja agreges ne relisent plus les heures: fusion directe
+        daily_end = self._watermark("daily")
+        if daily_end is not None:
+            self._store_rollup("daily", late[late["ts"] < daily_end], 86400, merge=True)
+
+    def _coverage(self, tier):
+        """Periode [debut, fin) couverte par un niveau, ou None s'il est vide."""
+        connection = self._connection()
+        if tier == "raw":
+            (start,) = connection.execute("SELECT MIN(ts) FROM history").fetchone()
+            return None if start is None else (start, MAX_TS)
+        (start,) = connection.execute("SELECT MIN(bucket) FROM rollup_totals WHERE tier = ?", (tier,)).fetchone()
+        if start is None:
+            return None
+        return start, self._watermark(tier)
+
+    def _watermark(self, tier):
+        row = self._connection().execute("SELECT watermark FROM rollup_state WHERE tier = ?", (tier,)).fetchone()
+        return None if row is None else row[0]
+
+    def bounds(self):
+        """(premier ts, dernier ts) de l'historique, tous niveaux confondus, ou None."""
+        connection = self._connection()
+        first, last = connection.execute("SELECT MIN(ts), MAX(ts) FROM history").fetchone()
+        (rolled,) = connection.execute("SELECT MIN(ts) FROM rollup_totals").fetchone()
+        if rolled is not None:
+            first = rolled if first is None else min(first, rolled)
+            if last is None:
+                (last,) = connection.execute("SELECT MAX(ts) FROM rollup_totals").fetchone()
+        return None if first is None else (first, last)
+
+    def query(self, start=None, end=None, resolution=None):
+        """
+        Lignes de [start, end] (None: sans borne) par ts croissant: DataFrame ts, crypto, value
+
+        Chaque partie de la plage est lue dans le niveau le plus grossier dont
+        le compartiment ne depasse pas resolution (secondes), ou a defaut dans
+        le niveau disponible le plus proche. Une ligne agregee porte la derniere
+        valeur du compartiment, datee de son dernier snapshot.
+        """
+        uncovered = [(MIN_TS if start is None else start, MAX_TS if end is None else end + 1)]
+        frames = []
+        for tier in _tier_order(resolution):
+            coverage = self._coverage(tier)
+            if coverage is None:
+                continue
+            size = TIER_SIZES[tier]
+            remaining = []
+            for low, high in uncovered:
+                part_low, part_high = max(low, coverage[0]), min(high, coverage[1])
+                if size:
+                    # Compartiments entiers seulement: les bords partiels restent
+                    # a couvrir par un niveau plus fin
+                    part_low = -(-part_low // size) * size
+                    part_high = part_high // size * size
+                if part_low >= part_high:
+                    remaining.append((low, high))
+                    continue
+                frames.append(self._read_tier(tier, part_low, part_high))
+                if low < part_low:
+                    remaining.append((low, part_low))
+                if part_high < high:
+                    remaining.append((part_high, high))
+            uncovered = remaining
+        # Bords qu'aucun niveau ne couvre entierement (snapshots bruts purges)
+        if start is not None or end is not None:
+            frames.extend(self._read_edge(low, high) for low, high in uncovered)
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return self._read_tier("raw", 0, 0)
+        return pd.concat(frames, ignore_index=True).sort_values("ts", kind="stable", ignore_index=True)
+
+    def _read_tier(self, tier, low, high):
+        connection = self._connection()
+        if tier == "raw":
+            return pd.read_sql_query(
+                "SELECT ts, crypto, value FROM history WHERE ts >= ? AND ts < ? ORDER BY ts, rowid",
+                connection, params=(low, high),
+            )
+        # Seulement les compartiments entierement dans [low, high)
+        return pd.read_sql_query(
+            "SELECT ts, crypto, last AS value FROM rollup WHERE tier = ? AND bucket >= ? AND bucket + ? <= ?"
+            " ORDER BY ts", connection, params=(tier, low, TIER_SIZES[tier], high),
+        )
+
+    def _read_edge(self, low, high):
+        """Bord de plage couvrant une partie de compartiment: agregats dont le dernier snapshot est dans [low, high)."""
+        for tier in ("hourly", "daily"):
+            frame = pd.read_sql_query(
+                "SELECT ts, crypto, last AS value FROM rollup WHERE tier = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                self._connection(), params=(tier, low, high),
+            )
+            if not frame.empty:
+                return frame
+        return frame
+
+    def _cryptos(self):
+        return [row[0] for row in self._connection().execute(DISTINCT_CRYPTOS)]
+
+    def latest_per_token(self, at):
+        """Derniere valeur de chaque crypto avec ts <= at (agregats pour les cryptos absentes des snapshots bruts)."""
+        connection = self._connection()
+        values = {}
+        for crypto in self._cryptos():
+            row = connection.execute(
+                "SELECT value FROM history WHERE crypto = ? AND ts <= ? ORDER BY ts DESC, rowid DESC LIMIT 1",
+                (crypto, at),
+            ).fetchone()
+            if row is not None:
+                values[crypto] = row[0]
+        for crypto, last, _ in connection.execute(
+            "SELECT crypto, last, MAX(ts) FROM rollup WHERE ts <= ? GROUP BY crypto", (at,)
+        ):
+            values.setdefault(crypto, last)
+        return values
+
+    def first_per_token(self, since, until):
+        """Premiere valeur de chaque crypto avec since < ts <= until (snapshots bruts)."""
+        connection = self._connection()
+        values = {}
+        for crypto in self._cryptos():
+            row = connection.execute(
+                "SELECT value FROM history WHERE crypto = ? AND ts > ? AND ts <= ? ORDER BY ts, rowid LIMIT 1",
+                (crypto, since, until),
+            ).fetchone()
+            if row is not None:
+                values[crypto] = row[0]
+        return values
+
+    def iter_totals_desc(self):
+        """
+        (ts, total) de chaque snapshot, du plus recent au plus ancien (lecture progressive)
+
+        Au-dela des snapshots bruts, un compartiment agrege donne son total
+        minimal, date de son dernier snapshot: un passage sous un seuil est
+        detecte a la precision du compartiment (une heure, puis un jour).
+        """
+        connection = self._connection()
+        yield from connection.execute("SELECT ts, SUM(value) FROM history GROUP BY ts ORDER BY ts DESC")
+        bound = MAX_TS
+        for tier in ("raw", "hourly"):
+            coverage = self._coverage(tier)
+            if coverage is not None:
+                bound = min(bound, coverage[0])
+            next_tier = "hourly" if tier == "raw" else "daily"
+            yield from connection.execute(
+                "SELECT ts, min FROM rollup_totals WHERE tier = ? AND bucket + ? <= ? ORDER BY bucket DESC",
+                (next_tier, TIER_SIZES[next_tier], bound),
+            )
+
+    def recent_totals(self, count):
+        """(ts, total) des count derniers snapshots, par ts croissant."""
+        rows = self._connection().execute(
+            "SELECT ts, SUM(value) FROM history GROUP BY ts ORDER BY ts DESC LIMIT ?", (count,)
+        ).fetchall()
+        return rows[::-1]
+
+    def compact(self, now):
+        """
+        Agrege les heures et jours termines puis supprime ce qui depasse la retention
+
+        Idempotent: un compactage concurrent (autre processus) attend le verrou
+        d'ecriture et ne retraite que ce qui reste.
+        """
+        if not self.raw_days:
+            return
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            hourly_end = self._rollup_raw(now // 3600 * 3600)
+            daily_end = self._rollup_hourly(now // 86400 * 86400)
+            if hourly_end is not None:
+                cutoff = min(int(now - self.raw_days * 86400) // 3600 * 3600, hourly_end)
+                connection.execute("DELETE FROM history WHERE ts < ?", (cutoff,))
+                self._set_watermark("raw_start", max(cutoff, self._watermark("raw_start") or cutoff))
+            if daily_end is not None and self.hourly_days:
+                cutoff = min(int(now - self.hourly_days * 86400) // 86400 * 86400, daily_end)
+                connection.execute("DELETE FROM rollup WHERE tier = 'hourly' AND bucket < ?", (cutoff,))
+                connection.execute("DELETE FROM rollup_totals WHERE tier = 'hourly' AND bucket < ?", (cutoff,))
+                self._set_watermark("hourly_start", max(cutoff, self._watermark("hourly_start") or cutoff))
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+
+    def _rollup_raw(self, end):
+        """Agrege les snapshots bruts par heure jusqu'a end. Retourne le nouveau repere."""
+        connection = self._connection()
+        start = self._watermark("hourly")
+        if start is None:
+            (first,) = connection.execute("SELECT MIN(ts) FROM history").fetchone()
+            if first is None:
+                return None
+            start = first // 3600 * 3600
+        if start < end:
+            raw = pd.read_sql_query(
+                "SELECT ts, crypto, value FROM history WHERE ts >= ? AND ts < ? ORDER BY ts, rowid",
+                connection, params=(start, end),
+            )
+            self._store_rollup("hourly", raw, 3600)
+            self._set_watermark("hourly", end)
+            return end
+        return start
+
+    def _rollup_hourly(self, end):
+        """Agrege les heures par jour jusqu'a end. Retourne le nouveau repere."""
+        connection = self._connection()
+        start = self._watermark("daily")
+        if start is None:
+            (first,) = connection.execute("SELECT MIN(bucket) FROM rollup_totals WHERE tier = 'hourly'").fetchone()
+            if first is None:
+                return None
+            start = first // 86400 * 86400
+        end = min(end, self._watermark("hourly") or end)
+        if start < end:
+            params = ("hourly", start, end)
+            by_crypto = pd.read_sql_query(
+                "SELECT ts, crypto, last, min, max, mean, count FROM rollup"
+                " WHERE tier = ? AND bucket >= ? AND bucket < ?", connection, params=params,
+            )
+            totals = pd.read_sql_query(
+                "SELECT ts, last, min, max, mean, count FROM rollup_totals"
+                " WHERE tier = ? AND bucket >= ? AND bucket < ?", connection, params=params,
+            )
+            self._write_rollup("daily", _rollup(by_crypto, 86400, ["crypto"]), _rollup(totals, 86400, []))
+            self._set_watermark("daily", end)
+            return end
+        return start
+
+    def _store_rollup(self, tier, raw, size, merge=False):
+        """
+        Agrege des snapshots bruts dans un niveau
+
+        Avec merge, les compartiments deja presents sont combines avec les
+        nouveaux snapshots (ts distincts des snapshots deja agreges) au lieu
+        d'etre remplaces.
+        """
+        if raw.empty:
+            return
+        rows = raw.assign(last=raw["value"], min=raw["value"], max=raw["value"], mean=raw["value"], count=1)
+        totals = raw.groupby("ts", sort=True)["value"].sum()
+        totals = pd.DataFrame({"ts": totals.index, "last": totals.values, "min": totals.values,
+                               "max": totals.values, "mean": totals.values, "count": 1})
+        if merge:
+            buckets = sorted({int(bucket) for bucket in raw["ts"] // size * size})
+            existing_rows, existing_totals = self._read_buckets(tier, buckets)
+            rows = pd.concat([existing_rows, rows[existing_rows.columns]], ignore_index=True)
+            totals = pd.concat([existing_totals, totals], ignore_index=True)
+        self._write_rollup(tier, _rollup(rows, size, ["crypto"]), _rollup(totals, size, []))
+
+    def _read_buckets(self, tier, buckets):
+        """Lignes agregees (par crypto, totaux) de compartiments donnes d'un niveau."""
+        connection = self._connection()
+        marks = ",".join("?" * len(buckets))
+        by_crypto = pd.read_sql_query(
+            f"SELECT ts, crypto, last, min, max, mean, count FROM rollup WHERE tier = ? AND bucket IN ({marks})",
+            connection, params=(tier, *buckets),
+        )
+        totals = pd.read_sql_query(
+            f"SELECT ts, last, min, max, mean, count FROM rollup_totals WHERE tier = ? AND bucket IN ({marks})",
+            connection, params=(tier, *buckets),
+        )
+        return by_crypto, totals
+
+    def _write_rollup(self, tier, by_crypto, totals):
+        connection = self._connection()
+        connection.executemany(
+            "INSERT OR REPLACE INTO rollup (tier, bucket, crypto, ts, last, min, max, mean, count)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(tier, int(row.bucket), row.crypto, int(row.ts), row.last, row.min, row.max, row.mean, int(row.count))
+             for row in by_crypto.itertuples(index=False)],
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO rollup_totals (tier, bucket, ts, last, min, max, mean, count)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(tier, int(row.bucket), int(row.ts), row.last, row.min, row.max, row.mean, int(row.count))
+             for row in totals.itertuples(index=False)],
+        )
+
+    def _set_watermark(self, tier, watermark):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO rollup_state (tier, watermark) VALUES (?, ?)", (tier, int(watermark))
+        )
@@ -0,0 +1,140 @@
+"""
+Ecriture de l'historique sure entre threads et processus
+
+Tous les ecrivains (threads Flask, workers WSGI, Streamlit, check_zakat_alert.py)
+passent par HistoryWriter:
+- les snapshots sont d'abord places dans un petit tampon du processus; un
+  snapshot pris moins de coalesce secondes apres un snapshot en attente le
+  remplace (rafraichissements rapproches fusionnes);
+- le tampon est ecrit coalesce secondes apres le premier snapshot en attente
+  (minuterie), des qu'il atteint max_pending snapshots, a la demande (flush)
+  et a la sortie du processus (atexit);
+- l'ecriture se fait sous un verrou de fichier (FileLock sur store.lock_path),
+  chaque snapshot en une seule ecriture: un lecteur ne voit jamais un snapshot
+  a moitie ecrit et deux processus ne melangent pas leurs lignes;
+- sous le verrou, un snapshot a moins de coalesce secondes d'un snapshot deja
+  ecrit (par un autre thread ou processus) est ignore: pas de doublon. Les
+  backends sont en ajout seul, c'est donc le premier snapshot ecrit qui reste;
+- un snapshot non ecrit (verrou non obtenu, erreur du backend) retourne dans
+  le tampon avec les suivants et est retente apres RETRY_DELAY secondes.
+
+Un snapshot en attente n'est pas encore lisible: un appelant qui relit
+l'historique juste apres (alerte zakat) appelle flush() avant.
+"""
+import atexit
+import threading
+from .file_lock import FileLock
+
+# Attente maximale du verrou d'ecriture tenu par un autre processus (s)
+LOCK_TIMEOUT = 30
+
+# Snapshots en attente au plus: au-dela, le tampon est ecrit immediatement
+# (et, si l'ecriture echoue, les plus anciens sont abandonnes)
+MAX_PENDING = 16
+
+# Delai avant une nouvelle tentative apres un echec d'ecriture (s)
+RETRY_DELAY = 30
+
+
+class HistoryWriter:
+    """
+    Tampon d'ecriture d'un backend d'historique
+
+    Attributes:
+        store: backend (append, query, lock_path)
+        coalesce (float): ecart (s) en dessous duquel deux snapshots sont fusionnes,
+            et delai avant l'ecriture du tampon (0: ecriture immediate)
+        max_pending (int): taille maximale du tampon
+    """
+
+    def __init__(self, store, coalesce=0, max_pending=MAX_PENDING):
+        self.store = store
+        self.coalesce = coalesce
+        self.max_pending = max_pending
+        self._pending = []
+        self._timer = None
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def submit(self, ts, rows):
+        """Ajoute un snapshot (lignes (ts, crypto, value)) au tampon."""
+        with self._pending_lock:
+            self._queue([(ts, rows)])
+            full = len(self._pending) >= self.max_pending
+        if self.coalesce <= 0 or full:
+            self.flush()
+        else:
+            self._schedule(self.coalesce)
+
+    def _queue(self, items):
+        """Met des snapshots en attente, le plus recent remplacant les trop proches (sous _pending_lock)."""
+        window = max(self.coalesce, 1)
+        for ts, rows in sorted(items, key=lambda item: item[0]):
+            if any(0 < other - ts < window for other, _ in self._pending):
+                continue
+            self._pending = [item for item in self._pending if item[0] > ts or ts - item[0] >= window]
+            self._pending.append((ts, rows))
+        if len(self._pending) > self.max_pending:
+            dropped = len(self._pending) - self.max_pending
+            print(f"Tampon de l'historique plein: {dropped} snapshot(s) le(s) plus ancien(s) abandonne(s)")
+            self._pending = sorted(self._pending, key=lambda item: item[0])[dropped:]
+
+    def _schedule(self, delay):
+        """Arme la minuterie d'ecriture du tampon si elle ne l'est pas deja."""
+        with self._pending_lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(delay, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._pending_lock:
+            self._timer = None
+        self.flush()
+
+    def flush(self):
+        """Ecrit les snapshots en attente. Retourne le nombre de snapshots ecrits."""
+        with self._flush_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            batch.sort(key=lambda item: item[0])
+            lock = FileLock(self.store.lock_path, timeout=LOCK_TIMEOUT)
+            if not lock.acquire():
+                print(f"Verrou d'ecriture de l'historique non obtenu: {len(batch)} snapshot(s) en attente")
+                self._retry(batch)
+                return 0
+            written = 0
+            try:
+                for index, (ts, rows) in enumerate(batch):
+                    try:
+                        if not self._already_written(ts):
+                            self.store.append(rows)
+                            written += 1
+                    except Exception as e:
+                        # Ce snapshot et les suivants sont retentes plus tard
+                        print(f"Erreur lors de l'ecriture de l'historique: {e}")
+                        self._retry(batch[index:])
+                        break
+            finally:
+                lock.release()
+            return written
+
+    def _retry(self, items):
+        with self._pending_lock:
+            self._queue(items)
+        self._schedule(RETRY_DELAY)
+
+    def pending_count(self):
+        """Nombre de snapshots en attente d'ecriture."""
+        with self._pending_lock:
+            return len(self._pending)
+
+    def _already_written(self, ts):
+        """Un snapshot a moins de coalesce secondes de ts (au moins le meme instant) est deja ecrit."""
+        window = max(self.coalesce, 1)
+        written = self.store.query(int(ts - window), int(ts + window))["ts"]
+        return bool((abs(written - ts) < window).any())
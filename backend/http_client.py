@@ -0,0 +1,118 @@
+"""
+Client HTTP partage (pool de connexions keep-alive) pour tous les fournisseurs
+"""
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .config import BASE_URLS
+from .cassette import active_cassette
+from .deadline import DeadlineExceeded, current_deadline
+
+# Delais par defaut: (connexion, lecture) en secondes
+CONNECT_TIMEOUT = 3
+HTTP_TIMEOUT = 8
+
+# Taille du pool de connexions par fournisseur (monte sur son URL de base)
+POOL_SIZES = {
+    "etherscan": 4,
+    "evm_rpc": 2,
+    "coinmarketcap": 2,
+    "coingecko": 2,
+    "xrpscan": 2,
+    "hyperliquid": 4,
+    "goldapi": 1,
+}
+DEFAULT_POOL_SIZE = 2
+
+# Nouvelles tentatives avec backoff exponentiel (0.5s, 1s, 2s)
+RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "POST"]),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+# Sous une echeance, pas de nouvelle tentative: le backoff depasserait le
+# budget, la valeur manquante est completee par les dernieres valeurs connues
+NO_RETRY = 0
+
+_sessions = {}
+_session_lock = threading.Lock()
+
+
+def _build_session(retry):
+    session = requests.Session()
+    default_adapter = HTTPAdapter(
+        pool_connections=len(POOL_SIZES) + 1,
+        pool_maxsize=DEFAULT_POOL_SIZE,
+        max_retries=retry,
+    )
+    session.mount("https://", default_adapter)
+    session.mount("http://", default_adapter)
+    # Des fournisseurs servis par une meme URL de base (serveur local) partagent son pool
+    sizes = {}
+    for provider, size in POOL_SIZES.items():
+        if not BASE_URLS[provider]:
+            continue
+        prefix = f"{BASE_URLS[provider]}/"
+        sizes[prefix] = sizes.get(prefix, 0) + size
+    for prefix, size in sizes.items():
+        session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=retry))
+    return session
+
+
+def get_session(retries=True):
+    """Retourne la session partagee par tout le processus (avec ou sans nouvelles tentatives)."""
+    session = _sessions.get(retries)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(retries)
+            if session is None:
+                session = _build_session(RETRY if retries else NO_RETRY)
+                _sessions[retries] = session
+    return session
+
+
+def request(method, url, timeout=None, **kwargs):
+    """
+    Envoie une requete via le pool partage avec un delai par defaut
+
+    Sous une echeance (voir deadline.py), le delai par defaut est borne par
+    le temps restant et la requete n'est pas retentee.
+    """
+    if active_cassette is not None and active_cassette.replaying:
+        return active_cassette.replay(method, url, kwargs.get("params"), kwargs.get("json"))
+    deadline = None
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, HTTP_TIMEOUT)
+        deadline = current_deadline()
+        if deadline is not None:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"echeance depassee avant l'appel a {url}")
+            timeout = (min(CONNECT_TIMEOUT, remaining), min(HTTP_TIMEOUT, remaining))
+    start = time.monotonic()
+    try:
+        response = get_session(retries=deadline is None).request(method, url, timeout=timeout, **kwargs)
+    except requests.RequestException as e:
+        # Delai raccourci par l'echeance: le budget est epuise, pas le fournisseur
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded(f"echeance atteinte pendant l'appel a {url}", sent=True) from e
+        raise
+    if active_cassette is not None and active_cassette.recording:
+        active_cassette.record(method, url, kwargs.get("params"), kwargs.get("json"), response, time.monotonic() - start)
+    return response
+
+
+def get(url, **kwargs):
+    """Requete GET via le pool partage."""
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    """Requete POST via le pool partage."""
+    return request("POST", url, **kwargs)
@@ -0,0 +1,178 @@
+"""
+Adaptateur Hyperliquid: etat perps, soldes spot et positions par portefeuille
+
+L'API info n'a pas de requete groupee: pour N portefeuilles, les N etats perps,
+les N etats spot et l'unique table des prix spot partent en une seule vague
+parallele sur le pool de connexions partage (aucun aller-retour sequentiel).
+"""
+from .config import BASE_URLS
+from .fetch_engine import run_parallel, throttle
+from .resilience import guarded_call
+from .cache import cached
+from . import http_client
+
+HYPERLIQUID_INFO_URL = f"{BASE_URLS['hyperliquid']}/info"
+
+# Jeton de cotation des paires spot (valeur fixe de 1 USD)
+SPOT_QUOTE_TOKEN = "USDC"
+
+
+def info_request(payload, verify_ssl=True):
+    """POST sur l'API info Hyperliquid et retourne la reponse JSON."""
+    throttle("hyperliquid")
+    response = http_client.post(
+        HYPERLIQUID_INFO_URL,
+        headers={"Content-Type": "application/json"},
+        json=payload,
+        verify=verify_ssl,
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Hyperliquid HTTP {response.status_code}: {response.text}")
+    return response.json()
+
+
+def get_perp_state(user, verify_ssl=True):
+    """Etat perps (clearinghouseState) d'un portefeuille."""
+    return guarded_call("hyperliquid", info_request, {"type": "clearinghouseState", "user": user}, verify_ssl)
+
+
+def get_spot_state(user, verify_ssl=True):
+    """Soldes spot (spotClearinghouseState) d'un portefeuille."""
+    return guarded_call("hyperliquid", info_request, {"type": "spotClearinghouseState", "user": user}, verify_ssl)
+
+
+def parse_spot_prices(meta_and_ctxs):
+    """
+    Prix USD des jetons spot d'apres spotMetaAndAssetCtxs
+
+    Returns:
+        dict: nom du jeton -> prix en USDC (prix de marque de sa paire X/USDC)
+    """
+    meta, ctxs = meta_and_ctxs
+    names = {token["index"]: token["name"] for token in meta.get("tokens", [])}
+    prices = {SPOT_QUOTE_TOKEN: 1.0}
+    # Les contextes sont alignes sur l'univers des paires
+    for pair, ctx in zip(meta.get("universe", []), ctxs):
+        base_index, quote_index = pair["tokens"]
+        if names.get(quote_index) != SPOT_QUOTE_TOKEN:
+            continue
+        price = ctx.get("markPx") or ctx.get("midPx")
+        if price is not None:
+            prices.setdefault(names.get(base_index), float(price))
+    return prices
+
+
+def get_spot_prices(verify_ssl=True):
+    """Table des prix spot, partagee par tous les portefeuilles (cache TTL)."""
+    return cached(
+        "hyperliquid",
+        "spot_prices",
+        lambda: parse_spot_prices(guarded_call(
+            "hyperliquid", info_request, {"type": "spotMetaAndAssetCtxs"}, verify_ssl
+        )),
+    )
+
+
+def parse_positions(perp_state):
+    """Detail des positions perps ouvertes."""
+    positions = []
+    for entry in perp_state.get("assetPositions", []):
+        position = entry.get("position", {})
+        leverage = position.get("leverage") or {}
+        positions.append({
+            "coin": position.get("coin"),
+            "size": float(position.get("szi") or 0),
+            "entry_price": float(position.get("entryPx") or 0),
+            "position_value": float(position.get("positionValue") or 0),
+            "unrealized_pnl": float(position.get("unrealizedPnl") or 0),
+            "liquidation_price": float(position["liquidationPx"]) if position.get("liquidationPx") else None,
+            "leverage": leverage.get("value"),
+            "margin_used": float(position.get("marginUsed") or 0),
+        })
+    return positions
+
+
+def parse_spot_balances(spot_state, prices):
+    """Soldes spot valorises en USD (0 pour un jeton sans paire USDC)."""
+    balances = []
+    for balance in spot_state.get("balances", []):
+        total = float(balance.get("total") or 0)
+        if total == 0:
+            continue
+        price = prices.get(balance.get("coin"))
+        balances.append({
+            "coin": balance.get("coin"),
+            "total": total,
+            "hold": float(balance.get("hold") or 0),
+            "price": price,
+            "usd": total * price if price is not None else 0.0,
+        })
+    return balances
+
+
+def get_accounts(users, verify_ssl=True):
+    """
+    Recupere perps, spot et positions de plusieurs portefeuilles en une vague
+
+    La ligne ACTIVE reste la valeur du compte perps (accountValue), comme dans
+    tout l'historique: sur un compte unifie ou en marge de portefeuille, le
+    collateral spot y est deja compte. Les soldes spot sont rendus a part.
+
+    Returns:
+        dict: portefeuille -> {
+            "account_value": valeur du compte perps (USD),
+            "total": valeur de la ligne ACTIVE (egale a account_value),
+            "spot_value": valeur des soldes spot (USD, None s'ils n'ont pas pu etre lus),
+            "positions": detail des positions perps,
+            "spot_balances": detail des soldes spot,
+        } ou exception si l'etat perps de ce portefeuille n'a pas pu etre lu
+    """
+    # Les prix spot sont lus dans la meme vague que les etats des portefeuilles
+    jobs = {("spot_prices", None): (_capture, (get_spot_prices, verify_ssl), {})}
+    for user in users:
+        jobs[("perp", user)] = (_capture, (get_perp_state, user, verify_ssl), {})
+        jobs[("spot", user)] = (_capture, (get_spot_state, user, verify_ssl), {})
+    results = run_parallel(jobs, pool="hyperliquid")
+
+    prices = results[("spot_prices", None)]
+    if isinstance(prices, Exception):
+        print(f"Prix spot Hyperliquid indisponibles: {prices}")
+        prices = {SPOT_QUOTE_TOKEN: 1.0}
+
+    accounts = {}
+    for user in users:
+        perp_state, spot_state = results[("perp", user)], results[("spot", user)]
+        if isinstance(perp_state, Exception):
+            accounts[user] = perp_state
+            continue
+        try:
+            account_value = float(perp_state["marginSummary"]["accountValue"])
+            positions = parse_positions(perp_state)
+        except (KeyError, TypeError, ValueError) as e:
+            accounts[user] = RuntimeError(f"Reponse Hyperliquid invalide: {e}")
+            continue
+        # Le detail spot est informatif: son echec ne touche pas la ligne ACTIVE
+        spot_balances, spot_value = [], None
+        if isinstance(spot_state, Exception):
+            print(f"Soldes spot Hyperliquid indisponibles pour {user}: {spot_state}")
+        else:
+            try:
+                spot_balances = parse_spot_balances(spot_state, prices)
+                spot_value = sum(balance["usd"] for balance in spot_balances)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Soldes spot Hyperliquid invalides pour {user}: {e}")
+        accounts[user] = {
+            "account_value": account_value,
+            "total": account_value,
+            "spot_value": spot_value,
+            "positions": positions,
+            "spot_balances": spot_balances,
+        }
+    return accounts
+
+
+def _capture(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception as e:
+        return e
@@ -0,0 +1,99 @@
+"""
+Derniers resultats valides par fournisseur, persistes sur disque
+
+Chaque solde (token + portefeuille) et chaque cotation reussis sont
+enregistres avec leur horodatage. En cas d'echec partiel, seules les
+valeurs manquantes sont completees depuis ce cache et marquees perimees;
+au redemarrage, le portefeuille peut etre servi immediatement depuis le disque.
+"""
+import json
+import os
+import threading
+import time
+from .config import LKG_FILE
+
+
+class LastKnownGoodStore:
+    """
+    Stockage thread-safe des dernieres valeurs valides (fichier JSON)
+    """
+
+    def __init__(self, path=LKG_FILE):
+        self.path = path
+        self._data = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._data is not None:
+            return self._data
+        data = {"balances": {}, "quotes": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                data["balances"].update(stored.get("balances", {}))
+                data["quotes"].update(stored.get("quotes", {}))
+            except (OSError, ValueError) as e:
+                print(f"Cache des dernieres valeurs illisible, ignore: {e}")
+        self._data = data
+        return data
+
+    @staticmethod
+    def balance_key(symbol, wallet):
+        return f"{symbol}:{wallet}"
+
+    def record_balance(self, symbol, wallet, amount):
+        """Enregistre un solde lu avec succes."""
+        with self._lock:
+            self._load()["balances"][self.balance_key(symbol, wallet)] = {"value": amount, "ts": time.time()}
+            self._dirty = True
+
+    def record_quote(self, symbol, quote):
+        """Enregistre une cotation obtenue avec succes."""
+        with self._lock:
+            self._load()["quotes"][symbol] = dict(quote, ts=time.time())
+            self._dirty = True
+
+    def get_balance(self, symbol, wallet):
+        """Retourne (solde, horodatage) ou None."""
+        with self._lock:
+            entry = self._load()["balances"].get(self.balance_key(symbol, wallet))
+        if entry is None:
+            return None
+        return entry["value"], entry["ts"]
+
+    def get_quote(self, symbol):
+        """Retourne (cotation, horodatage) ou None."""
+        with self._lock:
+            entry = self._load()["quotes"].get(symbol)
+        if entry is None:
+            return None
+        quote = {"price": entry["price"], "market_cap": entry["market_cap"]}
+        return quote, entry["ts"]
+
+    def is_empty(self):
+        with self._lock:
+            data = self._load()
+            return not data["balances"] and not data["quotes"]
+
+    def save(self):
+        """Ecrit le cache sur disque (ecriture atomique) s'il a change."""
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps(self._load())
+            self._dirty = False
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Impossible d'ecrire le cache des dernieres valeurs: {e}")
+
+
+# Cache partage par le processus
+last_known_good = LastKnownGoodStore()
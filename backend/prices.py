@@ -0,0 +1,102 @@
+"""
+Module pour la recuperation groupee des prix des cryptomonnaies
+"""
+from .config import CMC_API_KEY, BASE_URLS
+from .utils import format_number
+from .fetch_engine import throttle
+from .tokens import build_fetch_plan
+from . import http_client
+
+# Symboles dont le prix est fourni par CoinMarketCap (d'apres le registre)
+CMC_SYMBOLS = build_fetch_plan()["cmc_symbols"]
+
+# Appel REST direct: le client coinmarketcapapi ouvre sa propre Session
+# et ne peut donc pas reutiliser le pool de connexions partage.
+CMC_QUOTES_URL = f"{BASE_URLS['coinmarketcap']}/v2/cryptocurrency/quotes/latest"
+COINGECKO_PRICE_URL = f"{BASE_URLS['coingecko']}/api/v3/simple/price"
+
+
+def parse_cmc_quote(entries):
+    """Extrait le prix et la market cap d'une entree de cotation CMC."""
+    if isinstance(entries, list):
+        entries = entries[0] if entries else None
+    if not entries:
+        return None
+    usd = entries['quote']['USD']
+    return {
+        "price": float(usd['price'] or 0),
+        "market_cap": format_number(usd['market_cap']) if usd.get('market_cap') is not None else "N/A",
+    }
+
+
+def get_cmc_quotes(symbols=None, verify_ssl=True):
+    """
+    Recupere les cotations de tous les symboles en un seul appel CMC
+
+    Args:
+        symbols (list): Symboles a coter (CMC_SYMBOLS par defaut)
+
+    Returns:
+        dict: symbole -> {"price": float, "market_cap": str}
+
+    Raises:
+        requests.RequestException: si l'appel CMC echoue
+    """
+    symbols = symbols or CMC_SYMBOLS
+    throttle("coinmarketcap")
+    response = http_client.get(
+        CMC_QUOTES_URL,
+        params={"symbol": ",".join(symbols), "skip_invalid": "true"},
+        headers={"X-CMC_PRO_API_KEY": CMC_API_KEY, "Accept": "application/json"},
+        verify=verify_ssl,
+    )
+    response.raise_for_status()
+    data = response.json().get("data", {})
+
+    quotes = {}
+    for symbol in symbols:
+        try:
+            quote = parse_cmc_quote(data.get(symbol))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Cotation CMC invalide pour {symbol}: {e}")
+            continue
+        if quote is not None:
+            quotes[symbol] = quote
+    return quotes
+
+
+def get_coingecko_quotes(ids, verify_ssl=True):
+    """
+    Recupere les cotations CoinGecko de plusieurs tokens en un seul appel
+
+    Args:
+        ids (list): identifiants CoinGecko
+
+    Returns:
+        dict: identifiant -> {"price": float, "market_cap": str}
+
+    Raises:
+        requests.RequestException: si l'appel CoinGecko echoue
+    """
+    if not ids:
+        return {}
+    throttle("coingecko")
+    response = http_client.get(
+        COINGECKO_PRICE_URL,
+        params={"ids": ",".join(ids), "vs_currencies": "usd", "include_market_cap": "true"},
+        verify=verify_ssl,
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    quotes = {}
+    for coingecko_id in ids:
+        entry = data.get(coingecko_id) or {}
+        if entry.get("usd") is None:
+            continue
+        market_cap = entry.get("usd_market_cap")
+        quotes[coingecko_id] = {
+            "price": float(entry["usd"]),
+            "market_cap": format_number(market_cap) if market_cap is not None else "N/A",
+        }
+    return quotes
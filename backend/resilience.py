@@ -0,0 +1,185 @@
+"""
+Disjoncteurs par fournisseur et requetes couvertes (hedged requests)
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from .fetch_engine import submit_call
+from .deadline import DeadlineExceeded, current_deadline
+
+# Disjoncteur: nombre d'echecs consecutifs avant ouverture, puis duree de
+# refroidissement pendant laquelle le fournisseur n'est plus appele
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 60
+
+# Requete couverte: la source de secours est lancee quand la source
+# principale depasse ce percentile de ses latences recentes
+HEDGE_PERCENTILE = 0.95
+LATENCY_WINDOW = 50
+MIN_HEDGE_DELAY = 0.25
+DEFAULT_HEDGE_DELAY = 1.5
+
+
+class CircuitOpenError(RuntimeError):
+    """Levee quand un fournisseur est coupe par son disjoncteur."""
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur thread-safe: ferme -> ouvert apres FAILURE_THRESHOLD echecs,
+    puis semi-ouvert apres COOLDOWN_SECONDS: un seul appel d'essai est admis,
+    les autres restent coupes jusqu'a son resultat (un succes le referme,
+    un echec relance un refroidissement complet)
+    """
+
+    def __init__(self, provider, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN_SECONDS):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        """Vrai si le fournisseur est coupe (refroidissement ou appel d'essai en cours)."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            return self._probing or time.monotonic() - self._opened_at < self.cooldown
+
+    def _admit(self):
+        """
+        Admet un appel: (admis, appel d'essai)
+
+        Apres le refroidissement, le premier appel devient l'appel d'essai.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True, False
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                return False, False
+            self._probing = True
+            return True, True
+
+    def _release_probe(self):
+        """Appel d'essai sans verdict (echeance): un autre appel pourra essayer."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self, latency):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+            self._latencies.append(latency)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"Disjoncteur ouvert pour {self.provider} ({self._failures} echecs)")
+                # Un echec en semi-ouvert relance un refroidissement complet
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def latency_percentile(self, percentile=HEDGE_PERCENTILE):
+        """Latence au percentile donne sur la fenetre recente, None sans mesure."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(percentile * len(samples)))]
+
+    def call(self, func, *args, **kwargs):
+        """Execute func sous la protection du disjoncteur."""
+        admitted, probe = self._admit()
+        if not admitted:
+            raise CircuitOpenError(f"{self.provider} coupe par son disjoncteur")
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except DeadlineExceeded:
+            # Budget du rafraichissement epuise: le fournisseur n'est pas en cause
+            if probe:
+                self._release_probe()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.monotonic() - start)
+        return result
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider):
+    """Retourne le disjoncteur partage d'un fournisseur."""
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(provider)
+            _breakers[provider] = breaker
+        return breaker
+
+
+def guarded_call(provider, func, *args, **kwargs):
+    """Raccourci vers get_breaker(provider).call(func, ...)."""
+    return get_breaker(provider).call(func, *args, **kwargs)
+
+
+def hedge_delay(provider):
+    """
+    Delai avant de lancer la source de secours d'un fournisseur
+
+    Sous une echeance, la source de secours part au plus tard a mi-budget
+    restant pour avoir le temps de repondre.
+    """
+    latency = get_breaker(provider).latency_percentile()
+    delay = DEFAULT_HEDGE_DELAY if latency is None else max(MIN_HEDGE_DELAY, latency)
+    deadline = current_deadline()
+    if deadline is not None:
+        delay = min(delay, deadline.remaining() / 2)
+    return delay
+
+
+def hedged_call(primary, fallback):
+    """
+    Interroge une source principale et la couvre par une source de secours
+
+    La source de secours est lancee si la principale est coupee, echoue, ou
+    n'a pas repondu apres son percentile de latence: le premier succes gagne.
+
+    Args:
+        primary (tuple): (fournisseur, fonction sans argument)
+        fallback (tuple): (fournisseur, fonction sans argument)
+
+    Returns:
+        tuple: (fournisseur gagnant, resultat)
+    """
+    futures = {}
+    errors = []
+    for index, (provider, func) in enumerate((primary, fallback)):
+        if get_breaker(provider).is_open():
+            errors.append(CircuitOpenError(f"{provider} coupe par son disjoncteur"))
+            continue
+        futures[submit_call(guarded_call, provider, func)] = provider
+        if index == 0:
+            done, _ = wait(futures, timeout=hedge_delay(provider))
+            for future in done:
+                if future.exception() is None:
+                    return provider, future.result()
+
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return futures[future], future.result()
+            errors.append(future.exception())
+    raise RuntimeError(f"Toutes les sources ont echoue: {errors}")
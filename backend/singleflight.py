@@ -0,0 +1,66 @@
+"""
+Regroupement des appels concurrents identiques (single-flight)
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Un seul appel en vol par cle: les appelants concurrents, synchrones ou
+    asynchrones, attendent l'appel en cours et recoivent son resultat
+    (ou son exception) au lieu d'en lancer un nouveau
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _begin(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, func, *args, **kwargs):
+        """Execute func (ou rejoint l'appel en vol) et retourne son resultat."""
+        future, leader = self._begin(key)
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def do_async(self, key, coro_func, *args, **kwargs):
+        """Version asynchrone de do(): coro_func retourne une coroutine."""
+        future, leader = self._begin(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await coro_func(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def in_flight(self, key):
+        """Vrai si un appel est en cours pour la cle."""
+        with self._lock:
+            return key in self._calls
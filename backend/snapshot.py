@@ -0,0 +1,218 @@
+"""
+Producteur de snapshots du portefeuille en arriere-plan
+
+Le pipeline complet (recuperation, CSV, zakat, evolution, graphique) tourne
+dans un thread dedie a intervalle regulier et publie un snapshot immuable.
+Les routes Flask et Streamlit ne font que lire le dernier snapshot publie.
+"""
+import json
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+from .crypto_data import (
+    update_data,
+    is_mock_data_used,
+    get_wallet_breakdown,
+    get_stale_tokens,
+    get_missing_tokens,
+    get_hyperliquid_positions,
+    portfolio_from_last_known_good,
+)
+from .utils import save_crypto_balance
+from .zakat import calcul_zakat
+from .visualization import makePlot, calculate_evolution
+from .singleflight import SingleFlight
+from .cadence import RefreshCadence, WATCHED_INTERVAL
+
+# Intervalle de base entre deux snapshots (en secondes), adapte par cadence.py
+SNAPSHOT_INTERVAL = 300
+
+_latest = None
+_publish_lock = threading.Lock()
+_cold_start_lock = threading.Lock()
+_refresh_flight = SingleFlight()
+_producer = None
+_producer_lock = threading.Lock()
+_wake = threading.Event()
+cadence = RefreshCadence(SNAPSHOT_INTERVAL)
+
+
+class Snapshot:
+    """
+    Etat publie du portefeuille (lecture seule)
+
+    Attributes:
+        data (MappingProxyType): donnees pour les templates et Streamlit
+        json_body (str): donnees deja serialisees pour /api/portfolio
+        produced_at (float): horodatage time.time() de production
+    """
+
+    __slots__ = ("data", "json_body", "produced_at")
+
+    def __init__(self, data):
+        object.__setattr__(self, "data", _freeze(data))
+        object.__setattr__(self, "json_body", json.dumps(data))
+        object.__setattr__(self, "produced_at", time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot est immuable")
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def build_portfolio_data(portfolio=None):
+    """
+    Execute le pipeline complet et retourne les donnees du portefeuille
+
+    Args:
+        portfolio (dict): portefeuille deja valorise (dernieres valeurs connues);
+            dans ce cas aucun fournisseur n'est appele et rien n'est ecrit dans le CSV
+    """
+    if portfolio is None:
+        total, token_balance, token_price, token_mc, gold_price = update_data()
+        wallet_balance = get_wallet_breakdown()
+        stale = get_stale_tokens()
+        missing = get_missing_tokens()
+        hyperliquid = get_hyperliquid_positions()
+        is_mock = is_mock_data_used()
+        # N'ecrit ni les donnees mock, ni un snapshot incomplet ou entierement perime dans le CSV
+        write_history = not is_mock and not missing and not set(token_balance) <= set(stale)
+    else:
+        total = portfolio["total"]
+        token_balance = portfolio["token_balance"]
+        token_price = portfolio["token_price"]
+        token_mc = portfolio["token_mc"]
+        gold_price = portfolio["gold_price"]
+        wallet_balance = portfolio["wallet_balance"]
+        stale = portfolio["stale"]
+        missing = portfolio["missing"]
+        # Les positions ne sont pas conservees dans les dernieres valeurs connues
+        hyperliquid = portfolio.get("hyperliquid", {})
+        is_mock = False
+        write_history = False
+
+    if write_history:
+        current_time = save_crypto_balance(token_balance)
+    else:
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    gold_price, zakat_amount, msg, counter = calcul_zakat(total, gold_price)
+
+    token_balance_dict_evol = {}
+    evolution_dict = calculate_evolution()
+    for token, balance in token_balance.items():
+        evolution = evolution_dict.get(token)
+        if evolution is not None:
+            evolution = round(evolution, 2)
+        token_balance_dict_evol[token] = {
+            'balance': balance,
+            'evolution': evolution
+        }
+
+    makePlot()
+
+    return {
+        'total': total,
+        'token_balance': token_balance_dict_evol,
+        'token_price': token_price,
+        'token_mc': token_mc,
+        'zakat': zakat_amount,
+        'counter': counter,
+        'msg': msg,
+        'goldPrice': gold_price,
+        'current_time': current_time,
+        'wallet_balance': wallet_balance,
+        'stale': stale,
+        'missing': missing,
+        'hyperliquid': hyperliquid,
+        'is_mock': is_mock,
+    }
+
+
+def _publish(snapshot, only_if_empty=False):
+    global _latest
+    with _publish_lock:
+        if only_if_empty and _latest is not None:
+            return _latest
+        _latest = snapshot
+        return snapshot
+
+
+def _build_and_publish():
+    return _publish(Snapshot(build_portfolio_data()))
+
+
+def refresh_snapshot():
+    """
+    Produit et publie un nouveau snapshot, puis le retourne
+
+    Les appels concurrents (producteur, bouton Streamlit) partagent la meme
+    production: le CSV ne recoit qu'une ligne par snapshot.
+    """
+    return _refresh_flight.do("snapshot", _build_and_publish)
+
+
+def get_snapshot():
+    """
+    Retourne le dernier snapshot publie
+
+    Avant toute production, un snapshot est reconstruit immediatement depuis
+    les dernieres valeurs connues sur disque (et un rafraichissement demande);
+    sans elles, le premier appel attend le pipeline. Les appels concurrents
+    attendent ce meme premier snapshot. Chaque lecture compte comme un client
+    actif pour la cadence adaptative; un snapshot plus vieux que
+    WATCHED_INTERVAL reveille le producteur.
+    """
+    woke_idle = not cadence.is_watched()
+    cadence.note_client()
+    snapshot = _latest
+    if snapshot is not None:
+        if woke_idle and time.time() - snapshot.produced_at > WATCHED_INTERVAL:
+            request_refresh()
+        return snapshot
+    with _cold_start_lock:
+        if _latest is not None:
+            return _latest
+        portfolio = portfolio_from_last_known_good()
+        if portfolio is not None:
+            snapshot = _publish(Snapshot(build_portfolio_data(portfolio)), only_if_empty=True)
+            request_refresh()
+            return snapshot
+    return refresh_snapshot()
+
+
+def request_refresh():
+    """Demande au producteur un snapshot sans attendre la fin de l'intervalle."""
+    _wake.set()
+
+
+def _produce_forever(interval):
+    while True:
+        try:
+            refresh_snapshot()
+        except Exception as e:
+            print(f"Erreur lors de la production du snapshot: {e}")
+        _wake.wait(interval if interval is not None else cadence.next_interval())
+        _wake.clear()
+
+
+def start_producer(interval=None):
+    """
+    Demarre (une seule fois par processus) le thread producteur
+
+    Args:
+        interval (float): intervalle fixe en secondes (None: cadence adaptative)
+    """
+    global _producer
+    with _producer_lock:
+        if _producer is None or not _producer.is_alive():
+            _producer = threading.Thread(target=_produce_forever, args=(interval,), daemon=True)
+            _producer.start()
+    return _producer
@@ -0,0 +1,134 @@
+"""
+Registre declaratif des tokens suivis par le portefeuille
+"""
+from .config import EVM_WALLETS, XRP_WALLETS, HYPERLIQUID_WALLETS, EVM_BALANCE_BACKEND
+
+# Chaque token est decrit par:
+# - symbol: symbole du token (et symbole CMC si price_source == "cmc")
+# - group: ligne d'affichage qui agrege le token (USDC + USDT -> USD)
+# - chain: chaine ou plateforme qui detient le solde
+# - contract: contrat ERC-20 (None pour l'actif natif de la chaine)
+# - decimals: decimales du solde brut
+# - price_source: "cmc" (CoinMarketCap) ou "fixed" (prix constant, cle price)
+# - coingecko_id: identifiant CoinGecko utilise si CMC ne cote pas le token
+# - wallets: adresses qui detiennent le token (un solde lu par adresse)
+# Ajouter un token = ajouter une entree ici, sans code supplementaire.
+TOKENS = [
+    {
+        "symbol": "ETH",
+        "group": "ETH",
+        "chain": "ethereum",
+        "contract": None,
+        "decimals": 18,
+        "price_source": "cmc",
+        "coingecko_id": "ethereum",
+        "wallets": EVM_WALLETS,
+    },
+    {
+        "symbol": "FET",
+        "group": "FET",
+        "chain": "ethereum",
+        "contract": "0xaea46A60368A7bD060eec7DF8CBa43b7EF41Ad85",
+        "decimals": 18,
+        "price_source": "cmc",
+        "coingecko_id": "fetch-ai",
+        "wallets": EVM_WALLETS,
+    },
+    {
+        "symbol": "GALA",
+        "group": "GALA",
+        "chain": "ethereum",
+        "contract": "0xd1d2Eb1B1e90B638588728b4130137D262C87cae",
+        "decimals": 8,
+        "price_source": "cmc",
+        "coingecko_id": "gala",
+        "wallets": EVM_WALLETS,
+    },
+    {
+        "symbol": "ESX",
+        "group": "ESX",
+        "chain": "ethereum",
+        "contract": "0xFC05987bd2be489ACCF0f509E44B0145d68240f7",
+        "decimals": 18,
+        "price_source": "cmc",
+        "coingecko_id": None,
+        "wallets": EVM_WALLETS,
+    },
+    {
+        "symbol": "USDC",
+        "group": "USD",
+        "chain": "ethereum",
+        "contract": "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48",
+        "decimals": 6,
+        "price_source": "fixed",
+        "price": 1,
+        "wallets": EVM_WALLETS,
+    },
+    {
+        "symbol": "USDT",
+        "group": "USD",
+        "chain": "ethereum",
+        "contract": "0xdAC17F958D2ee523a2206206994597C13D831ec7",
+        "decimals": 6,
+        "price_source": "fixed",
+        "price": 1,
+        "wallets": EVM_WALLETS,
+    },
+    {
+        "symbol": "XRP",
+        "group": "XRP",
+        "chain": "xrpl",
+        "contract": None,
+        "decimals": 6,
+        "price_source": "cmc",
+        "coingecko_id": "ripple",
+        "wallets": XRP_WALLETS,
+    },
+    {
+        # Valeur du compte Hyperliquid, deja exprimee en USD
+        "symbol": "ACTIVE",
+        "group": "ACTIVE",
+        "chain": "hyperliquid",
+        "contract": None,
+        "decimals": 0,
+        "price_source": "fixed",
+        "price": 1,
+        "wallets": HYPERLIQUID_WALLETS,
+    },
+]
+
+# Fournisseur qui lit les soldes de chaque chaine
+CHAIN_PROVIDERS = {
+    "ethereum": "evm_rpc" if EVM_BALANCE_BACKEND == "rpc" else "etherscan",
+    "xrpl": "xrpscan",
+    "hyperliquid": "hyperliquid",
+}
+
+
+def build_fetch_plan(tokens=None):
+    """
+    Construit le plan de recuperation d'un ensemble de tokens
+
+    Args:
+        tokens (list): entrees du registre (TOKENS par defaut)
+
+    Returns:
+        dict: {
+            "balances": fournisseur -> [(index, wallet, token)],
+            "cmc_symbols": symboles a coter en un seul appel CMC,
+            "groups": lignes d'affichage dans l'ordre du registre,
+        }
+    """
+    tokens = TOKENS if tokens is None else tokens
+    balances = {}
+    cmc_symbols = []
+    groups = []
+    for index, token in enumerate(tokens):
+        provider = CHAIN_PROVIDERS[token["chain"]]
+        for wallet in token["wallets"]:
+            balances.setdefault(provider, []).append((index, wallet, token))
+        if token["price_source"] == "cmc" and token["symbol"] not in cmc_symbols:
+            cmc_symbols.append(token["symbol"])
+        if token["group"] not in groups:
+            groups.append(token["group"])
+    return {"balances": balances, "cmc_symbols": cmc_symbols, "groups": groups}
@@ -3,9 +3,8 @@ Fonctions utilitaires pour le back-end
 """
 import json
 import os
-import csv
 from datetime import datetime
-from .config import DATA_FILE
+from .history import save_snapshot
 
 def format_number(number):
     """
@@ -22,30 +21,27 @@ def format_number(number):
             return f"{number:.2f}"
     return str(number)
 
-def save_crypto_balance(token_balance_dict):
-    """
-    Sauvegarde les soldes de cryptomonnaies dans un fichier CSV
+def format_age(since, now=None):
     """
-    # Récupère la date et l'heure actuelles
-    now = datetime.now()
-    current_time = now.strftime("%Y-%m-%d %H:%M:%S")
-
-    # S'assurer que le répertoire existe
-    os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-    
-    # Ajouter les données à un fichier CSV
-    with open(DATA_FILE, 'a', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-
-        # Si le fichier est vide, on ajoute les en-têtes
-        if csvfile.tell() == 0:
-            writer.writerow(["Date", "Crypto", "Valeur"])
+    Formate l'age d'une valeur pour l'affichage ("12 min", "3 h", "2 j")
 
-        # Écrire les données pour chaque crypto-monnaie
-        for crypto, value in token_balance_dict.items():
-            writer.writerow([current_time, crypto, value])
+    Args:
+        since (str): horodatage "%Y-%m-%d %H:%M:%S" de la valeur
+    """
+    seconds = ((now or datetime.now()) - datetime.strptime(since, "%Y-%m-%d %H:%M:%S")).total_seconds()
+    if seconds < 60:
+        return "< 1 min"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} h"
+    return f"{int(seconds // 86400)} j"
 
-    return current_time
+def save_crypto_balance(token_balance_dict):
+    """
+    Sauvegarde les soldes de cryptomonnaies dans l'historique (voir history.py)
+    """
+    return save_snapshot(token_balance_dict)
 
 def load_counter():
     """
@@ -2,10 +2,13 @@
 Module pour la visualisation des données
 """
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # Rendu sans affichage: le graphique est produit hors du thread principal
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import os
-from .config import DATA_FILE, PLOT_FILE
+from .config import PLOT_FILE
+from . import history
 
 def makePlot():
     """
@@ -14,8 +17,9 @@ def makePlot():
     # S'assurer que le répertoire existe
     os.makedirs(os.path.dirname(PLOT_FILE), exist_ok=True)
     
-    # Lire les données CSV
-    df = pd.read_csv(DATA_FILE)
+    # Lire l'historique reduit a CHART_MAX_POINTS dates (dates en texte: une position par snapshot sur l'axe X)
+    df = history.load_history(max_points=history.CHART_MAX_POINTS)
+    df['Date'] = df['Date'].dt.strftime(history.DATE_FORMAT)
     
     # Pivoter la table pour avoir les dates en index et les cryptomonnaies en colonnes
     df_pivot = df.pivot_table(index='Date', columns='Crypto', values='Valeur')
@@ -56,21 +60,15 @@ def calculate_evolution():
     """
     Calcule l'évolution en pourcentage des cryptomonnaies sur les dernières 24 heures
     """
-    # Lire les données CSV
-    df = pd.read_csv(DATA_FILE, parse_dates=['Date'])
-    
     # Obtenir l'heure actuelle et l'heure il y a 24 heures
     now = datetime.now()
     day_ago = now - timedelta(days=1)
     
-    # Filtrer le DataFrame pour les dernières 24 heures
-    df_last_24h = df[(df['Date'] <= now) & (df['Date'] > day_ago)]
-    
     # Obtenir la dernière valeur pour chaque crypto
-    latest_values = df[df['Date'] <= now].groupby('Crypto')['Valeur'].last()
+    latest_values = pd.Series(history.latest_values(now), dtype='float64')
     
-    # Obtenir les valeurs d'il y a 24 heures pour chaque crypto
-    values_24h_ago = df_last_24h.groupby('Crypto')['Valeur'].first()
+    # Obtenir les valeurs d'il y a 24 heures pour chaque crypto (premieres des dernieres 24 heures)
+    values_24h_ago = pd.Series(history.first_values(day_ago, now), dtype='float64')
     
     # Calculer l'évolution en pourcentage
     evolution = ((latest_values - values_24h_ago) / values_24h_ago) * 100
@@ -82,21 +80,13 @@ def find_date_threshold(threshold):
     """
     Trouve la date à laquelle le total du portefeuille était inférieur à un certain seuil
     """
-    # Lire les données CSV
-    df = pd.read_csv(DATA_FILE, parse_dates=['Date'])
-    
-    # Calculer le total par date
-    total_per_date = df.groupby('Date')['Valeur'].sum()
-    
-    # Trier le DataFrame par index (dates)
-    df_sorted = total_per_date.sort_index(ascending=False)
     date_find = None
     
-    # Trouver la première date où la valeur est inférieure au seuil
-    for date, value in df_sorted.items():
+    # Parcourir les totaux par date, du plus recent au plus ancien, et
+    # s'arreter a la première date où la valeur est inférieure au seuil
+    for date, value in history.iter_totals_desc():
         if value < (threshold * 89):
-            date_str = date.strftime("%Y-%m-%d %H:%M:%S")
-            date_find = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
+            date_find = date
             break  # Arrêter la boucle dès que la condition est vérifiée
     
     return date_find
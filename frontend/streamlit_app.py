@@ -9,6 +9,8 @@ import streamlit as st
 # Ajout du chemin parent pour l'importation des modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from backend.cache import quote_cache
+from backend.snapshot import refresh_snapshot
 from frontend.config import UI_CONFIG
 from frontend.api import get_portfolio_data
 from frontend.ui import (
@@ -16,6 +18,7 @@ from frontend.ui import (
     apply_custom_style,
     display_portfolio_summary,
     display_crypto_table,
+    display_hyperliquid_positions,
     display_charts,
     display_error_message,
 )
@@ -94,7 +97,8 @@ with st.sidebar:
         st.rerun()
 
     if st.button("Rafraichir les donnees"):
-        st.cache_data.clear()
+        quote_cache.invalidate()
+        refresh_snapshot()
         st.rerun()
 
     st.subheader("A propos")
@@ -115,10 +119,10 @@ data = get_portfolio_data()
 if data:
     display_portfolio_summary(data)
     display_crypto_table(data)
+    display_hyperliquid_positions(data)
 
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_file = os.path.join(project_root, "static", "data_crypto.csv")
     plot_file = os.path.join(project_root, "static", "plot_evol.png")
-    display_charts(data_file, plot_file)
+    display_charts(plot_file)
 else:
     display_error_message()
@@ -4,6 +4,8 @@ Module pour les composants d'interface utilisateur Streamlit
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+from backend.history import CHART_MAX_POINTS, load_history
+from backend.utils import format_age
 from .config import THEME
 
 
@@ -280,10 +282,31 @@ def display_portfolio_summary(data):
         )
 
 
+def data_status(token, data):
+    """
+    Etat de la valeur d'un token: recue, reprise des dernieres valeurs connues ou manquante
+
+    Returns:
+        str: "" si la valeur est a jour, "Perime (age)" ou "Manquant"
+    """
+    if token in data.get("missing", ()):
+        return "Manquant"
+    since = data.get("stale", {}).get(token)
+    if since is not None:
+        return f"Perime ({format_age(since)})"
+    return ""
+
+
 def display_crypto_table(data):
     """Affiche un tableau moderne des cryptomonnaies."""
     st.markdown("<div class='section-title'>Detail des cryptomonnaies</div>", unsafe_allow_html=True)
 
+    missing = data.get("missing", ())
+    if missing:
+        st.warning(f"Valeurs manquantes (comptees pour 0): {', '.join(missing)}")
+    if data.get("stale"):
+        st.info("Certaines valeurs sont reprises des dernieres valeurs connues (colonne Etat).")
+
     rows = []
     for token, details in data.get("token_balance", {}).items():
         balance = float(details.get("balance", 0) or 0)
@@ -298,6 +321,7 @@ def display_crypto_table(data):
                 "Prix ($)": price,
                 "Market Cap": market_cap,
                 "Evolution 24h (%)": evolution,
+                "Etat": data_status(token, data),
             }
         )
 
@@ -317,23 +341,96 @@ def display_crypto_table(data):
             "Prix ($)": st.column_config.NumberColumn("Prix ($)", format="$%.6f"),
             "Market Cap": st.column_config.TextColumn("Market Cap"),
             "Evolution 24h (%)": st.column_config.NumberColumn("Evolution 24h (%)", format="%.2f%%"),
+            "Etat": st.column_config.TextColumn("Etat"),
         },
     )
 
 
-def create_evolution_chart(csv_path, view_mode="Normalized"):
+def short_wallet(wallet):
+    """Adresse abregee pour l'affichage (0x1234...abcd)."""
+    return wallet if len(wallet) <= 12 else f"{wallet[:6]}...{wallet[-4:]}"
+
+
+def display_hyperliquid_positions(data):
+    """Affiche les positions perps et les soldes spot Hyperliquid de chaque portefeuille."""
+    accounts = data.get("hyperliquid", {})
+    if not accounts:
+        return
+    st.markdown("<div class='section-title'>Hyperliquid</div>", unsafe_allow_html=True)
+
+    for wallet, account in accounts.items():
+        spot_value = account.get("spot_value")
+        spot_label = f"${spot_value:,.2f}" if spot_value is not None else "indisponible"
+        st.markdown(
+            f"""
+            <div class="metric-card">
+                <div class="metric-label">{short_wallet(wallet)}</div>
+                <div class="metric-value">${float(account.get('account_value', 0) or 0):,.2f}</div>
+                <div class="metric-note">Valeur du compte perps (ligne ACTIVE) - spot: {spot_label}</div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+
+        positions = account.get("positions", ())
+        if positions:
+            df = pd.DataFrame(
+                [
+                    {
+                        "Coin": position["coin"],
+                        "Taille": position["size"],
+                        "Prix d'entree ($)": position["entry_price"],
+                        "Valeur ($)": position["position_value"],
+                        "PnL latent ($)": position["unrealized_pnl"],
+                        "Liquidation ($)": position["liquidation_price"],
+                        "Levier": position["leverage"],
+                        "Marge ($)": position["margin_used"],
+                    }
+                    for position in positions
+                ]
+            )
+            st.dataframe(
+                df,
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "Prix d'entree ($)": st.column_config.NumberColumn("Prix d'entree ($)", format="$%.4f"),
+                    "Valeur ($)": st.column_config.NumberColumn("Valeur ($)", format="$%.2f"),
+                    "PnL latent ($)": st.column_config.NumberColumn("PnL latent ($)", format="$%.2f"),
+                    "Liquidation ($)": st.column_config.NumberColumn("Liquidation ($)", format="$%.4f"),
+                    "Marge ($)": st.column_config.NumberColumn("Marge ($)", format="$%.2f"),
+                },
+            )
+        else:
+            st.caption("Aucune position perps ouverte.")
+
+        balances = account.get("spot_balances", ())
+        if balances:
+            df = pd.DataFrame(
+                [
+                    {"Jeton": balance["coin"], "Quantite": balance["total"], "Valeur ($)": balance["usd"]}
+                    for balance in balances
+                ]
+            )
+            st.dataframe(
+                df,
+                hide_index=True,
+                use_container_width=True,
+                column_config={"Valeur ($)": st.column_config.NumberColumn("Valeur ($)", format="$%.2f")},
+            )
+
+
+def create_evolution_chart(df, view_mode="Normalized"):
     """
     Cree un graphique d'evolution des cryptomonnaies avec Plotly
 
     Args:
-        csv_path (str): Chemin vers le fichier CSV des donnees
+        df (pandas.DataFrame): historique Date, Crypto, Valeur (voir backend.history)
 
     Returns:
         plotly.graph_objects.Figure: Figure Plotly ou None en cas d'erreur
     """
     try:
-        df = pd.read_csv(csv_path)
-        df["Date"] = pd.to_datetime(df["Date"])
         df_pivot = df.pivot_table(index="Date", columns="Crypto", values="Valeur").sort_index()
         df_chart = df_pivot.copy()
         yaxis_title = "Valeur ($)"
@@ -396,12 +493,11 @@ def create_evolution_chart(csv_path, view_mode="Normalized"):
         return None
 
 
-def display_charts(data_file, plot_file):
+def display_charts(plot_file):
     """
     Affiche les graphiques d'evolution
 
     Args:
-        data_file (str): Chemin vers le fichier CSV des donnees
         plot_file (str): Chemin vers l'image du graphique statique
     """
     st.markdown("<div class='section-title'>Evolution des valeurs</div>", unsafe_allow_html=True)
@@ -416,7 +512,7 @@ def display_charts(data_file, plot_file):
                 index=0,
                 horizontal=True,
             )
-            fig = create_evolution_chart(data_file, view_mode=view_mode)
+            fig = create_evolution_chart(load_history(max_points=CHART_MAX_POINTS), view_mode=view_mode)
             if fig is not None:
                 st.plotly_chart(fig, use_container_width=True)
 
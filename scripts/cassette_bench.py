@@ -0,0 +1,77 @@
+"""
+Enregistre une cassette des appels fournisseurs, ou la rejoue pour mesurer
+calculate_total, calculate_evolution et calcul_zakat sans reseau.
+
+    python scripts/cassette_bench.py record
+    python scripts/cassette_bench.py replay --speed fast --runs 20
+
+La cassette est ecrite dans CASSETTE_FILE (static/cassette.json par defaut).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enregistrement / rejeu des appels fournisseurs")
+    parser.add_argument("mode", choices=("record", "replay"))
+    parser.add_argument("--speed", choices=("realtime", "fast"), default="realtime", help="vitesse de rejeu")
+    parser.add_argument("--runs", type=int, default=5, help="nombre de passes mesurees en rejeu")
+    parser.add_argument("--file", help="chemin de la cassette (CASSETTE_FILE par defaut)")
+    args = parser.parse_args(argv)
+
+    # La configuration est lue a l'import du backend
+    os.environ["CASSETTE_MODE"] = args.mode
+    os.environ["CASSETTE_SPEED"] = args.speed
+    if args.file:
+        os.environ["CASSETTE_FILE"] = args.file
+
+    from backend.cassette import active_cassette
+    from backend.cache import quote_cache
+    from backend.crypto_data import calculate_total
+    from backend.visualization import calculate_evolution
+    from backend.zakat import calcul_zakat
+
+    if active_cassette is None:
+        print("Cassette indisponible.")
+        return 1
+
+    if args.mode == "record":
+        total, _ = timed(calculate_total)
+        print(f"Cassette enregistree dans {active_cassette.path} (total {total[0]:.2f} USD)")
+        return 0
+
+    timings = {"calculate_total": [], "calculate_evolution": [], "calcul_zakat": []}
+    for _ in range(args.runs):
+        # Sans cache, chaque passe rejoue tous les appels
+        quote_cache.invalidate()
+        result, elapsed = timed(calculate_total)
+        timings["calculate_total"].append(elapsed)
+        _, elapsed = timed(calculate_evolution)
+        timings["calculate_evolution"].append(elapsed)
+        _, elapsed = timed(calcul_zakat, result[0], result[4])
+        timings["calcul_zakat"].append(elapsed)
+
+    for name, values in timings.items():
+        print(
+            f"{name:<20} median {statistics.median(values) * 1000:8.1f} ms"
+            f"  min {min(values) * 1000:8.1f} ms  max {max(values) * 1000:8.1f} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
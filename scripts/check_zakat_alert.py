@@ -11,7 +11,8 @@ REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if REPO_ROOT not in sys.path:
     sys.path.insert(0, REPO_ROOT)
 
-from backend.crypto_data import is_mock_data_used, update_data
+from backend.crypto_data import get_missing_tokens, get_stale_tokens, is_mock_data_used, update_data
+from backend.history import flush_history
 from backend.notifier import send_email_alert
 from backend.utils import save_crypto_balance
 from backend.zakat import calcul_zakat
@@ -24,7 +25,24 @@ def main():
         print("Mock data in use. Skip alert to avoid false positives.")
         return 0
 
-    current_time = save_crypto_balance(token_balance)
+    # A token counted as 0 would lower the total used for the nisab decision
+    missing = get_missing_tokens()
+    if missing:
+        print(f"Missing values for {missing}. Skip alert and history write.")
+        return 1
+
+    # Same rule as backend/snapshot.build_portfolio_data: never write an
+    # entirely stale snapshot (last-known-good values only) to the history
+    stale = get_stale_tokens()
+    if stale:
+        print(f"Stale values (last known good) for {sorted(stale)}")
+    if set(token_balance) <= set(stale):
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print("All values are stale. History not updated.")
+    else:
+        current_time = save_crypto_balance(token_balance)
+        # The nisab check below reads the history: write the buffered snapshot first
+        flush_history()
     gold_price, zakat_amount, msg, counter = calcul_zakat(total, gold_price)
 
     print(
@@ -0,0 +1,59 @@
+"""
+Importe data_crypto.csv dans un backend binaire de l'historique, l'exporte en CSV,
+ou compacte l'historique SQLite (agregats horaires et journaliers, retention).
+
+    python scripts/history_tool.py import
+    python scripts/history_tool.py import --backend columnar
+    python scripts/history_tool.py export --csv static/data_crypto_export.csv
+    python scripts/history_tool.py compact
+
+Backends: "sqlite" (HISTORY_DB_FILE, static/history.sqlite3 par defaut) ou
+"columnar" (HISTORY_COLUMNAR_DIR, static/history_columnar par defaut).
+Le compactage suit HISTORY_RAW_DAYS et HISTORY_HOURLY_DAYS (sqlite uniquement).
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import / export de l'historique")
+    parser.add_argument("mode", choices=("import", "export", "compact"))
+    parser.add_argument("--backend", choices=("sqlite", "columnar"), default="sqlite")
+    parser.add_argument("--csv", help="fichier CSV Date,Crypto,Valeur (DATA_FILE par defaut)")
+    args = parser.parse_args(argv)
+
+    from backend.config import DATA_FILE
+    from backend.history import export_csv, import_csv, open_store, to_epoch
+
+    csv_path = args.csv or DATA_FILE
+    store = open_store(args.backend)
+    if args.mode == "import":
+        if not store.is_empty():
+            print(f"{store.path} contient deja un historique: import annule")
+            return 1
+        count = import_csv(csv_path, store)
+        print(f"{count} lignes importees de {csv_path} dans {store.path}")
+    elif args.mode == "compact":
+        if not hasattr(store, "compact"):
+            print(f"Le backend {args.backend} ne se compacte pas")
+            return 1
+        store.compact(to_epoch(datetime.now()))
+        print(f"{store.path} compacte")
+    else:
+        if store.is_empty():
+            print(f"{store.path} est vide: export annule")
+            return 1
+        count = export_csv(csv_path, store)
+        print(f"{count} lignes exportees de {store.path} vers {csv_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
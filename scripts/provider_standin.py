@@ -0,0 +1,432 @@
+"""
+Serveur HTTP local qui imite les fournisseurs du portefeuille
+(Etherscan V2, noeud JSON-RPC EVM, CoinMarketCap, CoinGecko, xrpscan,
+Hyperliquid, GoldAPI).
+
+Il renvoie les memes formats de reponse que les vraies API, avec une latence,
+un taux d'erreur et une limite de debit configurables par fournisseur, pour
+mesurer ou charger le vrai chemin de recuperation hors ligne:
+
+    python scripts/provider_standin.py --port 8765 --profile profil.json
+    PROVIDER_BASE_URL=http://127.0.0.1:8765 streamlit run frontend/streamlit_app.py
+
+Profil JSON (toutes les cles sont optionnelles, "*" s'applique a tous):
+    {
+        "*": {"latency": {"dist": "lognormal", "median": 0.15, "sigma": 0.5}},
+        "etherscan": {"error_rate": 0.05, "rate_limit": {"rps": 5, "burst": 5}},
+        "coinmarketcap": {"latency": {"dist": "uniform", "min": 0.2, "max": 1.5}}
+    }
+
+Lois de latence: "fixed" (seconds), "uniform" (min, max), "lognormal" (median, sigma).
+GET /__stats retourne les compteurs de requetes par fournisseur.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from backend.tokens import TOKENS
+
+DEFAULT_PORT = 8765
+
+# Profil par defaut: reponses rapides, sans erreur ni limite de debit
+DEFAULT_PROFILE = {
+    "latency": {"dist": "fixed", "seconds": 0.05},
+    "error_rate": 0.0,
+    "rate_limit": None,
+}
+
+# Prix servis par les faux CoinMarketCap / CoinGecko
+PRICES = {"ETH": 3200.0, "FET": 1.2, "GALA": 0.03, "ESX": 0.0004, "XRP": 0.55}
+COINGECKO_IDS = {"ethereum": "ETH", "fetch-ai": "FET", "gala": "GALA", "ripple": "XRP"}
+CIRCULATING_SUPPLY = 1_000_000_000
+
+# Decimales des contrats du registre (soldes bruts realistes)
+CONTRACT_DECIMALS = {token["contract"].lower(): token["decimals"] for token in TOKENS if token["contract"]}
+
+XRPSCAN_ACCOUNT = re.compile(r"^/api/v1/account/([^/]+)$")
+
+
+def fake_amount(*parts, scale=1000):
+    """Montant deterministe (meme adresse -> meme solde) entre 0 et scale."""
+    digest = hashlib.sha256(":".join(str(part).lower() for part in parts).encode()).hexdigest()
+    return int(digest[:8], 16) / 0xFFFFFFFF * scale
+
+
+def canonical(address):
+    """Adresse EVM normalisee (meme solde quel que soit le format ou le backend)."""
+    if address.lower().startswith("0x"):
+        return "0x" + address[2:].lower().rjust(40, "0")
+    return address
+
+
+def symbol_price(symbol):
+    return PRICES.get(symbol.upper(), round(fake_amount("price", symbol, scale=10), 4))
+
+
+class TokenBucket:
+    """Limite de debit du faux fournisseur (rps jetons/s, rafale burst)."""
+
+    def __init__(self, rps, burst):
+        self.rps = rps
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rps)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class ProviderBehaviour:
+    """Latence, erreurs et limite de debit d'un faux fournisseur."""
+
+    def __init__(self, profile, rng):
+        self.latency = profile.get("latency") or DEFAULT_PROFILE["latency"]
+        self.error_rate = float(profile.get("error_rate", 0.0))
+        rate_limit = profile.get("rate_limit")
+        self.bucket = TokenBucket(rate_limit["rps"], rate_limit.get("burst", 1)) if rate_limit else None
+        self.rng = rng
+        self.rng_lock = threading.Lock()
+
+    def delay(self):
+        with self.rng_lock:
+            dist = self.latency.get("dist", "fixed")
+            if dist == "uniform":
+                return self.rng.uniform(self.latency["min"], self.latency["max"])
+            if dist == "lognormal":
+                return self.rng.lognormvariate(math.log(self.latency["median"]), self.latency.get("sigma", 0.5))
+            return self.latency.get("seconds", 0.0)
+
+    def should_fail(self):
+        with self.rng_lock:
+            return self.rng.random() < self.error_rate
+
+    def rate_limited(self):
+        return self.bucket is not None and not self.bucket.try_acquire()
+
+
+class StandinState:
+    """Comportements et compteurs partages par les threads du serveur."""
+
+    PROVIDERS = ("etherscan", "evm_rpc", "coinmarketcap", "coingecko", "xrpscan", "hyperliquid", "goldapi")
+
+    def __init__(self, profile, seed=None):
+        rng = random.Random(seed)
+        shared = profile.get("*", {})
+        self.behaviours = {}
+        for provider in self.PROVIDERS:
+            merged = {**DEFAULT_PROFILE, **shared, **profile.get(provider, {})}
+            self.behaviours[provider] = ProviderBehaviour(merged, random.Random(rng.random()))
+        self.stats = {provider: {"requests": 0, "errors": 0, "rate_limited": 0} for provider in self.PROVIDERS}
+        self.lock = threading.Lock()
+
+    def count(self, provider, outcome="requests"):
+        with self.lock:
+            self.stats[provider][outcome] += 1
+
+
+# --- Reponses au format des vraies API ---------------------------------------
+
+def native_wei(address):
+    return int(fake_amount("eth", canonical(address), scale=5) * 10 ** 18)
+
+
+def token_units(address, contract):
+    decimals = CONTRACT_DECIMALS.get(contract.lower(), 18)
+    return int(fake_amount(contract, canonical(address)) * 10 ** decimals)
+
+
+def etherscan_response(query):
+    action = query.get("action", "")
+    address = query.get("address", "")
+    if action == "balancemulti":
+        rows = [
+            {"account": account, "balance": str(native_wei(account))}
+            for account in address.split(",") if account
+        ]
+        return {"status": "1", "message": "OK", "result": rows}
+    if action == "balance":
+        return {"status": "1", "message": "OK", "result": str(native_wei(address))}
+    if action == "tokenbalance":
+        contract = query.get("contractaddress", "")
+        return {"status": "1", "message": "OK", "result": str(token_units(address, contract))}
+    if action == "addresstokenbalance":
+        return {"status": "1", "message": "OK", "result": []}
+    if action in ("tokentx", "txlist"):
+        # Dernier transfert fixe par adresse: les soldes simules ne bougent pas
+        block = 19_000_000 + int(fake_amount(action, address, scale=1_000_000))
+        digest = hashlib.sha256(f"{action}:{address.lower()}".encode()).hexdigest()
+        return {"status": "1", "message": "OK", "result": [{"blockNumber": str(block), "hash": f"0x{digest}"}]}
+    return {"status": "0", "message": "NOTOK", "result": f"Error! Invalid action {action}"}
+
+
+def rpc_reply(request):
+    reply = {"jsonrpc": "2.0", "id": request.get("id")}
+    method, params = request.get("method"), request.get("params") or []
+    if method == "eth_getBalance":
+        reply["result"] = hex(native_wei(params[0]))
+    elif method == "eth_call" and params and params[0].get("data", "").startswith("0x70a08231"):
+        holder = "0x" + params[0]["data"][-40:]
+        reply["result"] = "0x" + format(token_units(holder, params[0]["to"]), "064x")
+    elif method == "eth_blockNumber":
+        reply["result"] = hex(19_500_000)
+    else:
+        reply["error"] = {"code": -32601, "message": f"the method {method} does not exist/is not available"}
+    return reply
+
+
+def evm_rpc_response(payload):
+    """JSON-RPC: requete unique ou lot (liste)."""
+    if isinstance(payload, list):
+        return [rpc_reply(request) for request in payload]
+    return rpc_reply(payload)
+
+
+def cmc_response(query):
+    data = {}
+    for symbol in query.get("symbol", "").split(","):
+        if not symbol:
+            continue
+        price = symbol_price(symbol)
+        data[symbol] = [{
+            "symbol": symbol,
+            "quote": {"USD": {"price": price, "market_cap": price * CIRCULATING_SUPPLY}},
+        }]
+    return {"status": {"error_code": 0, "error_message": None}, "data": data}
+
+
+def coingecko_response(query):
+    data = {}
+    for coingecko_id in query.get("ids", "").split(","):
+        if not coingecko_id:
+            continue
+        price = symbol_price(COINGECKO_IDS.get(coingecko_id, coingecko_id))
+        data[coingecko_id] = {"usd": price}
+        if query.get("include_market_cap") == "true":
+            data[coingecko_id]["usd_market_cap"] = price * CIRCULATING_SUPPLY
+    return data
+
+
+def xrpscan_response(account):
+    return {"account": account, "xrpBalance": f"{fake_amount('xrp', account, scale=5000):.6f}"}
+
+
+# Paire spot HYPE/USDC (@107) et son prix de marque
+HYPERLIQUID_SPOT_META = [
+    {
+        "tokens": [{"name": "USDC", "index": 0}, {"name": "HYPE", "index": 150}],
+        "universe": [{"name": "@107", "tokens": [150, 0], "index": 107}],
+    },
+    [{"coin": "@107", "markPx": "25.0", "midPx": "25.0"}],
+]
+
+
+def hyperliquid_response(payload):
+    user = payload.get("user", "")
+    if payload.get("type") == "spotMetaAndAssetCtxs":
+        return HYPERLIQUID_SPOT_META
+    if payload.get("type") == "spotClearinghouseState":
+        return {"balances": [
+            {"coin": "USDC", "token": 0, "total": f"{fake_amount('spot', user):.2f}", "hold": "0.0"},
+            {"coin": "HYPE", "token": 150, "total": f"{fake_amount('hype', user, scale=10):.4f}", "hold": "0.0"},
+        ]}
+    value = f"{fake_amount('perp', user):.2f}"
+    size = round(fake_amount('size', user, scale=2), 4)
+    return {
+        "marginSummary": {"accountValue": value, "totalNtlPos": f"{size * 3000:.2f}", "totalRawUsd": value, "totalMarginUsed": "0.0"},
+        "withdrawable": value,
+        "assetPositions": [{
+            "type": "oneWay",
+            "position": {
+                "coin": "ETH",
+                "szi": f"{size}",
+                "entryPx": "3000.0",
+                "positionValue": f"{size * 3000:.2f}",
+                "unrealizedPnl": "0.0",
+                "liquidationPx": None,
+                "leverage": {"type": "cross", "value": 3},
+                "marginUsed": f"{size * 1000:.2f}",
+            },
+        }],
+    }
+
+
+def goldapi_response():
+    ounce = 2650.0
+    return {"metal": "XAU", "currency": "USD", "price": ounce, "price_gram_24k": round(ounce / 31.1035, 4)}
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server_version = "ProviderStandin/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self, method, path):
+        if method == "GET":
+            if path == "/v2/api":
+                return "etherscan"
+            if path == "/v2/cryptocurrency/quotes/latest":
+                return "coinmarketcap"
+            if path == "/api/v3/simple/price":
+                return "coingecko"
+            if XRPSCAN_ACCOUNT.match(path):
+                return "xrpscan"
+            if path == "/api/XAU/USD":
+                return "goldapi"
+        if method == "POST" and path == "/info":
+            return "hyperliquid"
+        if method == "POST" and path in ("/", "/rpc"):
+            return "evm_rpc"
+        return None
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        body = b""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length)
+
+        if method == "GET" and url.path == "/__stats":
+            with self.server.state.lock:
+                return self._send_json(200, self.server.state.stats)
+
+        provider = self._route(method, url.path)
+        if provider is None:
+            return self._send_json(404, {"error": f"Route inconnue: {method} {url.path}"})
+
+        state = self.server.state
+        behaviour = state.behaviours[provider]
+        state.count(provider)
+        time.sleep(behaviour.delay())
+
+        if behaviour.rate_limited():
+            state.count(provider, "rate_limited")
+            if provider == "etherscan":
+                # Etherscan signale la limite dans un 200
+                return self._send_json(200, {"status": "0", "message": "NOTOK", "result": "Max calls per sec rate limit reached (5/sec)"})
+            return self._send_json(429, {"error": "Too Many Requests"}, {"Retry-After": "1"})
+        if behaviour.should_fail():
+            state.count(provider, "errors")
+            return self._send_json(503, {"error": "Injected failure"})
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if provider == "etherscan":
+            return self._send_json(200, etherscan_response(query))
+        if provider == "coinmarketcap":
+            return self._send_json(200, cmc_response(query))
+        if provider == "coingecko":
+            return self._send_json(200, coingecko_response(query))
+        if provider == "xrpscan":
+            return self._send_json(200, xrpscan_response(XRPSCAN_ACCOUNT.match(url.path).group(1)))
+        if provider == "goldapi":
+            return self._send_json(200, goldapi_response())
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return self._send_json(422, {"error": "JSON invalide"})
+        if provider == "evm_rpc":
+            return self._send_json(200, evm_rpc_response(payload))
+        return self._send_json(200, hyperliquid_response(payload))
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Un client qui abandonne (delai expire) n'est pas une erreur du serveur
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, profile=None, seed=None, verbose=False):
+    """Construit le serveur (port=0: port libre choisi par le systeme)."""
+    server = StandinServer((host, port), StandinHandler)
+    server.state = StandinState(profile or {}, seed)
+    server.verbose = verbose
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Demarre le serveur dans un thread et retourne (serveur, URL de base)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Faux fournisseurs HTTP pour tester le portefeuille hors ligne")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--profile", help="fichier JSON de latences, erreurs et limites par fournisseur")
+    parser.add_argument("--latency", type=float, help="latence fixe (s) pour tous les fournisseurs")
+    parser.add_argument("--error-rate", type=float, help="taux d'erreur 503 pour tous les fournisseurs")
+    parser.add_argument("--seed", type=int, help="graine pour des tirages reproductibles")
+    parser.add_argument("--verbose", action="store_true", help="journalise chaque requete")
+    args = parser.parse_args(argv)
+
+    profile = {}
+    if args.profile:
+        with open(args.profile, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    shared = profile.setdefault("*", {})
+    if args.latency is not None:
+        shared["latency"] = {"dist": "fixed", "seconds": args.latency}
+    if args.error_rate is not None:
+        shared["error_rate"] = args.error_rate
+
+    server = make_server(args.host, args.port, profile, args.seed, args.verbose)
+    host, port = server.server_address[:2]
+    print(f"Fournisseurs simules sur http://{host}:{port} (PROVIDER_BASE_URL=http://{host}:{port})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Fixtures communes: petit historique CSV et backends d'historique construits dessus
+"""
+import csv
+from datetime import datetime, timedelta
+import pytest
+from backend import history
+from backend.history_csv import CsvHistoryStore
+from backend.history_sqlite import SqliteHistoryStore
+from backend.history_columnar import ColumnarHistoryStore
+
+START = datetime(2024, 3, 1, 0, 10, 0)
+
+# Un snapshot toutes les 30 minutes pendant SAMPLE_DAYS jours
+SAMPLE_DAYS = 4
+SAMPLE_STEP = timedelta(minutes=30)
+
+
+def sample_rows():
+    """
+    Lignes (date, crypto, valeur) d'un historique type
+
+    ARB est retire apres le premier jour, FET n'apparait qu'au troisieme:
+    les dernieres et premieres valeurs par crypto ne sont pas toutes au meme instant.
+    """
+    rows = []
+    count = int(timedelta(days=SAMPLE_DAYS) / SAMPLE_STEP)
+    for index in range(count):
+        date = START + index * SAMPLE_STEP
+        balances = {"ETH": 1000 + 7.5 * index, "XRP": 300 - 0.25 * index, "ACTIVE": 190 + (index % 11)}
+        if date < START + timedelta(days=1):
+            balances["ARB"] = 650 - index
+        if date >= START + timedelta(days=2):
+            balances["FET"] = 400 + 3 * (index % 5)
+        for crypto, value in balances.items():
+            rows.append((date, crypto, float(value)))
+    return rows
+
+
+@pytest.fixture
+def sample_csv(tmp_path):
+    """Fichier Date,Crypto,Valeur au format de data_crypto.csv."""
+    path = tmp_path / "data_crypto.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Crypto", "Valeur"])
+        for date, crypto, value in sample_rows():
+            writer.writerow([date.strftime(history.DATE_FORMAT), crypto, value])
+    return str(path)
+
+
+def build_store(backend, csv_path, directory):
+    """Backend d'historique contenant le CSV (sans compactage)."""
+    if backend == "csv":
+        return CsvHistoryStore(csv_path)
+    if backend == "sqlite":
+        store = SqliteHistoryStore(str(directory / "history.sqlite3"))
+    else:
+        store = ColumnarHistoryStore(str(directory / "history_columnar"))
+    history.import_csv(csv_path, store)
+    return store
+
+
+@pytest.fixture(params=["csv", "sqlite", "columnar"])
+def store(request, sample_csv, tmp_path, monkeypatch):
+    """Chaque backend, installe comme backend du processus (history.get_store())."""
+    store = build_store(request.param, sample_csv, tmp_path)
+    monkeypatch.setattr(history, "_store", store)
+    return store
@@ -0,0 +1,98 @@
+"""
+Cache TTL: valeurs fraiches, perimees servies pendant un seul rafraichissement, eviction LRU
+"""
+import pytest
+from backend import cache
+from backend.cache import TTLCache
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def background(monkeypatch):
+    """Taches d'arriere-plan soumises, executees a la demande par le test."""
+    tasks = []
+    monkeypatch.setattr(cache, "submit_background", lambda func, *args: tasks.append((func, args)))
+    return tasks
+
+
+def loader(values):
+    """Chargeur rendant les valeurs successives de values."""
+    calls = iter(values)
+    return lambda: next(calls)
+
+
+def test_fresh_value_is_served_without_loading(clock, background):
+    ttl = TTLCache(ttls={"p": (60, 600)})
+    load = loader([1])
+    assert ttl.get_or_load("p", "k", load) == 1
+    clock.now += 59
+    assert ttl.get_or_load("p", "k", load) == 1
+    assert background == []
+
+
+def test_stale_value_is_served_while_one_refresh_runs(clock, background):
+    ttl = TTLCache(ttls={"p": (60, 600)})
+    load = loader([1, 2])
+    ttl.get_or_load("p", "k", load)
+    clock.now += 61
+    assert [ttl.get_or_load("p", "k", load) for _ in range(3)] == [1, 1, 1]
+    assert len(background) == 1
+    func, args = background.pop()
+    func(*args)
+    assert ttl.get_or_load("p", "k", load) == 2
+    assert background == []
+
+
+def test_failed_refresh_keeps_stale_value_and_allows_retry(clock, background):
+    ttl = TTLCache(ttls={"p": (60, 600)})
+    ttl.get_or_load("p", "k", lambda: 1)
+    clock.now += 61
+
+    def failing():
+        raise RuntimeError("fournisseur en panne")
+
+    assert ttl.get_or_load("p", "k", failing) == 1
+    func, args = background.pop()
+    func(*args)
+    assert ttl.get_or_load("p", "k", lambda: 3) == 1
+    assert len(background) == 1
+
+
+def test_expired_value_is_loaded_synchronously(clock, background):
+    ttl = TTLCache(ttls={"p": (60, 600)})
+    load = loader([1, 2])
+    ttl.get_or_load("p", "k", load)
+    clock.now += 600
+    assert ttl.get_or_load("p", "k", load) == 2
+    assert background == []
+
+
+def test_rejected_value_is_not_stored(clock, background):
+    ttl = TTLCache(ttls={"p": (60, 600)})
+    load = loader([None, 5])
+    assert ttl.get_or_load("p", "k", load, cacheable=lambda value: value is not None) is None
+    assert ttl.get_or_load("p", "k", load, cacheable=lambda value: value is not None) == 5
+
+
+def test_least_recently_used_entry_is_evicted(clock, background):
+    ttl = TTLCache(max_entries=2, ttls={})
+    ttl.get_or_load("p", "a", lambda: "a")
+    ttl.get_or_load("p", "b", lambda: "b")
+    ttl.get_or_load("p", "a", lambda: "recharge")
+    ttl.get_or_load("p", "c", lambda: "c")
+    assert ttl.get_or_load("p", "a", lambda: "recharge") == "a"
+    assert ttl.get_or_load("p", "b", lambda: "recharge") == "recharge"
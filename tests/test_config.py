@@ -0,0 +1,23 @@
+"""
+Listes de portefeuilles lues depuis l'environnement
+"""
+from backend.config import get_list_secret
+
+EVM = "0xAbCd000000000000000000000000000000000001"
+
+
+def test_evm_addresses_are_normalised_and_deduplicated(monkeypatch):
+    monkeypatch.setenv("TEST_WALLETS", f" {EVM}, ,0xbeef,{EVM.lower()} ,0xBEEF")
+    assert get_list_secret("TEST_WALLETS", [], lowercase=True) == [EVM.lower(), "0xbeef"]
+
+
+def test_case_sensitive_addresses_keep_their_case(monkeypatch):
+    monkeypatch.setenv("TEST_WALLETS", "rPzz8Wn4, rpzz8wn4 ,rPzz8Wn4")
+    assert get_list_secret("TEST_WALLETS", []) == ["rPzz8Wn4", "rpzz8wn4"]
+
+
+def test_default_is_used_when_unset(monkeypatch):
+    monkeypatch.delenv("TEST_WALLETS", raising=False)
+    assert get_list_secret("TEST_WALLETS", ["", f" {EVM} "], lowercase=True) == [EVM.lower()]
+    monkeypatch.setenv("TEST_WALLETS", " , ")
+    assert get_list_secret("TEST_WALLETS", [EVM, EVM]) == [EVM]
@@ -0,0 +1,91 @@
+"""
+Budget de latence: parts par etape, attente bornee et resultats partiels
+"""
+import asyncio
+import time
+import pytest
+from backend import crypto_data, http_client
+from backend.deadline import (
+    DEADLINE_SHARES,
+    DEFAULT_SHARE,
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+    using_deadline,
+    within,
+)
+from backend.fetch_engine import run_in_pool
+
+
+def test_steps_share_the_global_start():
+    deadline = Deadline(10)
+    for step, share in DEADLINE_SHARES.items():
+        step_deadline = deadline.for_step(step)
+        assert step_deadline.started == deadline.started
+        assert step_deadline.budget == pytest.approx(10 * share)
+        assert step_deadline.expires_at <= deadline.expires_at
+    assert deadline.for_step("inconnu").budget == pytest.approx(10 * DEFAULT_SHARE)
+
+
+def test_expired_deadline_has_no_time_left():
+    deadline = Deadline(1, started=time.monotonic() - 2)
+    assert deadline.expired()
+    assert deadline.remaining() == 0
+
+
+def test_within_bounds_the_wait():
+    async def slow():
+        await asyncio.sleep(5)
+
+    async def fast():
+        return "ok"
+
+    assert asyncio.run(within(Deadline(1), fast())) == "ok"
+    assert asyncio.run(within(None, fast())) == "ok"
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded, match="quotes"):
+        asyncio.run(within(Deadline(0.05), slow(), "quotes"))
+    assert time.monotonic() - start < 1
+
+
+def test_deadline_follows_calls_into_the_pools():
+    step = Deadline(5).for_step("xrpscan")
+
+    async def main():
+        with using_deadline(step):
+            task = asyncio.ensure_future(run_in_pool(current_deadline))
+        assert current_deadline() is None
+        return await task
+
+    assert asyncio.run(main()) is step
+    assert current_deadline() is None
+
+
+def test_request_is_not_sent_after_the_deadline(monkeypatch):
+    monkeypatch.setattr(http_client, "get_session", lambda retries: pytest.fail("requete envoyee"))
+    with using_deadline(Deadline(1, started=time.monotonic() - 2)):
+        with pytest.raises(DeadlineExceeded) as error:
+            http_client.get("https://example.invalid/")
+    assert not error.value.sent
+
+
+def test_slow_step_is_returned_as_missing_without_blocking_the_others():
+    deadline = Deadline(0.1)
+
+    async def slow():
+        await asyncio.sleep(5)
+
+    async def fast():
+        return 1.5
+
+    async def main():
+        return await asyncio.gather(
+            crypto_data._bounded(deadline, "xrpscan", slow()),
+            crypto_data._bounded(deadline, "hyperliquid", fast()),
+        )
+
+    start = time.monotonic()
+    missing, value = asyncio.run(main())
+    assert isinstance(missing, DeadlineExceeded)
+    assert value == 1.5
+    assert time.monotonic() - start < 1
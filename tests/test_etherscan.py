@@ -0,0 +1,113 @@
+"""
+Planificateur Etherscan: soldes ERC-20 repris tant que la tete d'une adresse ne bouge pas
+"""
+import pytest
+from backend import etherscan
+from backend.etherscan import BalancePlanner, WalletHeads, native_key, token_key
+
+ALICE = "0xAaaa000000000000000000000000000000000001"
+BOB = "0xBbbb000000000000000000000000000000000002"
+USDC = "0xC0000000000000000000000000000000000000c1"
+LINK = "0xC0000000000000000000000000000000000000c2"
+
+
+class FakeEtherscan:
+    """Reponses Etherscan V2 en memoire; calls garde (action, adresse) de chaque appel."""
+
+    def __init__(self):
+        self.calls = []
+        self.heads = {ALICE.lower(): "100:0xa", BOB.lower(): "200:0xb"}
+        self.failing = set()
+
+    def __call__(self, action, verify_ssl=True, **params):
+        address = params["address"]
+        self.calls.append((action, address.lower()))
+        if (action, address.lower()) in self.failing:
+            raise RuntimeError(f"{action} en erreur")
+        if action == "balancemulti":
+            return [{"account": account, "balance": str(2 * 10 ** 18)} for account in address.split(",")]
+        if action == "tokentx":
+            block, tx_hash = self.heads[address.lower()].split(":")
+            return [{"blockNumber": block, "hash": tx_hash}]
+        if action == "tokenbalance":
+            return str(5 * 10 ** 6)
+        raise AssertionError(action)
+
+    def actions(self):
+        calls, self.calls = self.calls, []
+        return sorted(action for action, _ in calls)
+
+
+@pytest.fixture
+def etherscan_api(monkeypatch):
+    api = FakeEtherscan()
+    monkeypatch.setattr(etherscan, "etherscan_v2_call", api)
+    monkeypatch.setattr(etherscan, "ETHERSCAN_PRO_PLAN", False)
+    return api
+
+
+def plan(heads):
+    planner = BalancePlanner(heads=heads)
+    for address in (ALICE, BOB):
+        planner.add_native(address)
+        planner.add_token(address, USDC, 6)
+        planner.add_token(address, LINK, 6)
+    return planner
+
+
+def test_requests_are_deduplicated():
+    planner = BalancePlanner(heads=WalletHeads())
+    assert planner.add_token(ALICE, USDC, 6) == planner.add_token(ALICE.lower(), USDC.upper(), 6)
+    assert planner.add_native(ALICE) == planner.add_native(ALICE.lower())
+    assert planner.plan_key() == (native_key(ALICE), token_key(ALICE, USDC))
+
+
+def test_unchanged_head_skips_token_calls(etherscan_api):
+    heads = WalletHeads()
+    first = plan(heads).execute()
+    assert etherscan_api.actions() == ["balancemulti"] + ["tokenbalance"] * 4 + ["tokentx"] * 2
+    assert first[token_key(BOB, LINK)] == 5.0 and first[native_key(ALICE)] == 2.0
+    assert plan(heads).execute() == first
+    assert etherscan_api.actions() == ["balancemulti", "tokentx", "tokentx"]
+
+
+def test_moved_head_rereads_only_that_address(etherscan_api):
+    heads = WalletHeads()
+    plan(heads).execute()
+    etherscan_api.actions()
+    etherscan_api.heads[BOB.lower()] = "201:0xc"
+    plan(heads).execute()
+    assert sorted(etherscan_api.calls) == sorted(
+        [("balancemulti", f"{ALICE},{BOB}".lower()), ("tokentx", ALICE.lower()), ("tokentx", BOB.lower()),
+         ("tokenbalance", BOB.lower()), ("tokenbalance", BOB.lower())]
+    )
+
+
+def test_failed_reads_are_not_remembered(etherscan_api):
+    heads = WalletHeads()
+    etherscan_api.failing.add(("tokenbalance", ALICE.lower()))
+    results = plan(heads).execute()
+    assert isinstance(results[token_key(ALICE, USDC)], RuntimeError)
+    etherscan_api.failing.clear()
+    etherscan_api.actions()
+    plan(heads).execute()
+    # ALICE relue (soldes incomplets), BOB reprise
+    assert etherscan_api.actions() == ["balancemulti", "tokenbalance", "tokenbalance", "tokentx", "tokentx"]
+
+
+def test_missing_head_rereads_tokens(etherscan_api):
+    heads = WalletHeads()
+    plan(heads).execute()
+    etherscan_api.actions()
+    etherscan_api.failing.add(("tokentx", ALICE.lower()))
+    results = plan(heads).execute()
+    assert results[token_key(ALICE, USDC)] == 5.0
+    assert etherscan_api.actions().count("tokenbalance") == 2
+
+
+def test_old_head_is_reread(etherscan_api):
+    heads = WalletHeads(max_age=0)
+    plan(heads).execute()
+    etherscan_api.actions()
+    plan(heads).execute()
+    assert etherscan_api.actions().count("tokenbalance") == 4
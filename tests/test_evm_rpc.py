@@ -0,0 +1,100 @@
+"""
+Planificateur JSON-RPC: soldes EVM lus par lots, erreurs isolees par requete
+"""
+import pytest
+from backend import evm_rpc, http_client, resilience
+from backend.etherscan import native_key, token_key
+from backend.evm_rpc import BALANCE_OF_SELECTOR, RpcBalancePlanner, RpcError
+
+ALICE = "0xAaaa000000000000000000000000000000000001"
+BOB = "0xBbbb000000000000000000000000000000000002"
+USDC = "0xC0000000000000000000000000000000000000c1"
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class FakeNode:
+    """Noeud JSON-RPC en memoire: repond aux lots dans le desordre."""
+
+    def __init__(self):
+        self.batches = []
+        self.errors = {}
+        self.reject = False
+
+    def __call__(self, url, json=None, **kwargs):
+        self.batches.append(json)
+        if self.reject:
+            return FakeResponse({"jsonrpc": "2.0", "error": {"code": -32600, "message": "batch non supporte"}})
+        replies = []
+        for request in json:
+            if request["method"] == "eth_getBalance":
+                owner, value = request["params"][0].lower(), 3 * 10 ** 18
+            else:
+                assert request["params"][0]["data"].startswith(BALANCE_OF_SELECTOR)
+                owner, value = "0x" + request["params"][0]["data"][-40:], 7 * 10 ** 6
+            if owner in self.errors:
+                replies.append({"jsonrpc": "2.0", "id": request["id"], "error": self.errors[owner]})
+            else:
+                replies.append({"jsonrpc": "2.0", "id": request["id"], "result": hex(value)})
+        return FakeResponse(replies[::-1])
+
+
+@pytest.fixture
+def node(monkeypatch):
+    node = FakeNode()
+    monkeypatch.setattr(evm_rpc, "EVM_RPC_URL", "http://rpc.test")
+    monkeypatch.setattr(http_client, "post", node)
+    monkeypatch.setattr(resilience, "_breakers", {})
+    return node
+
+
+def plan():
+    planner = RpcBalancePlanner()
+    for address in (ALICE, BOB):
+        planner.add_native(address)
+        planner.add_token(address, USDC, 6)
+        planner.add_token(address.lower(), USDC, 6)
+    return planner
+
+
+def test_all_balances_in_one_batch(node):
+    planner = plan()
+    assert planner.call_count() == 1
+    results = planner.execute()
+    assert len(node.batches) == 1 and len(node.batches[0]) == 4
+    assert results == {
+        native_key(ALICE): 3.0, token_key(ALICE, USDC): 7.0,
+        native_key(BOB): 3.0, token_key(BOB, USDC): 7.0,
+    }
+
+
+def test_large_plans_are_split_into_batches(node, monkeypatch):
+    monkeypatch.setattr(evm_rpc, "RPC_BATCH_MAX", 3)
+    planner = plan()
+    assert planner.call_count() == 2
+    assert len(planner.execute()) == 4
+    assert sorted(len(batch) for batch in node.batches) == [1, 3]
+
+
+def test_failed_request_only_affects_its_balances(node):
+    node.errors[BOB.lower()] = {"code": -32000, "message": "execution reverted"}
+    results = plan().execute()
+    assert isinstance(results[native_key(BOB)], RpcError)
+    assert isinstance(results[token_key(BOB, USDC)], RpcError)
+    assert results[native_key(ALICE)] == 3.0
+
+
+def test_rejected_batch_fails_every_balance(node):
+    node.reject = True
+    results = plan().execute()
+    assert len(results) == 4
+    assert all(isinstance(value, RuntimeError) for value in results.values())
@@ -0,0 +1,87 @@
+"""
+Moteur de recuperation: cadence des seaux a jetons, pools et echeance courante
+"""
+import threading
+import time
+import pytest
+from backend import fetch_engine
+from backend.deadline import Deadline, DeadlineExceeded, current_deadline, using_deadline
+from backend.fetch_engine import RATE_LIMITS, TokenBucket, run_parallel
+
+
+class FakeClock:
+    """Horloge monotone simulee: sleep avance le temps sans attendre."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(fetch_engine, "time", clock)
+    return clock
+
+
+def test_burst_then_paced_at_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    instants = []
+    for _ in range(7):
+        bucket.acquire()
+        instants.append(clock.now - 1000.0)
+    assert instants[:3] == [0, 0, 0]
+    assert instants[3:] == pytest.approx([0.5, 1.0, 1.5, 2.0])
+
+
+def test_etherscan_limit_never_exceeds_five_calls_per_second(clock):
+    bucket = TokenBucket(*RATE_LIMITS["etherscan"])
+    instants = []
+    for _ in range(40):
+        bucket.acquire()
+        instants.append(clock.now)
+    for index, start in enumerate(instants):
+        assert sum(1 for instant in instants[index:] if instant < start + 1) <= 5
+
+
+def test_wait_beyond_deadline_raises(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.acquire()
+    with pytest.raises(DeadlineExceeded):
+        bucket.acquire(deadline=Deadline(0.5))
+    assert clock.sleeps == []
+    bucket.acquire(deadline=Deadline(2))
+    assert clock.sleeps == pytest.approx([1.0])
+
+
+def test_bucket_is_shared_between_threads():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(3)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 12 jetons: 1 en rafale puis 11 au rythme de 50/s
+    assert time.monotonic() - start >= 11 / 50 - 0.01
+
+
+def test_run_parallel_keeps_job_order_and_deadline():
+    deadline = Deadline(5)
+
+    def job(value, delay):
+        time.sleep(delay)
+        return value, current_deadline()
+
+    jobs = {name: (job, (name, delay), {}) for name, delay in (("a", 0.05), ("b", 0), ("c", 0.02))}
+    with using_deadline(deadline):
+        results = run_parallel(jobs)
+    assert list(results) == ["a", "b", "c"]
+    assert all(result == (name, deadline) for name, result in results.items())
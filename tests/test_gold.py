@@ -0,0 +1,77 @@
+"""
+Cache disque du prix de l'or: au plus un appel GoldAPI par TTL, partage entre processus
+"""
+import json
+import pytest
+from backend import gold
+from backend.deadline import DeadlineExceeded
+from backend.gold import GoldPriceCache
+
+
+class CallList(list):
+    """Liste des appels, avec les reponses a rendre (results)."""
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Appels a GoldAPI; chaque appel rend la cotation (ou leve l'exception) en tete de calls.results."""
+    calls = CallList()
+    calls.results = []
+
+    def fetch_gold_quote(api_key, verify_ssl=True):
+        calls.append(api_key)
+        result = calls.results.pop(0) if calls.results else {"price_gram_24k": 70.0}
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(gold, "fetch_gold_quote", fetch_gold_quote)
+    return calls
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "gold_price.json")
+
+
+def test_one_call_per_ttl_across_instances(calls, path):
+    first = GoldPriceCache(path, ttl=3600, api_key="key")
+    assert first.get_price() == 70.0
+    assert first.get_price() == 70.0
+    # Autre processus: relit le fichier au lieu d'appeler GoldAPI
+    assert GoldPriceCache(path, ttl=3600, api_key="key").get_price() == 70.0
+    assert len(calls) == 1
+
+
+def test_expired_entry_is_refreshed(calls, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"price": 60.0, "ts": 0, "attempted_at": 0}, f)
+    calls.results.append({"price": 31.1035 * 80})
+    assert GoldPriceCache(path, ttl=3600, api_key="key").get_price() == pytest.approx(80.0)
+    assert len(calls) == 1
+
+
+def test_failed_call_counts_and_keeps_last_price(calls, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"price": 60.0, "ts": 0, "attempted_at": 0}, f)
+    calls.results.append(RuntimeError("GoldAPI HTTP 500"))
+    cache = GoldPriceCache(path, ttl=3600, api_key="key")
+    assert cache.get_price() == 60.0
+    assert GoldPriceCache(path, ttl=3600, api_key="key").get_price() == 60.0
+    assert len(calls) == 1
+
+
+def test_deadline_before_send_is_not_an_attempt(calls, path):
+    calls.results.append(DeadlineExceeded("avant l'appel"))
+    assert GoldPriceCache(path, ttl=3600, api_key="key").get_price() == gold.DEFAULT_GOLD_PRICE
+    assert GoldPriceCache(path, ttl=3600, api_key="key").get_price() == 70.0
+    assert len(calls) == 2
+
+
+def test_deadline_after_send_is_an_attempt(calls, path):
+    calls.results.append(DeadlineExceeded("pendant l'appel", sent=True))
+    assert GoldPriceCache(path, ttl=3600, api_key="key").get_price() == gold.DEFAULT_GOLD_PRICE
+    with open(path, encoding="utf-8") as f:
+        assert "attempted_at" in json.load(f)
+    assert GoldPriceCache(path, ttl=3600, api_key="key").get_price() == gold.DEFAULT_GOLD_PRICE
+    assert len(calls) == 1
@@ -0,0 +1,92 @@
+"""
+Backends d'historique: parite avec les calculs pandas d'origine, import du CSV
+"""
+import threading
+from datetime import timedelta
+import pandas as pd
+import pytest
+from backend import history
+from backend.visualization import find_date_threshold
+from conftest import START, SAMPLE_DAYS
+
+INSTANTS = [
+    START - timedelta(minutes=1),
+    START,
+    START + timedelta(hours=5, minutes=3),
+    START + timedelta(days=1, hours=2),
+    START + timedelta(days=2),
+    START + timedelta(days=3, hours=23),
+    START + timedelta(days=SAMPLE_DAYS + 1),
+]
+
+
+def baseline(sample_csv):
+    """Lecture pandas du CSV, comme le faisaient calculate_evolution et find_date_threshold."""
+    return pd.read_csv(sample_csv, parse_dates=["Date"])
+
+
+@pytest.mark.parametrize("at", INSTANTS)
+def test_latest_values_match_baseline(store, sample_csv, at):
+    df = baseline(sample_csv)
+    expected = df[df["Date"] <= at].groupby("Crypto")["Valeur"].last().to_dict()
+    assert history.latest_values(at) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("at", INSTANTS)
+def test_first_values_match_baseline(store, sample_csv, at):
+    df = baseline(sample_csv)
+    since = at - timedelta(days=1)
+    expected = df[(df["Date"] <= at) & (df["Date"] > since)].groupby("Crypto")["Valeur"].first().to_dict()
+    assert history.first_values(since, at) == pytest.approx(expected)
+
+
+def test_totals_match_baseline(store, sample_csv):
+    totals = baseline(sample_csv).groupby("Date")["Valeur"].sum().sort_index(ascending=False)
+    expected = [(date.to_pydatetime(), value) for date, value in totals.items()]
+    actual = list(history.iter_totals_desc())
+    assert [date for date, _ in actual] == [date for date, _ in expected]
+    assert [value for _, value in actual] == pytest.approx([value for _, value in expected])
+    assert history.recent_totals(5) == pytest.approx(expected[:5][::-1])
+
+
+@pytest.mark.parametrize("threshold", [0, 20, 21, 25, 30, 100])
+def test_find_date_threshold_matches_baseline(store, sample_csv, threshold):
+    totals = baseline(sample_csv).groupby("Date")["Valeur"].sum().sort_index(ascending=False)
+    expected = next((date.to_pydatetime() for date, value in totals.items() if value < threshold * 89), None)
+    assert find_date_threshold(threshold) == expected
+
+
+def test_load_history_returns_all_rows(store, sample_csv):
+    df = baseline(sample_csv)
+    frame = history.load_history()
+    assert len(frame) == len(df)
+    assert frame["Date"].is_monotonic_increasing
+    assert frame["Valeur"].sum() == pytest.approx(df["Valeur"].sum())
+
+
+def test_out_of_order_append_stays_sorted(store):
+    late = START + timedelta(hours=1, minutes=1)
+    ts = history.to_epoch(late)
+    store.append([(ts, "ETH", -1.0)])
+    frame = history.load_history()
+    assert frame["Date"].is_monotonic_increasing
+    assert history.latest_values(late)["ETH"] == -1.0
+
+
+def test_import_runs_once_for_concurrent_first_open(sample_csv, tmp_path, monkeypatch):
+    monkeypatch.setattr(history, "DATA_FILE", sample_csv)
+    monkeypatch.setattr(history, "HISTORY_DB_FILE", str(tmp_path / "shared.sqlite3"))
+    barrier = threading.Barrier(4)
+    stores = []
+
+    def open_store():
+        barrier.wait()
+        stores.append(history._create_store("sqlite"))
+
+    threads = [threading.Thread(target=open_store) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(stores) == 4
+    assert len(stores[0].query()) == len(baseline(sample_csv))
@@ -0,0 +1,81 @@
+"""
+Backend colonnaire: reduction par tranches sur les colonnes projetees, index des cryptos, tri
+"""
+import json
+import os
+import pytest
+from backend import history
+from backend.history_columnar import ColumnarHistoryStore
+from conftest import START
+
+
+@pytest.fixture
+def columnar(sample_csv, tmp_path):
+    store = ColumnarHistoryStore(str(tmp_path / "history_columnar"))
+    history.import_csv(sample_csv, store)
+    return store
+
+
+def _meta(store):
+    with open(os.path.join(store.path, "meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("resolution", [2, 3600, 3 * 3600 + 7, 86400])
+def test_query_resolution_matches_downsample(columnar, resolution):
+    expected = history._downsample(columnar.query(), resolution).reset_index(drop=True)
+    reduced = columnar.query(resolution=resolution)
+    assert reduced.values.tolist() == expected.values.tolist()
+
+
+def test_query_resolution_spanning_blocks(columnar, monkeypatch):
+    # Blocs plus petits qu'une tranche: une tranche n'est pas coupee entre deux blocs
+    monkeypatch.setattr("backend.history_columnar.SCAN_BLOCK", 7)
+    start, end = history.to_epoch(START) + 100, history.to_epoch(START) + 3 * 86400
+    expected = history._downsample(columnar.query(start, end), 7200).reset_index(drop=True)
+    assert columnar.query(start, end, resolution=7200).values.tolist() == expected.values.tolist()
+
+
+def test_load_history_max_points_bounds_rows(columnar, monkeypatch):
+    monkeypatch.setattr(history, "_store", columnar)
+    frame = history.load_history(max_points=10)
+    assert 0 < frame.groupby("Crypto").size().max() <= 11
+
+
+def test_token_rows_are_indexed_on_append(columnar):
+    meta = _meta(columnar)
+    assert len(meta["first_row"]) == len(meta["last_row"]) == len(meta["tokens"])
+    frame = columnar.query()
+    arb = meta["tokens"].index("ARB")
+    assert frame["crypto"].iloc[meta["last_row"][arb]] == "ARB"
+    assert frame[frame["crypto"] == "ARB"].index.max() == meta["last_row"][arb]
+
+
+def test_retired_token_does_not_scan_back(columnar, monkeypatch):
+    at = columnar.bounds()[1]
+    expected = columnar.latest_per_token(at)
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("lecture a rebours")
+
+    # Toutes les dernieres lignes sont <= at: lues dans l'index, sans parcours
+    monkeypatch.setattr("backend.history_columnar.np.unique", no_scan)
+    assert columnar.latest_per_token(at) == expected
+    assert set(expected) == {"ETH", "XRP", "ACTIVE", "ARB", "FET"}
+
+
+def test_out_of_order_append_rewrites_sorted_generation(columnar):
+    generation = _meta(columnar)["generation"]
+    columnar.append([(history.to_epoch(START) + 60, "ETH", -1.0)])
+    meta = _meta(columnar)
+    assert meta["sorted"] and meta["generation"] == generation + 1
+    assert columnar.query()["ts"].is_monotonic_increasing
+
+
+def test_meta_without_token_index_is_still_read(columnar):
+    meta = _meta(columnar)
+    expected = columnar.latest_per_token(columnar.bounds()[1])
+    del meta["first_row"], meta["last_row"]
+    columnar._write_meta(meta)
+    reopened = ColumnarHistoryStore(columnar.path)
+    assert reopened.latest_per_token(reopened.bounds()[1]) == expected
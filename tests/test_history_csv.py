@@ -0,0 +1,71 @@
+"""
+Historique CSV: suivi de fin de fichier et reprise d'une ecriture interrompue
+"""
+import os
+from backend import history, history_csv
+from backend.history_csv import CsvHistoryStore
+
+
+def test_tail_parses_only_appended_lines(sample_csv, monkeypatch):
+    store = CsvHistoryStore(sample_csv)
+    rows = len(store.query())
+    parsed = []
+    parse = history_csv._parse
+    monkeypatch.setattr(history_csv, "_parse", lambda data, header: parsed.append(data) or parse(data, header))
+    ts = history.to_epoch("2024-03-05 00:10:00")
+    store.append([(ts, "ETH", 1.0), (ts, "XRP", 2.0)])
+    frame = store.query()
+    assert len(frame) == rows + 2
+    assert parsed == [b"2024-03-05 00:10:00,ETH,1.0\r\n2024-03-05 00:10:00,XRP,2.0\r\n"]
+    assert store.latest_per_token(ts)["XRP"] == 2.0
+    # Rien de nouveau: pas d'analyse
+    store.query()
+    assert len(parsed) == 1
+
+
+def test_replaced_file_is_read_again(tmp_path):
+    path = tmp_path / "data_crypto.csv"
+    store = CsvHistoryStore(str(path))
+    store.append([(0, "ETH", 1.0), (10, "ETH", 2.0)])
+    assert len(store.query()) == 2
+    # Export/rotation: nouveau fichier au meme chemin, plus court
+    replacement = tmp_path / "export.csv"
+    CsvHistoryStore(str(replacement)).append([(20, "XRP", 3.0)])
+    os.replace(replacement, path)
+    assert store.query()[["ts", "crypto"]].values.tolist() == [[20, "XRP"]]
+
+
+def test_csv_append_drops_torn_line(tmp_path):
+    path = tmp_path / "data_crypto.csv"
+    store = CsvHistoryStore(str(path))
+    store.append([(0, "ETH", 1.0)])
+    # Processus interrompu au milieu d'une ligne
+    with open(path, "ab") as f:
+        f.write(b"1970-01-01 00:00:05,XR")
+    assert store.query()["crypto"].tolist() == ["ETH"]
+    store.append([(10, "XRP", 2.0)])
+    assert open(path, "rb").read().endswith(b"1970-01-01 00:00:10,XRP,2.0\r\n")
+    assert store.query()[["ts", "crypto"]].values.tolist() == [[0, "ETH"], [10, "XRP"]]
+    assert CsvHistoryStore(str(path)).query()["value"].tolist() == [1.0, 2.0]
+
+
+def test_csv_append_restores_torn_header(tmp_path):
+    path = tmp_path / "data_crypto.csv"
+    path.write_bytes(b"Date,Cry")
+    store = CsvHistoryStore(str(path))
+    store.append([(0, "ETH", 1.0)])
+    assert path.read_bytes().startswith(b"Date,Crypto,Valeur\r\n")
+    assert store.query()["value"].tolist() == [1.0]
+
+
+def test_csv_reader_waits_for_complete_line(tmp_path):
+    path = tmp_path / "data_crypto.csv"
+    store = CsvHistoryStore(str(path))
+    store.append([(0, "ETH", 1.0)])
+    assert len(store.query()) == 1
+    with open(path, "ab") as f:
+        f.write(b"1970-01-01 00:00:10,ETH,")
+    assert len(store.query()) == 1
+    with open(path, "ab") as f:
+        f.write(b"3.0\r\n")
+    assert store.query()["value"].tolist() == [1.0, 3.0]
@@ -0,0 +1,91 @@
+"""
+Historique SQLite: agregats horaires et journaliers, compactage et retention
+"""
+from datetime import timedelta
+import pytest
+from backend import history
+from backend.history_sqlite import SqliteHistoryStore
+from conftest import START, SAMPLE_DAYS
+
+
+def _dump(store):
+    connection = store._connection()
+    return {
+        table: sorted(connection.execute(f"SELECT * FROM {table}").fetchall())
+        for table in ("history", "rollup", "rollup_totals", "rollup_state")
+    }
+
+
+@pytest.fixture
+def compacted(sample_csv, tmp_path):
+    """Base SQLite avec retention courte (snapshots bruts 2 jours, heures 3 jours)."""
+    store = SqliteHistoryStore(str(tmp_path / "compact.sqlite3"), raw_days=2, hourly_days=3)
+    history.import_csv(sample_csv, store)
+    return store
+
+
+def test_compaction_is_idempotent(compacted):
+    now = history.to_epoch(START + timedelta(days=SAMPLE_DAYS))
+    compacted.compact(now)
+    first = _dump(compacted)
+    compacted.compact(now)
+    assert _dump(compacted) == first
+
+
+def test_compaction_in_steps_matches_single_pass(compacted, sample_csv, tmp_path):
+    single = SqliteHistoryStore(str(tmp_path / "single.sqlite3"), raw_days=2, hourly_days=3)
+    history.import_csv(sample_csv, single)
+    end = START + timedelta(days=SAMPLE_DAYS)
+    for hours in range(6, SAMPLE_DAYS * 24 + 1, 6):
+        compacted.compact(history.to_epoch(START + timedelta(hours=hours)))
+    single.compact(history.to_epoch(end))
+    stepped, once = _dump(compacted), _dump(single)
+    assert stepped["history"] == once["history"]
+    assert stepped["rollup_totals"] == pytest.approx(once["rollup_totals"])
+
+
+def test_compaction_keeps_latest_values_and_recent_totals(compacted):
+    at = START + timedelta(days=SAMPLE_DAYS)
+    before = compacted.latest_per_token(history.to_epoch(at)), compacted.recent_totals(48)
+    compacted.compact(history.to_epoch(at))
+    assert compacted.latest_per_token(history.to_epoch(at)) == pytest.approx(before[0])
+    assert compacted.recent_totals(48) == before[1]
+
+
+def test_late_snapshot_is_merged_into_rollups(compacted):
+    now = history.to_epoch(START + timedelta(days=SAMPLE_DAYS))
+    compacted.compact(now)
+    connection = compacted._connection()
+    # Deja agregee par heure, encore conservee en brut
+    late = history.to_epoch(START + timedelta(days=SAMPLE_DAYS - 1, minutes=55))
+    bucket = late // 3600 * 3600
+    (count,) = connection.execute(
+        "SELECT count FROM rollup_totals WHERE tier = 'hourly' AND bucket = ?", (bucket,)
+    ).fetchone()
+    compacted.append([(late, "ETH", 1.0)])
+    compacted.compact(now)
+    row = connection.execute(
+        "SELECT min, count FROM rollup WHERE tier = 'hourly' AND bucket = ? AND crypto = 'ETH'", (bucket,)
+    ).fetchone()
+    assert row == (1.0, count + 1)
+    assert connection.execute("SELECT COUNT(*) FROM history WHERE ts = ?", (late,)).fetchone() == (1,)
+
+    # Au-dela de la retention brute: garde dans les agregats seulement
+    older = history.to_epoch(START + timedelta(hours=30, minutes=5))
+    compacted.append([(older, "ETH", -3.0)])
+    assert connection.execute("SELECT COUNT(*) FROM history WHERE ts = ?", (older,)).fetchone() == (0,)
+    (minimum,) = connection.execute(
+        "SELECT min FROM rollup WHERE tier = 'daily' AND bucket = ? AND crypto = 'ETH'", (older // 86400 * 86400,)
+    ).fetchone()
+    assert minimum == -3.0
+
+
+def test_range_read_keeps_partial_edge_buckets(compacted):
+    compacted.compact(history.to_epoch(START + timedelta(days=SAMPLE_DAYS)))
+    # Debut au milieu d'une journee agregee, fin au milieu d'une heure agregee
+    start = history.to_epoch(START + timedelta(hours=3))
+    end = history.to_epoch(START + timedelta(days=1, hours=12, minutes=20))
+    frame = compacted.query(start, end, resolution=86400)
+    assert not frame.empty
+    assert frame["ts"].min() >= start and frame["ts"].max() <= end
+    assert frame["ts"].max() >= end - 3600
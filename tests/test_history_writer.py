@@ -0,0 +1,156 @@
+"""
+HistoryWriter: tampon et minuterie, ecritures concurrentes (threads et processus), fusion et reprise
+"""
+import multiprocessing
+import threading
+import time
+from backend.history_csv import CsvHistoryStore
+from backend.history_writer import HistoryWriter
+
+CRYPTOS = ["ETH", "XRP", "ACTIVE", "FET", "USD"]
+
+
+def snapshot(ts):
+    return [(ts, crypto, float(ts)) for crypto in CRYPTOS]
+
+
+def assert_whole_snapshots(store):
+    """Chaque snapshot ecrit l'est en entier, une seule fois, sans lignes d'un autre melangees."""
+    frame = store.query()
+    for ts, group in frame.groupby("ts", sort=False):
+        assert group["crypto"].tolist() == CRYPTOS
+        assert (group["value"] == ts).all()
+    assert frame["ts"].is_monotonic_increasing
+
+
+def run_threads(count, target):
+    barrier = threading.Barrier(count)
+
+    def run(index):
+        barrier.wait()
+        target(index)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_submits_write_each_snapshot_once(tmp_path):
+    store = CsvHistoryStore(str(tmp_path / "data_crypto.csv"))
+    writer = HistoryWriter(store, coalesce=5)
+    run_threads(16, lambda index: writer.submit(1000 + 10 * index, snapshot(1000 + 10 * index)))
+    writer.flush()
+    assert sorted(store.query()["ts"].unique()) == [1000 + 10 * index for index in range(16)]
+    assert_whole_snapshots(store)
+    assert writer.pending_count() == 0
+
+
+def test_concurrent_close_snapshots_are_coalesced(tmp_path):
+    store = CsvHistoryStore(str(tmp_path / "data_crypto.csv"))
+    writer = HistoryWriter(store, coalesce=5)
+    run_threads(8, lambda index: writer.submit(2000 + index % 2, snapshot(2000 + index % 2)))
+    assert writer.pending_count() == 1
+    writer.flush()
+    assert store.query()["ts"].nunique() == 1
+    assert_whole_snapshots(store)
+
+
+def test_concurrent_flushes_from_several_writers(tmp_path):
+    # Un ecrivain par thread: chacun prend le verrou de fichier comme un autre processus
+    store = CsvHistoryStore(str(tmp_path / "data_crypto.csv"))
+    writers = [HistoryWriter(CsvHistoryStore(store.path), coalesce=0) for _ in range(6)]
+
+    def write(index):
+        for step in range(5):
+            ts = 100 * step + index
+            writers[index].submit(ts, snapshot(ts))
+
+    run_threads(len(writers), write)
+    assert store.query()["ts"].nunique() == 30
+    frame = store.query()
+    for ts, group in frame.groupby("ts"):
+        assert group["crypto"].tolist() == CRYPTOS
+
+
+def _write_from_process(path, offset):
+    writer = HistoryWriter(CsvHistoryStore(path), coalesce=0)
+    for step in range(10):
+        ts = 10 * step + offset
+        writer.submit(ts, snapshot(ts))
+
+
+def test_processes_do_not_interleave_snapshots(tmp_path):
+    path = str(tmp_path / "data_crypto.csv")
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_write_from_process, args=(path, offset)) for offset in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    store = CsvHistoryStore(path)
+    assert store.query()["ts"].nunique() == 30
+    for ts, group in store.query().groupby("ts"):
+        assert group["crypto"].tolist() == CRYPTOS
+
+
+def test_failed_append_keeps_remaining_snapshots(tmp_path):
+    store = CsvHistoryStore(str(tmp_path / "data_crypto.csv"))
+    writer = HistoryWriter(store, coalesce=5)
+    append = store.append
+    calls = []
+
+    def flaky(rows):
+        calls.append(rows[0][0])
+        if len(calls) == 2:
+            raise OSError("disque plein")
+        append(rows)
+
+    store.append = flaky
+    writer._pending = [(100, snapshot(100)), (200, snapshot(200)), (300, snapshot(300))]
+    assert writer.flush() == 1
+    assert [ts for ts, _ in writer._pending] == [200, 300]
+    assert writer.flush() == 2
+    assert sorted(store.query()["ts"].unique()) == [100, 200, 300]
+    assert_whole_snapshots(store)
+
+
+def test_newest_pending_snapshot_wins(tmp_path):
+    store = CsvHistoryStore(str(tmp_path / "data_crypto.csv"))
+    writer = HistoryWriter(store, coalesce=5)
+    writer._queue([(100, snapshot(100)), (103, snapshot(103)), (101, snapshot(101))])
+    assert [ts for ts, _ in writer._pending] == [103]
+
+
+def test_buffer_is_written_by_timer(tmp_path):
+    store = CsvHistoryStore(str(tmp_path / "data_crypto.csv"))
+    writer = HistoryWriter(store, coalesce=0.2)
+    writer.submit(100, snapshot(100))
+    writer.submit(100.1, snapshot(100))
+    assert store.query().empty
+    deadline = time.monotonic() + 5
+    while writer.pending_count() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.05)
+    assert store.query()["ts"].tolist() == [100] * len(CRYPTOS)
+
+
+def test_full_buffer_is_written_immediately(tmp_path):
+    store = CsvHistoryStore(str(tmp_path / "data_crypto.csv"))
+    writer = HistoryWriter(store, coalesce=60, max_pending=3)
+    for ts in (100, 200):
+        writer.submit(ts, snapshot(ts))
+    assert store.query().empty
+    writer.submit(300, snapshot(300))
+    assert sorted(store.query()["ts"].unique()) == [100, 200, 300]
+    assert writer.pending_count() == 0
+
+
+def test_failed_writes_keep_the_newest_snapshots(tmp_path):
+    store = CsvHistoryStore(str(tmp_path / "data_crypto.csv"))
+    writer = HistoryWriter(store, coalesce=60, max_pending=2)
+    for ts in (100, 200, 300):
+        writer._retry([(ts, snapshot(ts))])
+    assert [ts for ts, _ in writer._pending] == [200, 300]
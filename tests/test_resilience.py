@@ -0,0 +1,123 @@
+"""
+Disjoncteurs (ferme, ouvert, semi-ouvert) et requetes couvertes
+"""
+import threading
+import time
+import pytest
+from backend import resilience
+from backend.deadline import DeadlineExceeded
+from backend.resilience import CircuitBreaker, CircuitOpenError, hedged_call
+
+COOLDOWN = 0.05
+
+
+def fail():
+    raise RuntimeError("fournisseur en panne")
+
+
+def opened_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=2, cooldown=COOLDOWN)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+    return breaker
+
+
+@pytest.fixture(autouse=True)
+def breakers(monkeypatch):
+    """Disjoncteurs neufs pour chaque test (hedged_call passe par get_breaker)."""
+    monkeypatch.setattr(resilience, "_breakers", {})
+
+
+def test_opens_after_threshold_without_calling():
+    breaker = opened_breaker()
+    calls = []
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.call(calls.append, 1)
+    assert calls == []
+
+
+def test_half_open_admits_a_single_probe():
+    breaker = opened_breaker()
+    time.sleep(COOLDOWN)
+    assert not breaker.is_open()
+    started, release = threading.Event(), threading.Event()
+
+    def probe():
+        started.set()
+        release.wait(5)
+        return "ok"
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(breaker.call(probe)))
+    thread.start()
+    assert started.wait(5)
+    # Appel d'essai en cours: les autres appelants restent coupes
+    assert breaker.is_open()
+    for _ in range(3):
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "trop tot")
+    release.set()
+    thread.join()
+    assert results == ["ok"]
+    assert not breaker.is_open()
+    assert breaker.call(lambda: "ferme") == "ferme"
+
+
+def test_failed_probe_restarts_cooldown():
+    breaker = opened_breaker()
+    time.sleep(COOLDOWN)
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "coupe")
+    time.sleep(COOLDOWN)
+    assert breaker.call(lambda: "referme") == "referme"
+
+
+def test_deadline_in_probe_frees_the_probe():
+    breaker = opened_breaker()
+    time.sleep(COOLDOWN)
+
+    def out_of_budget():
+        raise DeadlineExceeded("hors budget", sent=True)
+
+    with pytest.raises(DeadlineExceeded):
+        breaker.call(out_of_budget)
+    # Ni referme ni rouvert: l'appel suivant est un nouvel essai
+    assert breaker.call(lambda: "essai") == "essai"
+
+
+def test_hedged_call_prefers_fast_primary():
+    assert hedged_call(("primary", lambda: 1), ("fallback", lambda: 2)) == ("primary", 1)
+
+
+def test_hedged_call_covers_failed_primary():
+    assert hedged_call(("primary", fail), ("fallback", lambda: 2)) == ("fallback", 2)
+
+
+def test_hedged_call_covers_slow_primary(monkeypatch):
+    monkeypatch.setattr(resilience, "DEFAULT_HEDGE_DELAY", 0.05)
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return 1
+
+    try:
+        assert hedged_call(("primary", slow), ("fallback", lambda: 2)) == ("fallback", 2)
+    finally:
+        release.set()
+
+
+def test_hedged_call_skips_open_primary():
+    calls = []
+    breaker = resilience.get_breaker("primary")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert hedged_call(("primary", lambda: calls.append(1)), ("fallback", lambda: 2)) == ("fallback", 2)
+    assert calls == []
+    with pytest.raises(RuntimeError):
+        hedged_call(("primary", lambda: 1), ("fallback", fail))
@@ -0,0 +1,96 @@
+"""
+Single-flight: un seul appel en vol par cle, resultat partage entre appelants
+"""
+import asyncio
+import threading
+import pytest
+from backend.singleflight import SingleFlight
+
+
+def wait_in_flight(flight, key):
+    while not flight.in_flight(key):
+        threading.Event().wait(0.001)
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        release.wait(5)
+        return "snapshot"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", refresh))) for _ in range(5)]
+    threads[0].start()
+    wait_in_flight(flight, "k")
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == ["snapshot"] * 5
+    assert not flight.in_flight("k")
+
+
+def test_error_is_shared_then_next_call_runs_again():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError("fournisseur en panne")
+
+    errors = []
+
+    def caller():
+        try:
+            flight.do("k", failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller) for _ in range(3)]
+    threads[0].start()
+    wait_in_flight(flight, "k")
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3 and len({id(e) for e in errors}) == 1
+    assert flight.do("k", lambda: "ok") == "ok"
+
+
+def test_distinct_keys_do_not_wait_for_each_other():
+    flight = SingleFlight()
+    release = threading.Event()
+    thread = threading.Thread(target=flight.do, args=("a", release.wait, 5))
+    thread.start()
+    wait_in_flight(flight, "a")
+    assert flight.do("b", lambda: "b") == "b"
+    release.set()
+    thread.join()
+
+
+def test_async_and_sync_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def refresh():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "snapshot"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("k", refresh))
+        await asyncio.sleep(0.01)
+        followers = [flight.do_async("k", refresh) for _ in range(3)]
+        # Un appelant synchrone (thread Flask) rejoint le meme appel
+        sync = asyncio.get_running_loop().run_in_executor(None, flight.do, "k", lambda: pytest.fail("second appel"))
+        return await asyncio.gather(leader, *followers, sync)
+
+    assert asyncio.run(main()) == ["snapshot"] * 5
+    assert calls == [1]
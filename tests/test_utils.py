@@ -0,0 +1,18 @@
+"""
+Age des valeurs reprises des dernieres valeurs connues (affichage)
+"""
+from datetime import datetime
+import pytest
+from backend.utils import format_age
+
+NOW = datetime(2024, 3, 5, 12, 0, 0)
+
+
+@pytest.mark.parametrize("since, label", [
+    ("2024-03-05 11:59:30", "< 1 min"),
+    ("2024-03-05 11:48:00", "12 min"),
+    ("2024-03-05 09:00:00", "3 h"),
+    ("2024-03-03 11:00:00", "2 j"),
+])
+def test_format_age(since, label):
+    assert format_age(since, now=NOW) == label